@@ -0,0 +1,88 @@
+"""
+Turkcell Decision Engine - Prepared Statement Benchmark
+Per-event latency of the hot repository queries: plain SQL vs PREPARE/EXECUTE
+
+Usage:
+    python -m benchmarks.bench_prepared_statements [--events 2000] [--user U1]
+
+Writes are done inside a transaction that is rolled back at the end.
+"""
+
+import argparse
+import time
+
+from src.database import (
+    db, TransactionAborted, UserStateRepository, RuleRepository,
+    DecisionRepository, ActionRepository
+)
+
+
+PLAIN_QUERIES = {
+    'state': "SELECT * FROM user_state WHERE user_id = %s",
+    'rules': "SELECT * FROM rules WHERE is_active = TRUE ORDER BY priority",
+    'decision': """
+        INSERT INTO decisions (decision_id, user_id, triggered_rules, selected_action, suppressed_actions, user_state_snapshot)
+        VALUES (%s, %s, %s, %s, %s::action_type_enum[], %s)
+    """,
+    'action': """
+        INSERT INTO actions (action_id, user_id, action_type, message)
+        VALUES (%s, %s, %s, %s)
+    """
+}
+
+
+def run_plain(user_id: str, index: int):
+    db.execute_one(PLAIN_QUERIES['state'], (user_id,))
+    db.execute(PLAIN_QUERIES['rules'])
+    db.execute(PLAIN_QUERIES['decision'], (
+        f"D-BP{index}", user_id, ['R-01'], 'DATA_USAGE_WARNING', None, '{}'
+    ))
+    db.execute(PLAIN_QUERIES['action'], (f"A-BP{index}", user_id, 'DATA_USAGE_WARNING', ''))
+
+
+def run_prepared(user_id: str, index: int):
+    db.execute_prepared(UserStateRepository.GET_BY_USER, (user_id,), fetch='one')
+    db.execute_prepared(RuleRepository.GET_ACTIVE)
+    db.execute_prepared(DecisionRepository.INSERT, (
+        f"D-BX{index}", user_id, ['R-01'], 'DATA_USAGE_WARNING', None, '{}'
+    ))
+    db.execute_prepared(ActionRepository.INSERT, (f"A-BX{index}", user_id, 'DATA_USAGE_WARNING', ''))
+
+
+def measure(step, events: int, user_id: str) -> float:
+    """Run events iterations of step in a rolled-back transaction; return µs per event"""
+    elapsed = 0.0
+    try:
+        with db.transaction():
+            # Warm up (also PREPAREs on this connection)
+            step(user_id, -1)
+            started = time.perf_counter()
+            for index in range(events):
+                step(user_id, index)
+            elapsed = time.perf_counter() - started
+            raise TransactionAborted("benchmark rollback")
+    except TransactionAborted:
+        pass
+    return elapsed / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--user', default='U1')
+    args = parser.parse_args()
+
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+
+    plain = measure(run_plain, args.events, args.user)
+    prepared = measure(run_prepared, args.events, args.user)
+
+    print(f"events:   {args.events}")
+    print(f"plain:    {plain:8.1f} µs/event")
+    print(f"prepared: {prepared:8.1f} µs/event")
+    print(f"speedup:  {plain / prepared:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Turkcell Decision Engine - Rule Index Benchmark
+Per-user evaluation cost vs. rule count: linear scan vs threshold index
+
+Usage:
+    python -m benchmarks.bench_rule_index [--users 2000] [--sizes 10,100,1000,10000]
+
+Rules are synthetic single-field campaign bands (BETWEEN / AND-ed bounds
+/ ==) spread so that each user matches a similar number of rules at every
+rule count; the database is not used.
+"""
+
+import argparse
+import random
+import time
+
+from src.condition_compiler import STATE_FIELDS
+from src.rule_cache import compile_rules
+
+BAND_WIDTH = 5.0
+MATCHES_PER_FIELD = 3
+
+
+def make_rules(count: int, rng: random.Random):
+    """Single-field rules spread over a value range that grows with count"""
+    span = BAND_WIDTH * count / MATCHES_PER_FIELD
+    rules = []
+    for index in range(count):
+        field = rng.choice(STATE_FIELDS)
+        low = round(rng.uniform(0, span), 2)
+        shape = index % 3
+        if shape == 0:
+            condition = f"{field} BETWEEN {low} AND {low + BAND_WIDTH}"
+        elif shape == 1:
+            condition = f"{field} >= {low} AND {field} < {low + BAND_WIDTH}"
+        else:
+            condition = f"{field} == {low}"
+        rules.append({
+            'rule_id': f"B-{index}",
+            'condition': condition,
+            'action': 'DATA_USAGE_NUDGE',
+            'priority': rng.randint(1, 100)
+        })
+    return rules, span
+
+
+def make_states(count: int, span: float, rng: random.Random):
+    return [
+        {field: round(rng.uniform(0, span), 2) for field in STATE_FIELDS}
+        for _ in range(count)
+    ]
+
+
+def time_per_user(step, states) -> float:
+    """µs per user for step(state)"""
+    started = time.perf_counter()
+    for state in states:
+        step(state)
+    return (time.perf_counter() - started) / len(states) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'rules':>7} {'matches/user':>13} {'linear µs':>10} {'indexed µs':>11} {'speedup':>8}")
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        rules, span = make_rules(size, rng)
+        rule_set = compile_rules(rules)
+        states = make_states(args.users, span, rng)
+
+        linear = time_per_user(
+            lambda state: [r for r in rule_set.rules if r.condition(state)], states
+        )
+        indexed = time_per_user(lambda state: rule_set.match(state), states)
+        matches = sum(len(rule_set.match(s)) for s in states) / len(states)
+
+        print(f"{size:>7} {matches:>13.2f} {linear:>10.1f} {indexed:>11.1f} {linear / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Turkcell Decision Engine - Sweep Benchmark
+Full-population sweep throughput (users/sec) against worker count
+
+Usage:
+    python -m benchmarks.bench_sweep [--population 200000] [--workers 1,2,4] [--persist] [--cleanup]
+
+Synthetic users (IDs 'S0000001'...) are added until user_state holds at
+least --population rows. Without --persist decisions are evaluated but not
+written, so runs can be repeated on the same data.
+"""
+
+import argparse
+
+from src.database import db
+from src.sweep import run_sweep
+
+SYNTHETIC_PREFIX = 'S'
+
+
+def populate(population: int):
+    """Top user_state up to population rows with random synthetic users"""
+    existing = db.execute_one("SELECT COUNT(*) AS n FROM user_state")['n']
+    missing = population - existing
+    if missing <= 0:
+        return
+
+    start = (db.execute_one(
+        "SELECT COUNT(*) AS n FROM users WHERE user_id LIKE %s", (SYNTHETIC_PREFIX + '%',)
+    )['n'] or 0) + 1
+    print(f"Adding {missing} synthetic users...")
+    with db.transaction():
+        db.execute("""
+            INSERT INTO users (user_id, name, city)
+            SELECT %s || lpad(i::text, 7, '0'), 'Sweep ' || i, 'Istanbul'
+            FROM generate_series(%s, %s) AS i
+        """, (SYNTHETIC_PREFIX, start, start + missing - 1))
+        db.execute("""
+            INSERT INTO user_state (user_id, internet_today_gb, spend_today_try, content_minutes_today, risk_level)
+            SELECT user_id, gb, try, mins, calculate_risk_level(gb, try, mins)
+            FROM (
+                SELECT %s || lpad(i::text, 7, '0') AS user_id,
+                       round((random() * 20)::numeric, 2) AS gb,
+                       round((random() * 400)::numeric, 2) AS try,
+                       round((random() * 300)::numeric, 2) AS mins
+                FROM generate_series(%s, %s) AS i
+            ) s
+        """, (SYNTHETIC_PREFIX, start, start + missing - 1))
+
+
+def cleanup():
+    """Remove synthetic users (their state, decisions and actions cascade)"""
+    db.execute("DELETE FROM users WHERE user_id LIKE %s", (SYNTHETIC_PREFIX + '%',))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--population', type=int, default=200000)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--shards-per-worker', type=int, default=1)
+    parser.add_argument('--persist', action='store_true', help="write decisions and actions")
+    parser.add_argument('--cleanup', action='store_true', help="delete synthetic users at the end")
+    args = parser.parse_args()
+
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+    populate(args.population)
+
+    print(f"{'workers':>8} {'users':>9} {'decisions':>10} {'seconds':>8} {'users/s':>10} {'scaling':>8}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        stats = run_sweep(workers, workers * args.shards_per_worker, persist=args.persist)
+        baseline = baseline or stats.users_per_second
+        print(
+            f"{workers:>8} {stats.users:>9} {stats.decisions:>10} {stats.seconds:>8.2f} "
+            f"{stats.users_per_second:>10.0f} {stats.users_per_second / baseline:>7.2f}x"
+        )
+
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+-- ============================================================
+-- Turkcell Decision Engine - Bulk Ingestion Migration
+-- Toplu event yüklemesi için user state trigger'ının atlanabilmesi
+-- ============================================================
+
+-- decision_engine.bulk_ingest = 'on' olan transaction'larda (SET LOCAL)
+-- trigger user_state'i güncellemez; ingestion pipeline her batch için
+-- kullanıcı başına tek bir upsert yapar.
+
+CREATE OR REPLACE FUNCTION update_user_state_from_event()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Toplu yüklemede (src/ingestion.py) state değişimleri Python tarafında
+    -- kullanıcı bazında toplanıp tek bir upsert ile yazılır
+    IF current_setting('decision_engine.bulk_ingest', true) = 'on' THEN
+        NEW.processed = TRUE;
+        RETURN NEW;
+    END IF;
+    
+    -- User state yoksa oluştur
+    INSERT INTO user_state (user_id, state_date)
+    VALUES (NEW.user_id, CURRENT_DATE)
+    ON CONFLICT (user_id) DO NOTHING;
+    
+    -- Event tipine göre state güncelle
+    IF NEW.unit = 'GB' THEN
+        UPDATE user_state 
+        SET internet_today_gb = internet_today_gb + NEW.value,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id;
+    ELSIF NEW.unit = 'TRY' THEN
+        UPDATE user_state 
+        SET spend_today_try = spend_today_try + NEW.value,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id;
+    ELSIF NEW.unit = 'MIN' THEN
+        UPDATE user_state 
+        SET content_minutes_today = content_minutes_today + NEW.value,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id;
+    END IF;
+    
+    -- Risk seviyesini güncelle
+    UPDATE user_state 
+    SET risk_level = calculate_risk_level(
+        internet_today_gb, 
+        spend_today_try, 
+        content_minutes_today
+    )
+    WHERE user_id = NEW.user_id;
+    
+    -- Event'i işlenmiş olarak işaretle
+    NEW.processed = TRUE;
+    
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Toplu yükleme event ID'lerini hi/lo blokları halinde kendi sequence'ından
+-- alır (EVT-I1000000, ...). event_id_seq düz sayaç olarak kalır; iki
+-- kaynak aynı sequence'ı paylaşırsa bloklardaki ID'ler sayaçla çakışabilir.
+CREATE SEQUENCE IF NOT EXISTS ingest_event_id_seq START 1000;
+
+-- ============================================================
+-- Migration tamamlandı!
+-- ============================================================
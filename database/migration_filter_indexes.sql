@@ -0,0 +1,24 @@
+-- ============================================================
+-- Turkcell Decision Engine - Filter Indexes
+-- Panel filtreleri (servis, aksiyon tipi) için bileşik indeksler
+-- ============================================================
+
+-- Filtreler SQL'de uygulanır ve sonuç (zaman, id) sırasıyla sayfalanır
+-- (migration_keyset_indexes.sql). Filtre sütunu + sıralama anahtarı
+-- indeksiyle nadir bir servisin son kayıtları da tablonun tamamını
+-- taramadan, sonuç boyutuyla orantılı sürede okunur.
+-- event_type için ayrı indeks yoktur: üç değerden birine eşittir ve
+-- zaman indeksi üzerinde süzmek yeterince seçicidir; her ek indeks
+-- events yazma maliyetini artırır.
+
+CREATE INDEX idx_events_service_time ON events(service, timestamp DESC, event_id DESC);
+
+CREATE INDEX idx_actions_type_time ON actions(action_type, created_at DESC, action_id DESC);
+DROP INDEX idx_actions_type;
+
+CREATE INDEX idx_decisions_selected_time ON decisions(selected_action, timestamp DESC, decision_id DESC);
+DROP INDEX idx_decisions_selected;
+
+-- ============================================================
+-- Migration tamamlandı!
+-- ============================================================
@@ -0,0 +1,43 @@
+-- ============================================================
+-- Turkcell Decision Engine - Keyset Pagination Indexes
+-- Sayfalı listeleme için (kullanıcı, zaman, id) bileşik indeksleri
+-- ============================================================
+
+-- Listeler en yeniden eskiye (zaman, id) sırasıyla sayfalanır; sonraki
+-- sayfa "(zaman, id) < son satır" koşuluyla istenir. Bu indekslerle her
+-- sayfa, derinliğinden bağımsız olarak tek bir indeks aralık taramasıdır.
+-- Yalnızca user_id / zaman içeren eski indeksler yenilerinin önekidir,
+-- bu yüzden kaldırılır (ON DELETE CASCADE de yeni indeksi kullanır).
+-- Bölümlü tablolarda (migration_partitioning.sql) indeksler her bölüme
+-- otomatik olarak oluşturulur.
+
+-- ============================================================
+-- EVENTS
+-- ============================================================
+
+CREATE INDEX idx_events_user_time ON events(user_id, timestamp DESC, event_id DESC);
+CREATE INDEX idx_events_time_id ON events(timestamp DESC, event_id DESC);
+DROP INDEX idx_events_user_id;
+DROP INDEX idx_events_timestamp;
+
+-- ============================================================
+-- DECISIONS
+-- ============================================================
+
+CREATE INDEX idx_decisions_user_time ON decisions(user_id, timestamp DESC, decision_id DESC);
+CREATE INDEX idx_decisions_time_id ON decisions(timestamp DESC, decision_id DESC);
+DROP INDEX idx_decisions_user_id;
+DROP INDEX idx_decisions_timestamp;
+
+-- ============================================================
+-- ACTIONS
+-- ============================================================
+
+CREATE INDEX idx_actions_user_time ON actions(user_id, created_at DESC, action_id DESC);
+CREATE INDEX idx_actions_time_id ON actions(created_at DESC, action_id DESC);
+DROP INDEX idx_actions_user_id;
+DROP INDEX idx_actions_created;
+
+-- ============================================================
+-- Migration tamamlandı!
+-- ============================================================
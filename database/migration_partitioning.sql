@@ -0,0 +1,255 @@
+-- ============================================================
+-- Turkcell Decision Engine - Partitioning Migration
+-- events, decisions ve actions tablolarının zamana göre bölümlenmesi
+-- ============================================================
+
+-- Büyüyen tablolar timestamp/created_at üzerinden RANGE bölümlenir:
+-- events günlük, decisions ve actions aylık. "Bugün" sorguları ve yeni
+-- kayıtlar yalnızca güncel bölüme dokunur; saklama süresi dolan bölümler
+-- src/partitions.py ile tek komutta ayrılır (DETACH) veya silinir.
+-- Bölüm anahtarı birincil anahtarın parçası olmak zorunda olduğundan
+-- birincil anahtarlar (id, zaman) olur.
+
+-- ============================================================
+-- PARTITION_POLICIES TABLOSU
+-- Hangi tablonun hangi sütun ve aralıkla bölümlendiği
+-- ============================================================
+
+CREATE TABLE partition_policies (
+    table_name VARCHAR(30) PRIMARY KEY,
+    partition_column VARCHAR(30) NOT NULL,
+    step VARCHAR(5) NOT NULL CHECK (step IN ('day', 'month'))
+);
+
+COMMENT ON TABLE partition_policies IS 'Zamana göre bölümlenen tablolar ve bölüm aralıkları';
+
+INSERT INTO partition_policies (table_name, partition_column, step) VALUES
+('events', 'timestamp', 'day'),
+('decisions', 'timestamp', 'month'),
+('actions', 'created_at', 'month');
+
+-- ============================================================
+-- BÖLÜM OLUŞTURMA
+-- [p_from, p_to] günlerini kapsayan eksik bölümleri oluşturur.
+-- Default bölüme düşmüş satırlar yeni bölüme taşınır, sonra bölüm eklenir.
+-- Bölüm adları: events_p20261017, decisions_p202610
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION ensure_partitions(p_table TEXT, p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_column TEXT;
+    v_step TEXT;
+    v_start DATE;
+    v_end DATE;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    -- Aynı tabloya eşzamanlı çağrılar sırayla çalışır
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_partitions:' || p_table));
+
+    SELECT partition_column, step INTO v_column, v_step
+    FROM partition_policies WHERE table_name = p_table;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'No partition policy for table %', p_table;
+    END IF;
+
+    v_start := date_trunc(v_step, p_from)::DATE;
+    WHILE v_start <= p_to LOOP
+        v_end := (v_start + ('1 ' || v_step)::INTERVAL)::DATE;
+        v_name := p_table || '_p' || to_char(v_start, CASE v_step WHEN 'day' THEN 'YYYYMMDD' ELSE 'YYYYMM' END);
+
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name, p_table);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+                p_table || '_default', v_column, v_start, v_column, v_end, v_name
+            );
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           p_table, v_name, v_start, v_end);
+            v_created := v_created + 1;
+        END IF;
+
+        v_start := v_end;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- MEVCUT TABLOLARIN TAŞINMASI
+-- Eski tablo yeniden adlandırılır, bölümlü tablo oluşturulur, veri
+-- kopyalanır ve eski tablo silinir. Tabloya bağlı view'lar yeniden kurulur.
+-- ============================================================
+
+DROP VIEW v_daily_summary;
+DROP VIEW v_recent_actions;
+
+ALTER TABLE events RENAME TO events_unpartitioned;
+ALTER TABLE events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey;
+DROP INDEX idx_events_user_id, idx_events_timestamp, idx_events_processed;
+
+ALTER TABLE decisions RENAME TO decisions_unpartitioned;
+ALTER TABLE decisions_unpartitioned RENAME CONSTRAINT decisions_pkey TO decisions_unpartitioned_pkey;
+DROP INDEX idx_decisions_user_id, idx_decisions_timestamp, idx_decisions_selected;
+
+ALTER TABLE actions RENAME TO actions_unpartitioned;
+ALTER TABLE actions_unpartitioned RENAME CONSTRAINT actions_pkey TO actions_unpartitioned_pkey;
+DROP INDEX idx_actions_user_id, idx_actions_type, idx_actions_created;
+
+-- Eventler tablosu (günlük bölümler)
+CREATE TABLE events (
+    event_id VARCHAR(20) NOT NULL,
+    user_id VARCHAR(10) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    service service_enum NOT NULL,
+    event_type event_type_enum NOT NULL,
+    value DECIMAL(10, 2) NOT NULL CHECK (value >= 0),
+    unit unit_enum NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    processed BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+COMMENT ON TABLE events IS 'Servislerden gelen tüm eventler (günlük bölümlenmiş)';
+
+CREATE TABLE events_default PARTITION OF events DEFAULT;
+
+CREATE INDEX idx_events_user_id ON events(user_id);
+CREATE INDEX idx_events_timestamp ON events(timestamp);
+CREATE INDEX idx_events_processed ON events(processed);
+
+-- Kararlar tablosu (aylık bölümler)
+CREATE TABLE decisions (
+    decision_id VARCHAR(20) NOT NULL,
+    user_id VARCHAR(10) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    triggered_rules TEXT[] NOT NULL,
+    selected_action action_type_enum NOT NULL,
+    suppressed_actions action_type_enum[],
+    user_state_snapshot JSONB,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (decision_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+COMMENT ON TABLE decisions IS 'Tüm kararların audit log kaydı (aylık bölümlenmiş)';
+
+CREATE TABLE decisions_default PARTITION OF decisions DEFAULT;
+
+CREATE INDEX idx_decisions_user_id ON decisions(user_id);
+CREATE INDEX idx_decisions_timestamp ON decisions(timestamp);
+CREATE INDEX idx_decisions_selected ON decisions(selected_action);
+
+-- Aksiyonlar tablosu (aylık bölümler)
+CREATE TABLE actions (
+    action_id VARCHAR(20) NOT NULL,
+    user_id VARCHAR(10) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    action_type action_type_enum NOT NULL,
+    message TEXT,
+    sent_via VARCHAR(20) DEFAULT 'BiP',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (action_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+COMMENT ON TABLE actions IS 'Kullanıcılara gönderilen aksiyonlar/bildirimler (aylık bölümlenmiş)';
+
+CREATE TABLE actions_default PARTITION OF actions DEFAULT;
+
+CREATE INDEX idx_actions_user_id ON actions(user_id);
+CREATE INDEX idx_actions_type ON actions(action_type);
+CREATE INDEX idx_actions_created ON actions(created_at);
+
+-- Mevcut veri aralığı ve önümüzdeki 7 gün için bölümler
+SELECT ensure_partitions('events', COALESCE(MIN(timestamp)::DATE, CURRENT_DATE), CURRENT_DATE + 7)
+FROM events_unpartitioned;
+SELECT ensure_partitions('decisions', COALESCE(MIN(timestamp)::DATE, CURRENT_DATE), CURRENT_DATE + 7)
+FROM decisions_unpartitioned;
+SELECT ensure_partitions('actions', COALESCE(MIN(created_at)::DATE, CURRENT_DATE), CURRENT_DATE + 7)
+FROM actions_unpartitioned;
+
+-- Tetikleyiciler henüz yokken kopyalanır: user_state ve sayaçlar değişmez
+INSERT INTO events
+SELECT event_id, user_id, service, event_type, value, unit, timestamp, processed, created_at
+FROM events_unpartitioned;
+
+INSERT INTO decisions
+SELECT decision_id, user_id, triggered_rules, selected_action, suppressed_actions,
+       user_state_snapshot, COALESCE(timestamp, CURRENT_TIMESTAMP)
+FROM decisions_unpartitioned;
+
+INSERT INTO actions
+SELECT action_id, user_id, action_type, message, sent_via, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM actions_unpartitioned;
+
+DROP TABLE events_unpartitioned;
+DROP TABLE decisions_unpartitioned;
+DROP TABLE actions_unpartitioned;
+
+-- ============================================================
+-- TETİKLEYİCİLER
+-- Satır tetikleyicisi tüm bölümlere kopyalanır; sayaç tetikleyicileri
+-- (migration_summary_counters.sql uygulanmışsa) ana tabloda kurulur
+-- ============================================================
+
+CREATE TRIGGER trg_update_user_state
+    BEFORE INSERT ON events
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_state_from_event();
+
+DO $$
+DECLARE
+    v_table TEXT;
+    v_column TEXT;
+BEGIN
+    IF to_regprocedure('summary_count_rows()') IS NULL THEN
+        RETURN;
+    END IF;
+    FOR v_table, v_column IN SELECT table_name, partition_column FROM partition_policies LOOP
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION summary_count_rows(%L, %L)',
+                       'trg_summary_' || v_table || '_insert', v_table, v_table, v_column);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION summary_count_rows(%L, %L)',
+                       'trg_summary_' || v_table || '_delete', v_table, v_table, v_column);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate(%L)',
+                       'trg_summary_' || v_table || '_truncate', v_table, v_table);
+    END LOOP;
+END;
+$$;
+
+-- ============================================================
+-- VIEW'LAR
+-- DATE(sütun) = CURRENT_DATE yerine aralık koşulu: bölüm budama
+-- (partition pruning) yalnızca bugünün bölümünü okur
+-- ============================================================
+
+CREATE VIEW v_daily_summary AS
+SELECT
+    COUNT(DISTINCT e.user_id) AS active_users,
+    COUNT(e.event_id) AS total_events,
+    COUNT(a.action_id) AS total_actions,
+    COUNT(d.decision_id) AS total_decisions,
+    CURRENT_DATE AS summary_date
+FROM events e
+LEFT JOIN actions a ON a.created_at >= CURRENT_DATE AND a.created_at < CURRENT_DATE + 1
+LEFT JOIN decisions d ON d.timestamp >= CURRENT_DATE AND d.timestamp < CURRENT_DATE + 1
+WHERE e.timestamp >= CURRENT_DATE AND e.timestamp < CURRENT_DATE + 1;
+
+CREATE VIEW v_recent_actions AS
+SELECT
+    a.action_id,
+    a.user_id,
+    u.name AS user_name,
+    a.action_type,
+    a.message,
+    a.created_at
+FROM actions a
+JOIN users u ON a.user_id = u.user_id
+ORDER BY a.created_at DESC
+LIMIT 50;
+
+-- ============================================================
+-- Migration tamamlandı!
+-- Bölüm bakımı: python -m src.partitions (cron ile günlük)
+-- ============================================================
@@ -0,0 +1,48 @@
+-- ============================================================
+-- Turkcell Decision Engine - Shadow Rules Migration
+-- Aday kural setinin üretim kurallarıyla yan yana (gölge) değerlendirilmesi
+-- ============================================================
+
+-- ============================================================
+-- SHADOW_RULES TABLOSU
+-- Üretime alınmadan önce denenen aday kural seti (rules ile aynı yapı)
+-- ============================================================
+
+CREATE TABLE shadow_rules (
+    rule_id VARCHAR(10) PRIMARY KEY,
+    condition TEXT NOT NULL,
+    action action_type_enum NOT NULL,
+    priority INTEGER NOT NULL CHECK (priority >= 1),
+    is_active BOOLEAN DEFAULT TRUE,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE shadow_rules IS 'Gölge modda değerlendirilen aday kurallar';
+
+CREATE TRIGGER trg_shadow_rules_updated
+    BEFORE UPDATE ON shadow_rules
+    FOR EACH ROW
+    EXECUTE FUNCTION update_timestamp();
+
+-- ============================================================
+-- SHADOW_DECISIONS TABLOSU
+-- Örneklenen her değerlendirmede iki kural setinin sonucu
+-- (aksiyon gönderilmez, sadece karşılaştırma için saklanır)
+-- ============================================================
+
+CREATE TABLE shadow_decisions (
+    shadow_decision_id BIGSERIAL PRIMARY KEY,
+    user_id VARCHAR(10) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    source VARCHAR(10) NOT NULL,  -- EVENT, USER veya SWEEP
+    production_rules TEXT[] NOT NULL,
+    shadow_rules TEXT[] NOT NULL,
+    production_action action_type_enum,
+    shadow_action action_type_enum,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE shadow_decisions IS 'Gölge kural seti ile üretim kurallarının karşılaştırma kayıtları';
+
+CREATE INDEX idx_shadow_decisions_timestamp ON shadow_decisions(timestamp);
@@ -0,0 +1,239 @@
+-- ============================================================
+-- Turkcell Decision Engine - Summary Counters Migration
+-- Dashboard sayaçlarının tetikleyicilerle artımlı tutulması
+-- ============================================================
+
+-- Dashboard özeti her yenilemede events/decisions/actions üzerinde
+-- COUNT(*) çalıştırmak yerine bu tablodan okunur. Sayaçlar, satırları
+-- ekleyen/silen ifadeyle aynı transaction içinde güncellenir.
+
+-- ============================================================
+-- SUMMARY_COUNTERS TABLOSU
+-- counter: 'events', 'decisions', 'actions', 'users', 'risk:<seviye>'
+--          (risk_level NULL olan kullanıcılar 'risk:NULL' altında sayılır)
+-- day: günlük sayaç için gün, toplam için '-infinity'
+-- slot: eşzamanlı yazan oturumlar aynı satırı kilitlemesin diye
+--       sayaç oturum bazında 16 satıra bölünür; okurken toplanır
+-- ============================================================
+
+CREATE TABLE summary_counters (
+    counter VARCHAR(30) NOT NULL,
+    day DATE NOT NULL,
+    slot SMALLINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (counter, day, slot)
+);
+
+COMMENT ON TABLE summary_counters IS 'Dashboard için artımlı tutulan toplam ve günlük sayaçlar';
+
+CREATE OR REPLACE FUNCTION summary_slot()
+RETURNS SMALLINT AS $$
+    SELECT (pg_backend_pid() % 16)::SMALLINT;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================
+-- İFADE BAZLI TETİKLEYİCİLER (transition table)
+-- TG_ARGV[0]: sayaç adı, TG_ARGV[1]: gün sütunu (yoksa sadece toplam)
+-- Toplu INSERT/COPY tek seferde, satır sayısından bağımsız tek upsert yapar
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION summary_count_rows()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_sign INTEGER := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+    v_rows TEXT := CASE WHEN TG_OP = 'INSERT' THEN 'new_rows' ELSE 'old_rows' END;
+    v_day TEXT := CASE WHEN TG_NARGS > 1 THEN format('DATE(%I)', TG_ARGV[1]) ELSE 'NULL::date' END;
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO summary_counters AS c (counter, day, slot, value)
+        SELECT %L, COALESCE(day, '-infinity'), summary_slot(), %s * COUNT(*)
+        FROM (SELECT %s AS day FROM %I) r
+        GROUP BY GROUPING SETS ((day), ())
+        HAVING COUNT(*) > 0 AND (GROUPING(day) = 1 OR day IS NOT NULL)
+        ON CONFLICT (counter, day, slot) DO UPDATE SET value = c.value + EXCLUDED.value
+    $q$, TG_ARGV[0], v_sign, v_day, v_rows);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION summary_count_truncate()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM summary_counters WHERE counter = TG_ARGV[0] OR counter LIKE TG_ARGV[0] || ':%';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_summary_events_insert AFTER INSERT ON events
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('events', 'timestamp');
+CREATE TRIGGER trg_summary_events_delete AFTER DELETE ON events
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('events', 'timestamp');
+CREATE TRIGGER trg_summary_events_truncate AFTER TRUNCATE ON events
+    FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate('events');
+
+CREATE TRIGGER trg_summary_decisions_insert AFTER INSERT ON decisions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('decisions', 'timestamp');
+CREATE TRIGGER trg_summary_decisions_delete AFTER DELETE ON decisions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('decisions', 'timestamp');
+CREATE TRIGGER trg_summary_decisions_truncate AFTER TRUNCATE ON decisions
+    FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate('decisions');
+
+CREATE TRIGGER trg_summary_actions_insert AFTER INSERT ON actions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('actions', 'created_at');
+CREATE TRIGGER trg_summary_actions_delete AFTER DELETE ON actions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('actions', 'created_at');
+CREATE TRIGGER trg_summary_actions_truncate AFTER TRUNCATE ON actions
+    FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate('actions');
+
+CREATE TRIGGER trg_summary_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('users');
+CREATE TRIGGER trg_summary_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_rows('users');
+CREATE TRIGGER trg_summary_users_truncate AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate('users');
+
+-- ============================================================
+-- RİSK DAĞILIMI
+-- Ekleme/silme ifade bazlı; risk seviyesi değişimi ise satır bazlı ve
+-- WHEN koşullu: seviye değişmeyen (çoğunluk) güncellemelerde tetiklenmez
+-- ============================================================
+
+-- user_state.risk_level NULL olabilir; 'risk:' || NULL anahtarı NULL yapar
+-- ve NOT NULL counter sütunu yüzünden tetikleyiciyi tetikleyen yazma da
+-- başarısız olur. Bu yüzden anahtar her yerde bu fonksiyonla üretilir.
+CREATE OR REPLACE FUNCTION summary_risk_counter(p_level risk_level_enum)
+RETURNS TEXT AS $$
+    SELECT 'risk:' || COALESCE(p_level::text, 'NULL');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION summary_count_risk_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO summary_counters AS c (counter, day, slot, value)
+        SELECT summary_risk_counter(risk_level), '-infinity', summary_slot(), COUNT(*)
+        FROM new_rows GROUP BY risk_level
+        ON CONFLICT (counter, day, slot) DO UPDATE SET value = c.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO summary_counters AS c (counter, day, slot, value)
+        SELECT summary_risk_counter(risk_level), '-infinity', summary_slot(), -COUNT(*)
+        FROM old_rows GROUP BY risk_level
+        ON CONFLICT (counter, day, slot) DO UPDATE SET value = c.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION summary_count_risk_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO summary_counters AS c (counter, day, slot, value)
+    VALUES (summary_risk_counter(OLD.risk_level), '-infinity', summary_slot(), -1),
+           (summary_risk_counter(NEW.risk_level), '-infinity', summary_slot(), 1)
+    ON CONFLICT (counter, day, slot) DO UPDATE SET value = c.value + EXCLUDED.value;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_summary_risk_insert AFTER INSERT ON user_state
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_risk_rows();
+CREATE TRIGGER trg_summary_risk_delete AFTER DELETE ON user_state
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+    EXECUTE FUNCTION summary_count_risk_rows();
+CREATE TRIGGER trg_summary_risk_update AFTER UPDATE OF risk_level ON user_state
+    FOR EACH ROW WHEN (OLD.risk_level IS DISTINCT FROM NEW.risk_level)
+    EXECUTE FUNCTION summary_count_risk_change();
+CREATE TRIGGER trg_summary_risk_truncate AFTER TRUNCATE ON user_state
+    FOR EACH STATEMENT EXECUTE FUNCTION summary_count_truncate('risk');
+
+-- ============================================================
+-- YENİDEN HESAPLAMA
+-- Mevcut veriden sayaçları baştan kurar (ilk kurulum ve onarım için)
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION rebuild_summary_counters()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE users, events, decisions, actions, user_state IN SHARE MODE;
+    DELETE FROM summary_counters;
+
+    INSERT INTO summary_counters (counter, day, slot, value)
+    SELECT 'users', '-infinity', 0, COUNT(*) FROM users;
+
+    INSERT INTO summary_counters (counter, day, slot, value)
+    SELECT 'events', COALESCE(DATE(timestamp), '-infinity'), 0, COUNT(*)
+    FROM events GROUP BY GROUPING SETS ((DATE(timestamp)), ())
+    HAVING GROUPING(DATE(timestamp)) = 1 OR DATE(timestamp) IS NOT NULL;
+
+    INSERT INTO summary_counters (counter, day, slot, value)
+    SELECT 'decisions', COALESCE(DATE(timestamp), '-infinity'), 0, COUNT(*)
+    FROM decisions GROUP BY GROUPING SETS ((DATE(timestamp)), ())
+    HAVING GROUPING(DATE(timestamp)) = 1 OR DATE(timestamp) IS NOT NULL;
+
+    INSERT INTO summary_counters (counter, day, slot, value)
+    SELECT 'actions', COALESCE(DATE(created_at), '-infinity'), 0, COUNT(*)
+    FROM actions GROUP BY GROUPING SETS ((DATE(created_at)), ())
+    HAVING GROUPING(DATE(created_at)) = 1 OR DATE(created_at) IS NOT NULL;
+
+    INSERT INTO summary_counters (counter, day, slot, value)
+    SELECT summary_risk_counter(risk_level), '-infinity', 0, COUNT(*)
+    FROM user_state GROUP BY risk_level;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_summary_counters();
+
+-- ============================================================
+-- KONTROL
+-- Geçici bir kullanıcının risk seviyesi NULL -> HIGH -> NULL -> MEDIUM değişir,
+-- sayaçlar user_state ile karşılaştırılır ve değişiklikler geri alınır.
+-- Uyuşmazlıkta migration hata verir.
+-- ============================================================
+
+DO $$
+BEGIN
+    BEGIN
+        INSERT INTO users (user_id, name, city) VALUES ('~SUMCHECK', 'summary check', '-');
+        INSERT INTO user_state (user_id, risk_level) VALUES ('~SUMCHECK', NULL);
+        UPDATE user_state SET risk_level = 'HIGH' WHERE user_id = '~SUMCHECK';
+        UPDATE user_state SET risk_level = NULL WHERE user_id = '~SUMCHECK';
+        UPDATE user_state SET risk_level = 'MEDIUM' WHERE user_id = '~SUMCHECK';
+
+        IF EXISTS (
+            SELECT 1
+            FROM (
+                SELECT summary_risk_counter(risk_level) AS counter, COUNT(*) AS expected
+                FROM user_state GROUP BY risk_level
+            ) s
+            FULL JOIN (
+                SELECT counter, SUM(value) AS actual
+                FROM summary_counters
+                WHERE counter LIKE 'risk:%' AND day = '-infinity'
+                GROUP BY counter
+                HAVING SUM(value) <> 0
+            ) c USING (counter)
+            WHERE s.expected IS DISTINCT FROM c.actual
+        ) THEN
+            RAISE EXCEPTION 'summary_counters risk distribution does not match user_state';
+        END IF;
+
+        -- Kontrol verisini geri al
+        RAISE SQLSTATE 'SC000';
+    EXCEPTION WHEN SQLSTATE 'SC000' THEN
+        NULL;
+    END;
+END;
+$$;
+
+-- ============================================================
+-- Migration tamamlandı!
+-- ============================================================
@@ -219,6 +219,13 @@ $$ LANGUAGE plpgsql;
 CREATE OR REPLACE FUNCTION update_user_state_from_event()
 RETURNS TRIGGER AS $$
 BEGIN
+    -- Toplu yüklemede (src/ingestion.py) state değişimleri Python tarafında
+    -- kullanıcı bazında toplanıp tek bir upsert ile yazılır
+    IF current_setting('decision_engine.bulk_ingest', true) = 'on' THEN
+        NEW.processed = TRUE;
+        RETURN NEW;
+    END IF;
+    
     -- User state yoksa oluştur
     INSERT INTO user_state (user_id, state_date)
     VALUES (NEW.user_id, CURRENT_DATE)
@@ -291,9 +298,15 @@ CREATE TRIGGER trg_rules_updated
 -- 6. SEQUENCES (ID generation için)
 -- ============================================================
 
+-- event_id_seq: düz sayaç (EVT-1001, EVT-1002, ...); hi/lo bloklarında kullanmayın
 CREATE SEQUENCE event_id_seq START 1001;
+-- action_id_seq / decision_id_seq: rule engine hi/lo blokları için "hi" değeri verir
+-- (her nextval ENGINE_ID_BLOCK_SIZE adet ID ayırır, örn. 900 -> D-900000..D-900999)
 CREATE SEQUENCE action_id_seq START 1000;
 CREATE SEQUENCE decision_id_seq START 900;
+-- ingest_event_id_seq: toplu yüklemenin (src/ingestion.py) hi/lo blokları;
+-- ayrı 'EVT-I' öneki sayesinde event_id_seq ile üretilen ID'lerle çakışmaz
+CREATE SEQUENCE ingest_event_id_seq START 1000;
 
 -- ============================================================
 -- Şema oluşturma tamamlandı!
@@ -0,0 +1,257 @@
+"""
+Turkcell Decision Engine - Backtest
+Replays historical events through a rule set and diffs against real decisions
+
+Usage:
+    python -m src.backtest --from 2026-10-01 --to 2026-10-08 [--rules rules.json]
+                           [--workers 4] [--edge] [--diff diff.csv]
+"""
+
+import csv
+import json
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as day_time
+from typing import Dict, List, Optional, Tuple
+
+from .config import engine_config
+from .condition_compiler import STATE_FIELDS
+from .database import db, RuleRepository
+from .incremental import IncrementalEvaluator
+from .rule_cache import compile_rules
+from .rule_index import UNIT_FIELDS
+from .sweep import init_worker
+
+logger = logging.getLogger(__name__)
+
+
+# Events of one user partition, including the part of the first day that
+# lies before the window (it only warms up the daily state)
+EVENTS_QUERY = """
+    SELECT user_id, event_id, timestamp, unit::text, value::float8
+    FROM events
+    WHERE timestamp >= %s AND timestamp < %s
+      AND mod(abs(hashtext(user_id)::bigint), %s) = %s
+    ORDER BY timestamp, event_id
+"""
+
+ACTUAL_DECISIONS_QUERY = """
+    SELECT user_id, timestamp::date AS day, selected_action::text AS action, COUNT(*) AS decisions
+    FROM decisions
+    WHERE timestamp >= %s AND timestamp < %s
+      AND mod(abs(hashtext(user_id)::bigint), %s) = %s
+    GROUP BY 1, 2, 3
+"""
+
+DiffKey = Tuple[str, date, str]    # (user_id, day, selected action)
+
+
+@dataclass
+class BacktestStats:
+    """Replay results for one user partition, or merged over all partitions"""
+    events: int = 0
+    users: int = 0
+    partitions: int = 0
+    seconds: float = 0.0
+    replayed: Counter = field(default_factory=Counter)     # action -> replayed decisions
+    actual: Counter = field(default_factory=Counter)       # action -> real decisions
+    matched: int = 0
+    only_replayed: int = 0
+    only_actual: int = 0
+    diff: List[Tuple[str, date, str, int, int]] = field(default_factory=list)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+    def merge(self, other: 'BacktestStats'):
+        """Add another partition's results to this one"""
+        self.events += other.events
+        self.users += other.users
+        self.partitions += other.partitions
+        self.replayed.update(other.replayed)
+        self.actual.update(other.actual)
+        self.matched += other.matched
+        self.only_replayed += other.only_replayed
+        self.only_actual += other.only_actual
+        self.diff.extend(other.diff)
+
+
+def _empty_state(day: date) -> Dict:
+    state = dict.fromkeys(STATE_FIELDS, 0.0)
+    state['state_date'] = day
+    return state
+
+
+def _diff(stats: BacktestStats, replayed: Counter, actual: Counter):
+    """Compare decision counts per (user, day, action)"""
+    for key in replayed.keys() | actual.keys():
+        ours, theirs = replayed.get(key, 0), actual.get(key, 0)
+        stats.matched += min(ours, theirs)
+        if ours != theirs:
+            stats.only_replayed += max(ours - theirs, 0)
+            stats.only_actual += max(theirs - ours, 0)
+            stats.diff.append(key + (ours, theirs))
+    for (_, _, action), count in replayed.items():
+        stats.replayed[action] += count
+    for (_, _, action), count in actual.items():
+        stats.actual[action] += count
+
+
+def replay_partition(rules: List[Dict], start: datetime, end: datetime,
+                     partition: int, partitions: int, edge_triggered: bool = False,
+                     itersize: int = 10000) -> BacktestStats:
+    """
+    Replay the events of one hash partition of users in timestamp order.
+
+    Per-user state is kept in memory and accumulated like
+    update_user_state_from_event, starting from zero on each calendar day.
+    After every event the rules reading the changed field are matched, as
+    RuleEngine.process_event does (with edge_triggered, only false -> true
+    transitions count, as in incremental mode). The run is a single
+    read-only transaction, so nothing can be written.
+    """
+    started = time.monotonic()
+    rule_set = compile_rules(rules, version=('backtest',))
+    incremental = IncrementalEvaluator() if edge_triggered else None
+
+    states: Dict[str, Dict] = {}
+    replayed: Counter = Counter()
+    events = 0
+    warm_up_from = datetime.combine(start.date(), day_time.min)
+
+    with db.transaction():
+        db.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+        # Server-side cursor: rows arrive itersize at a time
+        rows = db.stream(EVENTS_QUERY, (warm_up_from, end, partitions, partition), itersize, dict_cursor=False)
+        for user_id, _, timestamp, unit, value in rows:
+            state_field = UNIT_FIELDS[unit]
+            day = timestamp.date()
+
+            state = states.get(user_id)
+            if state is None or state['state_date'] != day:
+                state = states[user_id] = _empty_state(day)
+
+            if timestamp < start:
+                state[state_field] += value
+                continue
+
+            events += 1
+            if incremental is not None:
+                old_state = dict(state)
+                state[state_field] += value
+                transition = incremental.evaluate(rule_set, user_id, old_state, state)
+                incremental.commit(transition)
+                fired = transition.newly_true
+            else:
+                state[state_field] += value
+                fired = rule_set.match(state, (state_field,))
+
+            if fired:
+                replayed[(user_id, day, fired[0].action)] += 1
+
+        actual = Counter({
+            (row['user_id'], row['day'], row['action']): row['decisions']
+            for row in db.execute(ACTUAL_DECISIONS_QUERY, (start, end, partitions, partition)) or []
+        })
+
+    stats = BacktestStats(events=events, users=len(states), partitions=1)
+    _diff(stats, replayed, actual)
+    stats.seconds = time.monotonic() - started
+    return stats
+
+
+def run_backtest(start: datetime, end: datetime, rules: Optional[List[Dict]] = None,
+                 workers: Optional[int] = None, partitions: Optional[int] = None,
+                 edge_triggered: Optional[bool] = None) -> BacktestStats:
+    """
+    Replay events in [start, end) through rules (default: the active rules)
+    in parallel user partitions and diff the result against the decisions
+    table. Only reads from the database.
+    """
+    if rules is None:
+        rules = RuleRepository(db).get_active() or []
+    rules = [dict(rule) for rule in rules]
+    if edge_triggered is None:
+        edge_triggered = engine_config.incremental
+
+    workers = workers or engine_config.sweep_workers or os.cpu_count() or 1
+    partitions = partitions or workers
+    args = [(rules, start, end, partition, partitions, edge_triggered) for partition in range(partitions)]
+
+    total = BacktestStats()
+    started = time.monotonic()
+
+    if workers == 1:
+        for arg in args:
+            total.merge(replay_partition(*arg))
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker) as executor:
+            futures = [executor.submit(replay_partition, *arg) for arg in args]
+            for future in as_completed(futures):
+                total.merge(future.result())
+
+    total.seconds = time.monotonic() - started
+    total.diff.sort()
+    logger.info(
+        f"Backtest replayed {total.events} events for {total.users} users in {total.seconds:.1f}s "
+        f"({total.events_per_second:.0f} events/s): {sum(total.replayed.values())} decisions, "
+        f"{total.matched} matched, {total.only_replayed} only in replay, {total.only_actual} only in decisions"
+    )
+    return total
+
+
+def write_diff(stats: BacktestStats, path: str):
+    """Write the per (user, day, action) differences as CSV"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'day', 'action', 'replayed', 'actual'])
+        writer.writerows(stats.diff)
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay events through a rule set and diff against decisions")
+    parser.add_argument('--from', dest='start', type=_parse_time, required=True, help="window start (ISO date/time)")
+    parser.add_argument('--to', dest='end', type=_parse_time, required=True, help="window end, exclusive")
+    parser.add_argument('--rules', help="JSON file with a list of rules (default: active rules)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--partitions', type=int, default=None, help="user partitions (default: one per worker)")
+    parser.add_argument('--edge', action='store_true', default=None,
+                        help="count only false -> true rule transitions (incremental mode)")
+    parser.add_argument('--diff', help="write the decision diff to this CSV file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+
+    rules = None
+    if args.rules:
+        with open(args.rules, encoding='utf-8') as f:
+            rules = json.load(f)
+
+    stats = run_backtest(args.start, args.end, rules, args.workers, args.partitions, args.edge)
+    if args.diff:
+        write_diff(stats, args.diff)
+
+    print(f"events={stats.events} users={stats.users} seconds={stats.seconds:.1f} rate={stats.events_per_second:.0f}/s")
+    print(f"matched={stats.matched} only_replayed={stats.only_replayed} only_actual={stats.only_actual}")
+    for action in sorted(stats.replayed.keys() | stats.actual.keys()):
+        print(f"  {action}: replayed={stats.replayed.get(action, 0)} actual={stats.actual.get(action, 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Turkcell Decision Engine - Batch Evaluator
+Vectorized rule evaluation over columnar user state with NumPy
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .condition_compiler import (
+    STATE_FIELDS, COMPARISON_OPERATORS, Node, Operand,
+    Number, Comparison, Between, BoolOp
+)
+from .rule_cache import CompiledRule, RuleSet
+
+
+@dataclass
+class StateColumns:
+    """Columnar view of user_state rows: one float64 array per metric"""
+    user_ids: Sequence[str]
+    columns: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Mapping], fields: Iterable[str] = STATE_FIELDS) -> 'StateColumns':
+        """Build columns from user_state rows (NULL values become 0)"""
+        count = len(rows)
+        columns = {
+            field: np.fromiter(
+                (float(row.get(field) or 0) for row in rows),
+                dtype=np.float64,
+                count=count
+            )
+            for field in fields
+        }
+        return cls([row['user_id'] for row in rows], columns)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def _operand_values(operand: Operand, columns: Mapping[str, np.ndarray], size: int):
+    if isinstance(operand, Number):
+        return operand.value
+    values = columns.get(operand.name)
+    # Missing fields read as 0, same as the scalar evaluator
+    return values if values is not None else np.zeros(size)
+
+
+def evaluate_mask(node: Node, columns: Mapping[str, np.ndarray], size: int) -> np.ndarray:
+    """Evaluate a condition AST over whole columns, returning a boolean mask"""
+    if isinstance(node, Comparison):
+        compare = COMPARISON_OPERATORS[node.op]
+        result = compare(
+            _operand_values(node.left, columns, size),
+            _operand_values(node.right, columns, size)
+        )
+        return np.broadcast_to(np.asarray(result, dtype=bool), (size,))
+
+    if isinstance(node, Between):
+        value = _operand_values(node.operand, columns, size)
+        result = (_operand_values(node.low, columns, size) <= value) & \
+                 (value <= _operand_values(node.high, columns, size))
+        return np.broadcast_to(np.asarray(result, dtype=bool), (size,))
+
+    if isinstance(node, BoolOp):
+        masks = [evaluate_mask(child, columns, size) for child in node.operands]
+        if node.op == 'AND':
+            return np.logical_and.reduce(masks)
+        return np.logical_or.reduce(masks)
+
+    raise TypeError(f"Unknown AST node: {node!r}")
+
+
+@dataclass
+class BatchResult:
+    """Outcome of evaluating a rule set over a batch of users"""
+    rules: Tuple[CompiledRule, ...]
+    masks: np.ndarray           # shape (rules, users), True where the rule fired
+    selected: np.ndarray        # index into rules of the selected rule per user
+    has_decision: np.ndarray    # True where at least one rule fired
+
+    def triggered_rules(self, user_index: int) -> List[Dict]:
+        """Triggered rule rows for one user, in priority order"""
+        return [self.rules[r].rule for r in np.flatnonzero(self.masks[:, user_index])]
+
+    def decided_users(self) -> np.ndarray:
+        """Indices of users with at least one triggered rule"""
+        return np.flatnonzero(self.has_decision)
+
+
+def evaluate_batch(rule_set: RuleSet, state: StateColumns,
+                   rules: Optional[Sequence[CompiledRule]] = None,
+                   mask_cache: Optional[Dict[str, np.ndarray]] = None) -> BatchResult:
+    """
+    Evaluate every rule as a boolean mask over all users and pick the
+    highest-priority (lowest number) triggered rule per user with argmin.
+    mask_cache (condition text -> mask) lets several rule sets evaluated
+    over the same state share the masks of identical conditions.
+    """
+    rules = tuple(rules if rules is not None else rule_set.rules)
+    size = len(state)
+
+    if not rules or not size:
+        return BatchResult(
+            rules, np.zeros((len(rules), size), dtype=bool),
+            np.zeros(size, dtype=np.intp), np.zeros(size, dtype=bool)
+        )
+
+    if mask_cache is None:
+        mask_cache = {}
+    for r in rules:
+        if r.condition.source not in mask_cache:
+            mask_cache[r.condition.source] = evaluate_mask(r.condition.ast, state.columns, size)
+    masks = np.vstack([mask_cache[r.condition.source] for r in rules])
+
+    # Rules are sorted by priority, so argmin returns the first rule among
+    # equal priorities - the same choice the scalar path makes
+    priorities = np.array([r.priority for r in rules], dtype=np.float64)
+    ranked = np.where(masks, priorities[:, None], np.inf)
+    selected = ranked.argmin(axis=0)
+    has_decision = masks.any(axis=0)
+
+    return BatchResult(rules, masks, selected, has_decision)
@@ -0,0 +1,385 @@
+"""
+Turkcell Decision Engine - Condition Compiler
+Parses rule conditions into an AST once and lowers them to closures
+"""
+
+import re
+import operator
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+
+
+# Numeric fields of user_state that rule conditions may reference
+STATE_FIELDS: Tuple[str, ...] = (
+    'internet_today_gb',
+    'spend_today_try',
+    'content_minutes_today'
+)
+
+COMPARISON_OPERATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '==': operator.eq
+}
+
+
+class ConditionSyntaxError(ValueError):
+    """Raised when a rule condition cannot be parsed"""
+
+
+# ============================================================
+# AST Nodes
+# ============================================================
+
+@dataclass(frozen=True)
+class Field:
+    """Reference to a user_state field"""
+    name: str
+
+
+@dataclass(frozen=True)
+class Number:
+    """Numeric literal"""
+    value: float
+
+
+Operand = Union[Field, Number]
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """Binary comparison: left op right"""
+    op: str
+    left: Operand
+    right: Operand
+
+
+@dataclass(frozen=True)
+class Between:
+    """Inclusive range check: operand BETWEEN low AND high"""
+    operand: Operand
+    low: Operand
+    high: Operand
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    """AND / OR over two or more sub-conditions"""
+    op: str
+    operands: Tuple['Node', ...]
+
+
+Node = Union[Comparison, Between, BoolOp]
+
+
+# ============================================================
+# Tokenizer
+# ============================================================
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<number>(?:\d+(?:\.\d*)?|\.\d+))
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>>=|<=|==|>|<|&&|\|\||\(|\)|-)
+  | (?P<space>\s+)
+""", re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'BETWEEN'}
+_SYMBOL_ALIASES = {'&&': 'AND', '||': 'OR'}
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str   # NUMBER, NAME, KEYWORD, OP
+    value: str
+    pos: int
+
+
+def tokenize(condition: str) -> List[Token]:
+    """Split a condition string into tokens"""
+    tokens = []
+    pos = 0
+    while pos < len(condition):
+        match = _TOKEN_PATTERN.match(condition, pos)
+        if not match:
+            raise ConditionSyntaxError(
+                f"Unexpected character {condition[pos]!r} at position {pos}"
+            )
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'number':
+            tokens.append(Token('NUMBER', text, pos))
+        elif kind == 'name':
+            if text.upper() in _KEYWORDS:
+                tokens.append(Token('KEYWORD', text.upper(), pos))
+            else:
+                tokens.append(Token('NAME', text, pos))
+        elif kind == 'op':
+            if text in _SYMBOL_ALIASES:
+                tokens.append(Token('KEYWORD', _SYMBOL_ALIASES[text], pos))
+            else:
+                tokens.append(Token('OP', text, pos))
+        pos = match.end()
+    return tokens
+
+
+# ============================================================
+# Parser
+# ============================================================
+
+class _Parser:
+    """
+    Recursive descent parser for the rule grammar:
+
+        expr       := and_expr (OR and_expr)*
+        and_expr   := primary (AND primary)*
+        primary    := '(' expr ')' | predicate
+        predicate  := operand BETWEEN operand AND operand
+                    | operand (cmp_op operand)+
+        operand    := NAME | ['-'] NUMBER
+
+    Every predicate (each pair of a chained comparison) must reference a field.
+    """
+
+    def __init__(self, condition: str, fields: Optional[FrozenSet[str]]):
+        self.condition = condition
+        self.fields = fields
+        self.tokens = tokenize(condition)
+        self.index = 0
+
+    def peek(self) -> Optional[Token]:
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise ConditionSyntaxError(f"Unexpected end of condition: {self.condition!r}")
+        self.index += 1
+        return token
+
+    def accept(self, kind: str, value: str) -> bool:
+        token = self.peek()
+        if token and token.kind == kind and token.value == value:
+            self.index += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: str):
+        if not self.accept(kind, value):
+            token = self.peek()
+            found = repr(token.value) if token else 'end of condition'
+            raise ConditionSyntaxError(f"Expected {value!r}, found {found}")
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ConditionSyntaxError("Empty condition")
+        node = self.parse_or()
+        token = self.peek()
+        if token is not None:
+            raise ConditionSyntaxError(
+                f"Unexpected {token.value!r} at position {token.pos}"
+            )
+        return node
+
+    def parse_or(self) -> Node:
+        operands = [self.parse_and()]
+        while self.accept('KEYWORD', 'OR'):
+            operands.append(self.parse_and())
+        return _combine('OR', operands)
+
+    def parse_and(self) -> Node:
+        operands = [self.parse_primary()]
+        while self.accept('KEYWORD', 'AND'):
+            operands.append(self.parse_primary())
+        return _combine('AND', operands)
+
+    def parse_primary(self) -> Node:
+        if self.accept('OP', '('):
+            node = self.parse_or()
+            self.expect('OP', ')')
+            return node
+        return self.parse_predicate()
+
+    def parse_predicate(self) -> Node:
+        start = self.peek()
+        left = self.parse_operand()
+
+        if self.accept('KEYWORD', 'BETWEEN'):
+            low = self.parse_operand()
+            self.expect('KEYWORD', 'AND')
+            high = self.parse_operand()
+            _require_field((left, low, high), start)
+            return Between(left, low, high)
+
+        comparisons = []
+        while True:
+            token = self.peek()
+            if not (token and token.kind == 'OP' and token.value in COMPARISON_OPERATORS):
+                break
+            self.advance()
+            right = self.parse_operand()
+            _require_field((left, right), token)
+            comparisons.append(Comparison(token.value, left, right))
+            left = right
+
+        if not comparisons:
+            token = self.peek()
+            found = repr(token.value) if token else 'end of condition'
+            raise ConditionSyntaxError(f"Expected comparison operator, found {found}")
+
+        # Chained comparisons (10 < x < 15) behave like Python: pairwise AND
+        return _combine('AND', comparisons)
+
+    def parse_operand(self) -> Operand:
+        token = self.advance()
+        if token.kind == 'NAME':
+            if self.fields is not None and token.value not in self.fields:
+                raise ConditionSyntaxError(f"Unknown field {token.value!r}")
+            return Field(token.value)
+        if token.kind == 'NUMBER':
+            return Number(float(token.value))
+        if token.kind == 'OP' and token.value == '-':
+            number = self.advance()
+            if number.kind != 'NUMBER':
+                raise ConditionSyntaxError(f"Expected number after '-', found {number.value!r}")
+            return Number(-float(number.value))
+        raise ConditionSyntaxError(f"Expected field or number, found {token.value!r}")
+
+
+def _require_field(operands: Tuple[Operand, ...], token: Token):
+    """
+    Reject predicates over constants only (1 > 2): they do not depend on
+    the user, so the rule would fire for everyone or for no one.
+    """
+    if not any(isinstance(o, Field) for o in operands):
+        raise ConditionSyntaxError(
+            f"Predicate at position {token.pos} compares constants only"
+        )
+
+
+def _combine(op: str, operands: List[Node]) -> Node:
+    """Build a flattened BoolOp, or return the single operand as-is"""
+    if len(operands) == 1:
+        return operands[0]
+    flat = []
+    for node in operands:
+        if isinstance(node, BoolOp) and node.op == op:
+            flat.extend(node.operands)
+        else:
+            flat.append(node)
+    return BoolOp(op, tuple(flat))
+
+
+def parse_condition(condition: str, fields: Optional[Iterable[str]] = STATE_FIELDS) -> Node:
+    """
+    Parse a condition string into an AST.
+    Pass fields=None to accept any identifier as a field name.
+    """
+    allowed = frozenset(fields) if fields is not None else None
+    return _Parser(condition, allowed).parse()
+
+
+# ============================================================
+# AST helpers
+# ============================================================
+
+def iter_predicates(node: Node):
+    """Yield every Comparison / Between leaf of the AST"""
+    if isinstance(node, BoolOp):
+        for child in node.operands:
+            yield from iter_predicates(child)
+    else:
+        yield node
+
+
+def referenced_fields(node: Node) -> FrozenSet[str]:
+    """Return the set of state fields an AST reads"""
+    names = set()
+    for predicate in iter_predicates(node):
+        if isinstance(predicate, Comparison):
+            operands = (predicate.left, predicate.right)
+        else:
+            operands = (predicate.operand, predicate.low, predicate.high)
+        names.update(o.name for o in operands if isinstance(o, Field))
+    return frozenset(names)
+
+
+# ============================================================
+# Lowering
+# ============================================================
+
+StateReader = Callable[[Mapping], float]
+Predicate = Callable[[Mapping], bool]
+
+
+def read_field(state: Mapping, name: str) -> float:
+    """Read a numeric state field, treating missing / NULL values as 0"""
+    value = state.get(name)
+    return float(value) if value is not None else 0.0
+
+
+def _lower_operand(operand: Operand) -> StateReader:
+    if isinstance(operand, Number):
+        value = operand.value
+        return lambda state: value
+    name = operand.name
+    return lambda state: read_field(state, name)
+
+
+def _lower(node: Node) -> Predicate:
+    if isinstance(node, Comparison):
+        compare = COMPARISON_OPERATORS[node.op]
+        # Fast path for the common "field op constant" shape
+        if isinstance(node.left, Field) and isinstance(node.right, Number):
+            name, constant = node.left.name, node.right.value
+            return lambda state: compare(read_field(state, name), constant)
+        left, right = _lower_operand(node.left), _lower_operand(node.right)
+        return lambda state: compare(left(state), right(state))
+
+    if isinstance(node, Between):
+        if all(isinstance(o, Number) for o in (node.low, node.high)):
+            low, high = node.low.value, node.high.value
+            value = _lower_operand(node.operand)
+            return lambda state: low <= value(state) <= high
+        value, low, high = (_lower_operand(o) for o in (node.operand, node.low, node.high))
+        return lambda state: low(state) <= value(state) <= high(state)
+
+    if isinstance(node, BoolOp):
+        children = tuple(_lower(child) for child in node.operands)
+        if node.op == 'AND':
+            return lambda state: all(child(state) for child in children)
+        return lambda state: any(child(state) for child in children)
+
+    raise TypeError(f"Unknown AST node: {node!r}")
+
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    """A parsed condition together with its evaluator"""
+    source: str
+    ast: Node
+    fields: FrozenSet[str]
+    evaluate: Predicate
+
+    def __call__(self, user_state: Mapping) -> bool:
+        return self.evaluate(user_state)
+
+
+@lru_cache(maxsize=4096)
+def compile_condition(condition: str) -> CompiledCondition:
+    """
+    Compile a condition string into a CompiledCondition.
+    Results are cached by condition text, so identical rule versions
+    are only parsed once. Raises ConditionSyntaxError on invalid input.
+    """
+    ast = parse_condition(condition)
+    return CompiledCondition(
+        source=condition,
+        ast=ast,
+        fields=referenced_fields(ast),
+        evaluate=_lower(ast)
+    )
@@ -20,6 +20,33 @@ class DatabaseConfig:
     name: str = os.getenv("DB_NAME", "turkcell_decision_engine")
     user: str = os.getenv("DB_USER", "postgres")
     password: str = os.getenv("DB_PASSWORD", "")
+    
+    # Connection pool (psycopg2 keeps pool_min_size idle connections open;
+    # connections above that are closed when returned)
+    pool_min_size: int = int(os.getenv("DB_POOL_MIN", "4"))
+    pool_max_size: int = int(os.getenv("DB_POOL_MAX", "10"))
+    pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Connections idle longer than this (seconds) are pinged on checkout
+    health_check_interval: float = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "10"))
+    
+    # Query telemetry: per-statement stats keyed by normalized SQL, a slow-query
+    # log above slow_query_ms (0 = off) and EXPLAIN (ANALYZE, BUFFERS) for a
+    # sampled share (0-1) of slow SELECTs
+    query_stats: bool = os.getenv("DB_QUERY_STATS", "False").lower() == "true"
+    slow_query_ms: float = float(os.getenv("DB_SLOW_QUERY_MS", "0"))
+    explain_sample_rate: float = float(os.getenv("DB_EXPLAIN_SAMPLE_RATE", "0"))
+
+    # Range partitions (migration_partitioning.sql): days created ahead of today,
+    # retention per table in days (0 = keep forever) and whether expired
+    # partitions are dropped instead of only detached
+    partition_premake_days: int = int(os.getenv("DB_PARTITION_PREMAKE_DAYS", "7"))
+    events_retention_days: int = int(os.getenv("DB_EVENTS_RETENTION_DAYS", "0"))
+    decisions_retention_days: int = int(os.getenv("DB_DECISIONS_RETENTION_DAYS", "0"))
+    actions_retention_days: int = int(os.getenv("DB_ACTIONS_RETENTION_DAYS", "0"))
+    partition_drop_expired: bool = os.getenv("DB_PARTITION_DROP_EXPIRED", "False").lower() == "true"
+
+    # Rows fetched per round trip by streamed reads (server-side named cursors)
+    stream_itersize: int = int(os.getenv("DB_STREAM_ITERSIZE", "10000"))
 
     @property
     def connection_string(self) -> str:
@@ -54,6 +81,43 @@ class AppConfig:
     database_dir: Path = base_dir / "database"
 
 
+@dataclass
+class EngineConfig:
+    """Rule engine configuration"""
+    # Seconds between checks for rule changes made by other processes
+    rule_cache_check_interval: float = float(os.getenv("RULE_CACHE_CHECK_INTERVAL", "5.0"))
+    
+    # Users evaluated (and committed) per batch in full sweeps
+    batch_size: int = int(os.getenv("ENGINE_BATCH_SIZE", "50000"))
+    
+    # IDs reserved per sequence round trip; must match across all engine processes
+    id_block_size: int = int(os.getenv("ENGINE_ID_BLOCK_SIZE", "1000"))
+    
+    # Edge-triggered event processing: only emit decisions when a rule turns true
+    incremental: bool = os.getenv("ENGINE_INCREMENTAL", "False").lower() == "true"
+    # Users whose last rule truth values are kept in memory (least recently used evicted)
+    incremental_max_users: int = int(os.getenv("ENGINE_INCREMENTAL_MAX_USERS", "1000000"))
+    
+    # Worker processes for sharded full sweeps (0 = one per CPU core)
+    sweep_workers: int = int(os.getenv("ENGINE_SWEEP_WORKERS", "0"))
+    
+    # Seconds the columnar user_state used by rule impact previews is reused
+    preview_state_ttl: float = float(os.getenv("ENGINE_PREVIEW_STATE_TTL", "60"))
+    
+    # Shadow rule set: share of users (0-1) evaluated against shadow_rules (0 = off),
+    # JSONL output file (empty = shadow_decisions table) and write buffer size
+    shadow_sample_rate: float = float(os.getenv("ENGINE_SHADOW_SAMPLE_RATE", "0"))
+    shadow_output: str = os.getenv("ENGINE_SHADOW_OUTPUT", "")
+    shadow_flush_size: int = int(os.getenv("ENGINE_SHADOW_FLUSH_SIZE", "500"))
+    
+    # Stage latency histograms and rule counters; exported as Prometheus text
+    # on a local HTTP port (0 = off) and/or to a file written at exit
+    metrics: bool = os.getenv("ENGINE_METRICS", "False").lower() == "true"
+    metrics_port: int = int(os.getenv("ENGINE_METRICS_PORT", "0"))
+    metrics_file: str = os.getenv("ENGINE_METRICS_FILE", "")
+
+
 # Global config instances
 db_config = DatabaseConfig()
 app_config = AppConfig()
+engine_config = EngineConfig()
@@ -5,90 +5,791 @@ PostgreSQL connection and query management
 
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
-from typing import Optional, List, Dict, Any
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from typing import Optional, List, Dict, Any, Tuple, ClassVar, Iterator, Callable
+from datetime import datetime
+from collections import deque
 from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+import base64
+import itertools
+import json
 import logging
+import random
+import re
+import threading
+import time
 
 from .config import db_config
 
 logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(__name__ + '.slow')
+
+
+class TransactionAborted(Exception):
+    """Raised inside a transaction() block to roll it back"""
+
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    """
+    Server-side prepared statement.
+    query uses $1..$n parameters; args is the EXECUTE argument list
+    (psycopg2 placeholders, with casts where the server cannot infer them).
+    """
+    name: str
+    query: str
+    args: str = ""
+
+
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\$\d+|\b\d+(?:\.\d+)?\b")
+_SQL_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPACE = re.compile(r"\s+")
+_SQL_READ_ONLY = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_SQL_SIDE_EFFECTS = re.compile(
+    r"\b(?:INSERT|UPDATE|DELETE|MERGE|nextval|setval|pg_advisory\w*)\b|\bFOR\s+(?:UPDATE|SHARE)\b",
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(query: str) -> str:
+    """Statement text with literals and placeholders replaced by ? and whitespace collapsed"""
+    normalized = _SQL_LIST.sub('(?)', _SQL_LITERAL.sub('?', query))
+    return _SQL_SPACE.sub(' ', normalized).strip()
+
+
+def _estimate_bytes(rows: List, sample_size: int = 100) -> int:
+    """Approximate text size of a result, extrapolated from its first rows"""
+    sample = rows[:sample_size]
+    size = sum(
+        len(str(value))
+        for row in sample
+        for value in (row.values() if isinstance(row, dict) else row)
+        if value is not None
+    )
+    return size * len(rows) // len(sample)
+
+
+@dataclass
+class QueryStat:
+    """Telemetry for one normalized statement"""
+    query: str
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    slow_calls: int = 0
+    
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class QueryTelemetry:
+    """
+    Per-statement timing collected by the Database execute* methods.
+    
+    Statements are grouped by normalize_sql(). With db_config.query_stats
+    every call updates its QueryStat (calls, total/max time, rows and an
+    estimate of bytes fetched). Calls slower than db_config.slow_query_ms
+    are logged to the '<module>.slow' logger and kept in slow_queries; a
+    db_config.explain_sample_rate share of the slow read-only ones is
+    re-run under EXPLAIN (ANALYZE, BUFFERS) and the plan attached.
+    """
+    
+    def __init__(self, keep_slow: int = 100):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, QueryStat] = {}
+        self.slow_queries: deque = deque(maxlen=keep_slow)
+    
+    @property
+    def enabled(self) -> bool:
+        return db_config.query_stats or db_config.slow_query_ms > 0
+    
+    def record(self, query: str, seconds: float, rows: Optional[List] = None, rowcount: int = 0,
+               cursor=None, params: tuple = None, explain_query: str = None):
+        """
+        Account one executed statement.
+        rows is the fetched result (None for statements without one);
+        cursor/params allow an EXPLAIN of the same statement on the same
+        connection; explain_query overrides the text to explain.
+        """
+        key = normalize_sql(query)
+        row_count = len(rows) if rows is not None else max(rowcount, 0)
+        slow = 0 < db_config.slow_query_ms <= seconds * 1000
+        
+        if db_config.query_stats:
+            fetched = _estimate_bytes(rows) if rows else 0
+            with self._lock:
+                stat = self._stats.get(key)
+                if stat is None:
+                    stat = self._stats[key] = QueryStat(key)
+                stat.calls += 1
+                stat.total_time += seconds
+                stat.rows += row_count
+                stat.bytes += fetched
+                if seconds > stat.max_time:
+                    stat.max_time = seconds
+                if slow:
+                    stat.slow_calls += 1
+        
+        if not slow:
+            return
+        
+        plan = None
+        if cursor is not None and random.random() < db_config.explain_sample_rate and self.is_read_only(query):
+            plan = self._explain(cursor, explain_query or query, params)
+        
+        self.slow_queries.append({
+            'query': key,
+            'seconds': seconds,
+            'rows': row_count,
+            'plan': plan,
+            'timestamp': datetime.now()
+        })
+        slow_query_logger.warning(
+            f"Slow query ({seconds * 1000:.1f} ms, {row_count} rows): {key[:500]}"
+            + (f"\n{plan}" if plan else "")
+        )
+    
+    @staticmethod
+    def is_read_only(query: str) -> bool:
+        """True for statements safe to run twice (EXPLAIN ANALYZE executes them)"""
+        return bool(_SQL_READ_ONLY.match(query)) and not _SQL_SIDE_EFFECTS.search(query)
+    
+    def _explain(self, cursor, query: str, params: tuple = None) -> Optional[str]:
+        # Own savepoint so a failing EXPLAIN leaves the caller's transaction intact
+        with cursor.connection.cursor() as cur:
+            cur.execute("SAVEPOINT query_explain")
+            try:
+                cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+                plan = "\n".join(row[0] for row in cur.fetchall())
+                cur.execute("RELEASE SAVEPOINT query_explain")
+                return plan
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT query_explain")
+                logger.debug(f"EXPLAIN failed: {e}")
+                return None
+    
+    def top(self, limit: int = 20, order: str = 'total_time') -> List[QueryStat]:
+        """Statements with the highest total_time (or calls, max_time, rows, bytes, mean_time)"""
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=lambda stat: getattr(stat, order), reverse=True)[:limit]
+    
+    def report(self, limit: int = 20, order: str = 'total_time') -> str:
+        """Text table of the top statements"""
+        lines = [f"{'calls':>8} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'rows':>10} {'bytes':>12} {'slow':>5}  query"]
+        for stat in self.top(limit, order):
+            lines.append(
+                f"{stat.calls:>8} {stat.total_time * 1000:>10.1f} {stat.mean_time * 1000:>9.3f} "
+                f"{stat.max_time * 1000:>9.3f} {stat.rows:>10} {stat.bytes:>12} {stat.slow_calls:>5}  {stat.query[:120]}"
+            )
+        return "\n".join(lines)
+    
+    def reset(self):
+        """Drop collected statistics and slow queries"""
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
 
 
 class Database:
-    """PostgreSQL database connection manager"""
+    """
+    PostgreSQL connection manager backed by a thread-safe connection pool.
+    Each cursor() checks out its own connection, so the UI thread, the rule
+    engine and background jobs no longer share a single connection.
+    """
     
     _instance: Optional['Database'] = None
-    _connection = None
+    _pool: Optional[ThreadedConnectionPool] = None
     
     def __new__(cls):
         """Singleton pattern for database connection"""
         if cls._instance is None:
             cls._instance = super().__new__(cls)
+            cls._instance._init_pool_state()
         return cls._instance
     
+    def _init_pool_state(self):
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(db_config.pool_max_size)
+        # Keyed by connection object; entries vanish when a connection is closed
+        self._last_used: WeakKeyDictionary = WeakKeyDictionary()
+        self._prepared: WeakKeyDictionary = WeakKeyDictionary()
+        # Per-thread unit of work: bound connection and savepoint depth
+        self._local = threading.local()
+        self._stream_ids = itertools.count(1)
+        self.telemetry = QueryTelemetry()
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'reconnects': 0
+        }
+    
     def connect(self) -> bool:
-        """Establish database connection"""
+        """Create the connection pool and verify that the database is reachable"""
+        with self._pool_lock:
+            if self.is_connected:
+                return True
+            try:
+                self._pool = ThreadedConnectionPool(
+                    db_config.pool_min_size,
+                    db_config.pool_max_size,
+                    **db_config.connection_dict
+                )
+                logger.info(
+                    f"Connected to database: {db_config.name} "
+                    f"(pool {db_config.pool_min_size}-{db_config.pool_max_size})"
+                )
+                return True
+            except psycopg2.Error as e:
+                logger.error(f"Database connection failed: {e}")
+                self._pool = None
+                return False
+    
+    def disconnect(self):
+        """Close all pooled connections"""
+        with self._pool_lock:
+            if self._pool:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+                logger.info("Database connection closed")
+    
+    @property
+    def is_connected(self) -> bool:
+        """Check if the connection pool is open"""
+        return self._pool is not None and not self._pool.closed
+    
+    @property
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool metrics: checkouts, connections in use, waits and wait time"""
+        stats = dict(self._stats)
+        stats['max_size'] = db_config.pool_max_size
+        return stats
+    
+    def _is_healthy(self, conn) -> bool:
+        """Check a connection before handing it out"""
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(conn, 0.0)
+        if idle < db_config.health_check_interval:
+            return True
         try:
-            self._connection = psycopg2.connect(**db_config.connection_dict)
-            self._connection.autocommit = False
-            logger.info(f"Connected to database: {db_config.name}")
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
             return True
-        except psycopg2.Error as e:
-            logger.error(f"Database connection failed: {e}")
+        except psycopg2.Error:
             return False
     
-    def disconnect(self):
-        """Close database connection"""
-        if self._connection:
-            self._connection.close()
-            self._connection = None
-            logger.info("Database connection closed")
+    def _discard(self, conn):
+        """Close a broken connection and remove it from the pool"""
+        self._last_used.pop(conn, None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except PoolError:
+            pass
+    
+    def _acquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return
+        started = time.monotonic()
+        acquired = self._slots.acquire(timeout=db_config.pool_timeout)
+        waited = time.monotonic() - started
+        with self._pool_lock:
+            self._stats['waits'] += 1
+            self._stats['wait_time'] += waited
+            self._stats['max_wait_time'] = max(self._stats['max_wait_time'], waited)
+            if not acquired:
+                self._stats['timeouts'] += 1
+        if not acquired:
+            raise PoolError(
+                f"No database connection available after {db_config.pool_timeout}s"
+            )
+    
+    @contextmanager
+    def connection(self):
+        """
+        Check out a healthy pooled connection.
+        Blocks (up to pool_timeout) when all connections are in use.
+        Dead connections, e.g. after a backend restart, are replaced transparently.
+        """
+        if not self.is_connected and not self.connect():
+            raise psycopg2.OperationalError("Database is not connected")
+        
+        self._acquire_slot()
+        conn = None
+        try:
+            # Every unhealthy connection is discarded, so this terminates once
+            # the pool opens a fresh one
+            for _ in range(db_config.pool_max_size + 1):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    break
+                self._discard(conn)
+                conn = None
+                with self._pool_lock:
+                    self._stats['reconnects'] += 1
+            if conn is None:
+                raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+            
+            with self._pool_lock:
+                self._stats['checkouts'] += 1
+                self._stats['in_use'] += 1
+            try:
+                yield conn
+            finally:
+                with self._pool_lock:
+                    self._stats['in_use'] -= 1
+                if conn.closed:
+                    self._discard(conn)
+                else:
+                    self._last_used[conn] = time.monotonic()
+                    self._pool.putconn(conn)
+        finally:
+            self._slots.release()
     
     @property
-    def is_connected(self) -> bool:
-        """Check if database is connected"""
-        return self._connection is not None and not self._connection.closed
+    def in_transaction(self) -> bool:
+        """True if the current thread is inside a transaction() block"""
+        return getattr(self._local, 'conn', None) is not None
     
     @contextmanager
-    def cursor(self, dict_cursor: bool = True):
-        """Context manager for database cursor"""
-        if not self.is_connected:
-            self.connect()
+    def transaction(self):
+        """
+        Unit of work: every cursor()/execute* call made by this thread inside
+        the block runs on one connection and is committed once at the end.
+        Nested transaction() blocks become savepoints, so a failure inside
+        one only rolls back that block.
+        """
+        if self.in_transaction:
+            with self._savepoint() as conn:
+                yield conn
+            return
         
-        cursor_factory = RealDictCursor if dict_cursor else None
-        cursor = self._connection.cursor(cursor_factory=cursor_factory)
+        with self.connection() as conn:
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.on_commit = []
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+                callbacks, self._local.on_commit = self._local.on_commit, []
+        
+        for callback in callbacks:
+            callback()
+    
+    def on_commit(self, callback: Callable[[], None]):
+        """
+        Run callback after the current thread's outermost transaction()
+        commits; it is dropped if that transaction, or the savepoint it was
+        registered in, rolls back. Outside a transaction it runs immediately.
+        """
+        if not self.in_transaction:
+            callback()
+            return
+        self._local.on_commit.append(callback)
+    
+    @contextmanager
+    def _savepoint(self):
+        conn = self._local.conn
+        self._local.depth += 1
+        name = f"sp_{self._local.depth}"
+        registered = len(self._local.on_commit)
+        with conn.cursor() as cur:
+            cur.execute(f"SAVEPOINT {name}")
         try:
-            yield cursor
-            self._connection.commit()
-        except Exception as e:
-            self._connection.rollback()
-            logger.error(f"Database error: {e}")
+            yield conn
+        except Exception:
+            del self._local.on_commit[registered:]
+            if not conn.closed:
+                with conn.cursor() as cur:
+                    cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
             raise
+        else:
+            with conn.cursor() as cur:
+                cur.execute(f"RELEASE SAVEPOINT {name}")
         finally:
-            cursor.close()
+            self._local.depth -= 1
+    
+    @contextmanager
+    def cursor(self, dict_cursor: bool = True):
+        """
+        Context manager for database cursor.
+        Outside a transaction() block every cursor commits on exit.
+        """
+        cursor_factory = RealDictCursor if dict_cursor else None
+        
+        if self.in_transaction:
+            # Part of the caller's unit of work; commit/rollback happen there
+            cursor = self._local.conn.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cursor
+            except Exception as e:
+                logger.error(f"Database error: {e}")
+                raise
+            finally:
+                cursor.close()
+            return
+        
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cursor
+                conn.commit()
+            except Exception as e:
+                if not conn.closed:
+                    conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+            finally:
+                cursor.close()
     
     def execute(self, query: str, params: tuple = None) -> Optional[List[Dict]]:
         """Execute a query and return results"""
         with self.cursor() as cur:
+            started = time.perf_counter()
             cur.execute(query, params)
-            if cur.description:  # SELECT query
-                return cur.fetchall()
-            return None
+            rows = cur.fetchall() if cur.description else None  # SELECT query
+            if self.telemetry.enabled:
+                self.telemetry.record(query, time.perf_counter() - started, rows, cur.rowcount, cur, params)
+            return rows
     
     def execute_one(self, query: str, params: tuple = None) -> Optional[Dict]:
         """Execute a query and return single result"""
         with self.cursor() as cur:
+            started = time.perf_counter()
             cur.execute(query, params)
-            if cur.description:
-                return cur.fetchone()
-            return None
+            row = cur.fetchone() if cur.description else None
+            if self.telemetry.enabled:
+                rows = ([row] if row else []) if cur.description else None
+                self.telemetry.record(query, time.perf_counter() - started, rows, cur.rowcount, cur, params)
+            return row
     
     def execute_many(self, query: str, params_list: List[tuple]) -> int:
         """Execute multiple queries with different parameters"""
         with self.cursor() as cur:
+            started = time.perf_counter()
             cur.executemany(query, params_list)
+            if self.telemetry.enabled:
+                self.telemetry.record(query, time.perf_counter() - started, rowcount=cur.rowcount)
             return cur.rowcount
+    
+    def execute_prepared(self, statement: PreparedStatement, params: tuple = (),
+                         fetch: str = 'all') -> Any:
+        """
+        Execute a prepared statement, PREPARE-ing it first on connections that
+        have not seen it yet (including fresh connections after a reconnect).
+        fetch: 'all' returns a list of rows, 'one' a single row.
+        """
+        with self.cursor() as cur:
+            prepared = self._prepared.setdefault(cur.connection, set())
+            if statement.name not in prepared:
+                cur.execute(f"PREPARE {statement.name} AS {statement.query}")
+                prepared.add(statement.name)
+            
+            execute = f"EXECUTE {statement.name} ({statement.args})" if statement.args else f"EXECUTE {statement.name}"
+            started = time.perf_counter()
+            cur.execute(execute, params if statement.args else None)
+            
+            if not cur.description:
+                result = rows = None
+            elif fetch == 'one':
+                result = cur.fetchone()
+                rows = [result] if result else []
+            else:
+                result = rows = cur.fetchall()
+            
+            if self.telemetry.enabled:
+                self.telemetry.record(
+                    statement.query, time.perf_counter() - started, rows, cur.rowcount,
+                    cur, params if statement.args else None, explain_query=execute
+                )
+            return result
+    
+    def copy_expert(self, query: str, file) -> int:
+        """Run COPY ... FROM STDIN / TO STDOUT with a file-like object"""
+        with self.cursor(dict_cursor=False) as cur:
+            started = time.perf_counter()
+            cur.copy_expert(query, file)
+            if self.telemetry.enabled:
+                self.telemetry.record(query, time.perf_counter() - started, rowcount=cur.rowcount)
+            return cur.rowcount
+    
+    def execute_values(self, query: str, rows: List[tuple], template: str = None,
+                       page_size: int = 1000) -> int:
+        """
+        Multi-row INSERT: the query's single VALUES %s placeholder is expanded
+        to page_size rows per statement. All pages run in one transaction.
+        """
+        if not rows:
+            return 0
+        with self.cursor(dict_cursor=False) as cur:
+            started = time.perf_counter()
+            execute_values(cur, query, rows, template=template, page_size=page_size)
+            if self.telemetry.enabled:
+                self.telemetry.record(query, time.perf_counter() - started, rowcount=len(rows))
+            return len(rows)
+    
+    def stream_batches(self, query: str, params: tuple = None, batch_size: Optional[int] = None,
+                       dict_cursor: bool = True) -> Iterator[List]:
+        """
+        Run a query on a server-side (named) cursor and yield its rows in
+        lists of batch_size (default db_config.stream_itersize), so only one
+        batch is held in memory however large the result is.
+        Inside a transaction() block the cursor is part of it; otherwise a
+        pooled connection is held until the generator is exhausted or closed,
+        so consumers that stop early should close() it (or leave it to
+        garbage collection).
+        """
+        if self.in_transaction:
+            yield from self._stream_batches(self._local.conn, query, params, batch_size, dict_cursor)
+            return
+        
+        with self.connection() as conn:
+            try:
+                yield from self._stream_batches(conn, query, params, batch_size, dict_cursor)
+                conn.commit()
+            except BaseException as e:
+                # Also GeneratorExit: the cursor's transaction must not go back to the pool open
+                if not conn.closed:
+                    conn.rollback()
+                if isinstance(e, Exception):
+                    logger.error(f"Database error: {e}")
+                raise
+    
+    def stream(self, query: str, params: tuple = None, batch_size: Optional[int] = None,
+               dict_cursor: bool = True) -> Iterator:
+        """Like stream_batches(), one row at a time"""
+        for rows in self.stream_batches(query, params, batch_size, dict_cursor):
+            yield from rows
+    
+    def _stream_batches(self, conn, query: str, params: tuple, batch_size: Optional[int],
+                        dict_cursor: bool) -> Iterator[List]:
+        batch_size = batch_size or db_config.stream_itersize
+        cursor_factory = RealDictCursor if dict_cursor else None
+        # Unique per process; names only have to differ within one transaction
+        name = f"stream_{next(self._stream_ids)}"
+        
+        seconds, count = 0.0, 0
+        try:
+            with conn.cursor(name=name, cursor_factory=cursor_factory) as cur:
+                cur.itersize = batch_size
+                started = time.perf_counter()
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    seconds += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield rows
+                    started = time.perf_counter()
+        finally:
+            # Database time only, without the time spent by the consumer
+            if self.telemetry.enabled:
+                self.telemetry.record(query, seconds, rowcount=count)
+
+
+class SequenceIdAllocator:
+    """
+    Hi/lo ID allocator backed by a PostgreSQL sequence.
+    Every nextval() reserves a block of IDs (hi * block_size ... + block_size - 1),
+    so IDs are unique across processes and only one round trip is needed per block.
+    All processes sharing a sequence must use the same block_size.
+    """
+    
+    def __init__(self, db: 'Database', sequence: str, prefix: str, block_size: int = 1000):
+        self.db = db
+        self.sequence = sequence
+        self.prefix = prefix
+        self.block_size = block_size
+        
+        self._lock = threading.Lock()
+        self._next = 0
+        self._limit = 0
+    
+    def _fetch_block(self):
+        result = self.db.execute_one("SELECT nextval(%s) AS hi", (self.sequence,))
+        self._next = result['hi'] * self.block_size
+        self._limit = self._next + self.block_size
+    
+    def next_value(self) -> int:
+        """Allocate the next numeric ID"""
+        with self._lock:
+            if self._next >= self._limit:
+                self._fetch_block()
+            value = self._next
+            self._next += 1
+            return value
+    
+    def next_id(self) -> str:
+        """Allocate the next prefixed ID (e.g. D-900000)"""
+        return f"{self.prefix}{self.next_value()}"
+
+
+# ============================================================
+# Keyset Pagination
+# ============================================================
+
+@dataclass
+class Page:
+    """
+    One page of a listing, newest first. next_token is None on the last
+    page; otherwise pass it back to get the rows after this page.
+    Iterating a Page iterates its rows.
+    """
+    rows: List[Dict]
+    next_token: Optional[str] = None
+    
+    @property
+    def has_more(self) -> bool:
+        return self.next_token is not None
+    
+    def __iter__(self):
+        return iter(self.rows)
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+def encode_page_token(timestamp: datetime, row_id: str) -> str:
+    """Opaque continuation token for the position (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_page_token(token: str) -> Tuple[datetime, str]:
+    """Position encoded by encode_page_token; ValueError for tokens not made by it"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(raw)
+        if not (isinstance(position, list) and len(position) == 2
+                and all(isinstance(part, str) for part in position)):
+            raise TypeError("expected [timestamp, id]")
+        return datetime.fromisoformat(position[0]), position[1]
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page token: {token!r}") from e
+
+
+def fetch_page(database: 'Database', query: str, conditions: List[str], params: List,
+               time_column: str, id_column: str, limit: int, token: Optional[str] = None) -> Page:
+    """
+    Run query (SELECT ... FROM ...) with the given WHERE conditions as a
+    keyset page ordered by (time_column, id_column) descending.
+
+    The continuation condition is a row comparison on the sort key, so an
+    index on (..., time DESC, id DESC) serves every page with one index
+    range scan no matter how deep the page is (unlike OFFSET).
+    """
+    conditions = list(conditions)
+    params = list(params)
+    if token:
+        timestamp, row_id = decode_page_token(token)
+        conditions.append(f"({time_column}, {id_column}) < (%s, %s)")
+        params += [timestamp, row_id]
+    
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = database.execute(
+        f"{query}{where} ORDER BY {time_column} DESC, {id_column} DESC LIMIT %s",
+        tuple(params) + (limit + 1,)
+    ) or []
+    
+    if len(rows) <= limit:
+        return Page(rows)
+    rows = rows[:limit]
+    last = rows[-1]
+    return Page(rows, encode_page_token(last[time_column.split('.')[-1]], last[id_column.split('.')[-1]]))
+
+
+# ============================================================
+# Listing Filters
+# ============================================================
+
+@dataclass
+class QueryFilter:
+    """
+    Base for listing filters. Every set field becomes one parameterized
+    condition (equality on its COLUMNS entry, since/until as a half-open
+    time range), so the database filters before the page LIMIT applies.
+    """
+    COLUMNS: ClassVar[Dict[str, str]] = {}
+    TIME_COLUMN: ClassVar[str] = ""
+    
+    def conditions(self) -> Tuple[List[str], List]:
+        """WHERE conditions and their parameters"""
+        conditions, params = [], []
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is None:
+                continue
+            if f.name == 'since':
+                conditions.append(f"{self.TIME_COLUMN} >= %s")
+            elif f.name == 'until':
+                conditions.append(f"{self.TIME_COLUMN} < %s")
+            else:
+                conditions.append(f"{self.COLUMNS[f.name]} = %s")
+            params.append(value)
+        return conditions, params
+
+
+@dataclass
+class EventFilter(QueryFilter):
+    """Event listing conditions; None means no condition"""
+    user_id: Optional[str] = None
+    service: Optional[str] = None
+    event_type: Optional[str] = None
+    since: Optional[datetime] = None    # inclusive
+    until: Optional[datetime] = None    # exclusive
+    
+    COLUMNS: ClassVar[Dict[str, str]] = {
+        'user_id': 'e.user_id', 'service': 'e.service', 'event_type': 'e.event_type'
+    }
+    TIME_COLUMN: ClassVar[str] = 'e.timestamp'
+
+
+@dataclass
+class DecisionFilter(QueryFilter):
+    """Decision listing conditions; None means no condition"""
+    user_id: Optional[str] = None
+    selected_action: Optional[str] = None
+    since: Optional[datetime] = None    # inclusive
+    until: Optional[datetime] = None    # exclusive
+    
+    COLUMNS: ClassVar[Dict[str, str]] = {'user_id': 'd.user_id', 'selected_action': 'd.selected_action'}
+    TIME_COLUMN: ClassVar[str] = 'd.timestamp'
+
+
+@dataclass
+class ActionFilter(QueryFilter):
+    """Action (notification) listing conditions; None means no condition"""
+    user_id: Optional[str] = None
+    action_type: Optional[str] = None
+    since: Optional[datetime] = None    # inclusive
+    until: Optional[datetime] = None    # exclusive
+    
+    COLUMNS: ClassVar[Dict[str, str]] = {'user_id': 'a.user_id', 'action_type': 'a.action_type'}
+    TIME_COLUMN: ClassVar[str] = 'a.created_at'
 
 
 # ============================================================
@@ -126,32 +827,41 @@ class UserRepository:
 class EventRepository:
     """Event data access layer"""
     
+    SELECT = """
+        SELECT e.*, u.name as user_name
+        FROM events e
+        JOIN users u ON e.user_id = u.user_id
+    """
+    
     def __init__(self, db: Database):
         self.db = db
     
-    def get_all(self, limit: int = 100) -> List[Dict]:
+    def get_page(self, filters: Optional[EventFilter] = None, limit: int = 100,
+                 token: Optional[str] = None) -> Page:
+        """Events matching filters, newest first, one keyset page at a time"""
+        conditions, params = (filters or EventFilter()).conditions()
+        return fetch_page(self.db, self.SELECT, conditions, params,
+                          'e.timestamp', 'e.event_id', limit, token)
+    
+    def get_all(self, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get all events"""
-        return self.db.execute(
-            "SELECT * FROM events ORDER BY timestamp DESC LIMIT %s",
-            (limit,)
-        )
+        return self.get_page(limit=limit, token=token)
     
-    def get_by_user(self, user_id: str) -> List[Dict]:
+    def get_by_user(self, user_id: str, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get events for a specific user"""
-        return self.db.execute(
-            "SELECT * FROM events WHERE user_id = %s ORDER BY timestamp DESC",
-            (user_id,)
-        )
+        return self.get_page(EventFilter(user_id=user_id), limit, token)
     
-    def get_recent(self, limit: int = 20) -> List[Dict]:
+    def get_recent(self, limit: int = 20) -> Page:
         """Get most recent events"""
-        return self.db.execute("""
-            SELECT e.*, u.name as user_name 
-            FROM events e
-            JOIN users u ON e.user_id = u.user_id
-            ORDER BY e.timestamp DESC 
-            LIMIT %s
-        """, (limit,))
+        return self.get_page(limit=limit)
+    
+    def stream(self, filters: Optional[EventFilter] = None,
+               batch_size: Optional[int] = None) -> Iterator[Dict]:
+        """Events matching filters, oldest first, read through a server-side cursor"""
+        conditions, params = (filters or EventFilter()).conditions()
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.db.stream(f"{self.SELECT}{where} ORDER BY e.timestamp, e.event_id",
+                              tuple(params), batch_size)
     
     def create(self, event: Dict) -> bool:
         """Create a new event"""
@@ -173,6 +883,18 @@ class EventRepository:
 class UserStateRepository:
     """User state data access layer"""
     
+    GET_BY_USER = PreparedStatement(
+        "user_state_get_by_user",
+        "SELECT * FROM user_state WHERE user_id = $1",
+        "%s"
+    )
+    
+    SHARD_STATES = """
+        SELECT * FROM user_state
+        WHERE mod(abs(hashtext(user_id)::bigint), %s) = %s
+        ORDER BY user_id
+    """
+    
     def __init__(self, db: Database):
         self.db = db
     
@@ -191,12 +913,42 @@ class UserStateRepository:
                 END
         """)
     
+    def get_all_states(self) -> List[Dict]:
+        """Get raw user_state rows (no joined columns) for rule evaluation"""
+        return self.db.execute("""
+            SELECT * FROM user_state
+            ORDER BY 
+                CASE risk_level 
+                    WHEN 'CRITICAL' THEN 1 
+                    WHEN 'HIGH' THEN 2 
+                    WHEN 'MEDIUM' THEN 3 
+                    WHEN 'LOW' THEN 4 
+                END,
+                user_id
+        """)
+    
+    def stream_states(self, batch_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Raw user_state rows in user_id order, batch_size rows at a time,
+        read through a server-side cursor instead of one fetchall().
+        """
+        return self.db.stream_batches("SELECT * FROM user_state ORDER BY user_id", batch_size=batch_size)
+    
+    def stream_shard_states(self, shard: int, shard_count: int,
+                            batch_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """get_shard_states() read through a server-side cursor, batch_size rows at a time"""
+        return self.db.stream_batches(self.SHARD_STATES, (shard_count, shard), batch_size)
+    
+    def get_shard_states(self, shard: int, shard_count: int) -> List[Dict]:
+        """
+        Get raw user_state rows of one hash shard of the user population.
+        Every user falls in exactly one of the shard_count shards.
+        """
+        return self.db.execute(self.SHARD_STATES, (shard_count, shard))
+    
     def get_by_user(self, user_id: str) -> Optional[Dict]:
         """Get state for a specific user"""
-        return self.db.execute_one(
-            "SELECT * FROM user_state WHERE user_id = %s",
-            (user_id,)
-        )
+        return self.db.execute_prepared(self.GET_BY_USER, (user_id,), fetch='one')
     
     def get_by_risk_level(self, risk_level: str) -> List[Dict]:
         """Get users with specific risk level"""
@@ -209,30 +961,54 @@ class UserStateRepository:
 class RuleRepository:
     """Rule data access layer"""
     
+    TABLE = "rules"
+    
+    # Bumped on every successful write from this process so that rule
+    # caches can invalidate without a round trip
+    local_version: int = 0
+    
+    GET_ACTIVE = PreparedStatement(
+        "rules_get_active",
+        "SELECT * FROM rules WHERE is_active = TRUE ORDER BY priority"
+    )
+    
     def __init__(self, db: Database):
         self.db = db
     
+    @classmethod
+    def _mark_changed(cls):
+        """Record a local change to the rules table"""
+        cls.local_version += 1
+    
     def get_all(self) -> List[Dict]:
         """Get all rules"""
-        return self.db.execute("SELECT * FROM rules ORDER BY priority")
+        return self.db.execute(f"SELECT * FROM {self.TABLE} ORDER BY priority")
     
     def get_active(self) -> List[Dict]:
         """Get only active rules ordered by priority"""
-        return self.db.execute(
-            "SELECT * FROM rules WHERE is_active = TRUE ORDER BY priority"
-        )
+        return self.db.execute_prepared(self.GET_ACTIVE)
     
     def get_by_id(self, rule_id: str) -> Optional[Dict]:
         """Get rule by ID"""
         return self.db.execute_one(
-            "SELECT * FROM rules WHERE rule_id = %s",
+            f"SELECT * FROM {self.TABLE} WHERE rule_id = %s",
             (rule_id,)
         )
     
+    def get_version(self) -> tuple:
+        """
+        Cheap fingerprint of the rules table.
+        Changes whenever a rule is added, removed, edited or toggled.
+        """
+        result = self.db.execute_one(
+            f"SELECT COUNT(*) AS rule_count, MAX(updated_at) AS last_updated FROM {self.TABLE}"
+        )
+        return (result['rule_count'], result['last_updated']) if result else (0, None)
+    
     def create(self, rule: Dict) -> bool:
         """Create a new rule"""
-        query = """
-            INSERT INTO rules (rule_id, condition, action, priority, is_active, description)
+        query = f"""
+            INSERT INTO {self.TABLE} (rule_id, condition, action, priority, is_active, description)
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         try:
@@ -240,6 +1016,7 @@ class RuleRepository:
                 rule['rule_id'], rule['condition'], rule['action'],
                 rule['priority'], rule.get('is_active', True), rule.get('description', '')
             ))
+            self._mark_changed()
             return True
         except Exception as e:
             logger.error(f"Failed to create rule: {e}")
@@ -258,10 +1035,11 @@ class RuleRepository:
             return False
         
         values.append(rule_id)
-        query = f"UPDATE rules SET {', '.join(set_clauses)}, updated_at = CURRENT_TIMESTAMP WHERE rule_id = %s"
+        query = f"UPDATE {self.TABLE} SET {', '.join(set_clauses)}, updated_at = CURRENT_TIMESTAMP WHERE rule_id = %s"
         
         try:
             self.db.execute(query, tuple(values))
+            self._mark_changed()
             return True
         except Exception as e:
             logger.error(f"Failed to update rule: {e}")
@@ -271,44 +1049,162 @@ class RuleRepository:
         """Toggle rule active status"""
         try:
             self.db.execute(
-                "UPDATE rules SET is_active = NOT is_active, updated_at = CURRENT_TIMESTAMP WHERE rule_id = %s",
+                f"UPDATE {self.TABLE} SET is_active = NOT is_active, updated_at = CURRENT_TIMESTAMP WHERE rule_id = %s",
                 (rule_id,)
             )
+            self._mark_changed()
             return True
         except Exception as e:
             logger.error(f"Failed to toggle rule: {e}")
             return False
 
 
+class ShadowRuleRepository(RuleRepository):
+    """Candidate rule set evaluated in shadow next to the production rules"""
+    
+    TABLE = "shadow_rules"
+    
+    local_version: int = 0
+    
+    GET_ACTIVE = PreparedStatement(
+        "shadow_rules_get_active",
+        "SELECT * FROM shadow_rules WHERE is_active = TRUE ORDER BY priority"
+    )
+    
+    def replace_all(self, rules: List[Dict]) -> int:
+        """Replace the whole shadow rule set in one transaction"""
+        rows = [
+            (
+                r['rule_id'], r['condition'], r['action'], r['priority'],
+                r.get('is_active', True), r.get('description', '')
+            )
+            for r in rules
+        ]
+        with self.db.transaction():
+            self.db.execute("DELETE FROM shadow_rules")
+            count = self.db.execute_values("""
+                INSERT INTO shadow_rules (rule_id, condition, action, priority, is_active, description)
+                VALUES %s
+            """, rows)
+        self._mark_changed()
+        return count
+
+
+class ShadowDecisionRepository:
+    """Shadow evaluation results: production vs candidate rule set"""
+    
+    def __init__(self, db: Database):
+        self.db = db
+    
+    def create_many(self, rows: List[Dict], page_size: int = 1000) -> int:
+        """Write shadow decision rows in bulk. Returns the number of rows written."""
+        query = """
+            INSERT INTO shadow_decisions (user_id, source, production_rules, shadow_rules, production_action, shadow_action)
+            VALUES %s
+        """
+        values = [
+            (
+                r['user_id'], r['source'], r['production_rules'], r['shadow_rules'],
+                r['production_action'], r['shadow_action']
+            )
+            for r in rows
+        ]
+        try:
+            # Own savepoint when called inside a production transaction, so a
+            # failed shadow write never aborts the caller's unit of work
+            with self.db.transaction():
+                return self.db.execute_values(query, values, page_size=page_size)
+        except Exception as e:
+            logger.error(f"Failed to save shadow decisions: {e}")
+            return 0
+    
+    def get_rule_divergence(self, since: datetime = None) -> List[Dict]:
+        """
+        Per rule: sampled evaluations where it fired in production, in shadow,
+        in both, and only on one side.
+        """
+        return self.db.execute("""
+            WITH sampled AS (
+                SELECT production_rules, shadow_rules
+                FROM shadow_decisions
+                WHERE timestamp >= COALESCE(%s, '-infinity'::timestamp)
+            ),
+            fired AS (
+                SELECT rule_id, TRUE AS production, rule_id = ANY(shadow_rules) AS shadow
+                FROM sampled, unnest(production_rules) AS rule_id
+                UNION ALL
+                SELECT rule_id, FALSE, TRUE
+                FROM sampled, unnest(shadow_rules) AS rule_id
+                WHERE NOT rule_id = ANY(production_rules)
+            )
+            SELECT rule_id,
+                   COUNT(*) FILTER (WHERE production) AS production,
+                   COUNT(*) FILTER (WHERE shadow) AS shadow,
+                   COUNT(*) FILTER (WHERE production AND shadow) AS both,
+                   COUNT(*) FILTER (WHERE production AND NOT shadow) AS only_production,
+                   COUNT(*) FILTER (WHERE shadow AND NOT production) AS only_shadow
+            FROM fired
+            GROUP BY rule_id
+            ORDER BY COUNT(*) FILTER (WHERE production <> shadow) DESC, rule_id
+        """, (since,))
+    
+    def get_action_agreement(self, since: datetime = None) -> List[Dict]:
+        """Sampled evaluations per (production action, shadow action) pair"""
+        return self.db.execute("""
+            SELECT production_action, shadow_action, COUNT(*) AS evaluations
+            FROM shadow_decisions
+            WHERE timestamp >= COALESCE(%s, '-infinity'::timestamp)
+            GROUP BY 1, 2
+            ORDER BY evaluations DESC
+        """, (since,))
+
+
 class DecisionRepository:
     """Decision data access layer"""
     
+    INSERT = PreparedStatement(
+        "decisions_insert",
+        """
+            INSERT INTO decisions (decision_id, user_id, triggered_rules, selected_action, suppressed_actions, user_state_snapshot)
+            VALUES ($1, $2, $3, $4, $5, $6)
+        """,
+        "%s, %s, %s, %s, %s::action_type_enum[], %s"
+    )
+    
+    SELECT = """
+        SELECT d.*, u.name as user_name
+        FROM decisions d
+        JOIN users u ON d.user_id = u.user_id
+    """
+    
     def __init__(self, db: Database):
         self.db = db
     
-    def get_all(self, limit: int = 100) -> List[Dict]:
+    def get_page(self, filters: Optional[DecisionFilter] = None, limit: int = 100,
+                 token: Optional[str] = None) -> Page:
+        """Decisions matching filters, newest first, one keyset page at a time"""
+        conditions, params = (filters or DecisionFilter()).conditions()
+        return fetch_page(self.db, self.SELECT, conditions, params,
+                          'd.timestamp', 'd.decision_id', limit, token)
+    
+    def get_all(self, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get all decisions"""
-        return self.db.execute("""
-            SELECT d.*, u.name as user_name
-            FROM decisions d
-            JOIN users u ON d.user_id = u.user_id
-            ORDER BY d.timestamp DESC
-            LIMIT %s
-        """, (limit,))
-    
-    def get_by_user(self, user_id: str) -> List[Dict]:
+        return self.get_page(limit=limit, token=token)
+    
+    def get_by_user(self, user_id: str, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get decisions for a specific user"""
-        return self.db.execute(
-            "SELECT * FROM decisions WHERE user_id = %s ORDER BY timestamp DESC",
-            (user_id,)
-        )
+        return self.get_page(DecisionFilter(user_id=user_id), limit, token)
+    
+    def stream(self, filters: Optional[DecisionFilter] = None,
+               batch_size: Optional[int] = None) -> Iterator[Dict]:
+        """Decisions matching filters, oldest first, read through a server-side cursor"""
+        conditions, params = (filters or DecisionFilter()).conditions()
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.db.stream(f"{self.SELECT}{where} ORDER BY d.timestamp, d.decision_id",
+                              tuple(params), batch_size)
     
     def create(self, decision: Dict) -> bool:
         """Create a new decision record"""
-        query = """
-            INSERT INTO decisions (decision_id, user_id, triggered_rules, selected_action, suppressed_actions, user_state_snapshot)
-            VALUES (%s, %s, %s, %s, %s::action_type_enum[], %s)
-        """
         try:
             # Convert Python lists to PostgreSQL array format
             triggered_rules = decision['triggered_rules']
@@ -319,7 +1215,7 @@ class DecisionRepository:
             else:
                 suppressed_actions = None
             
-            self.db.execute(query, (
+            self.db.execute_prepared(self.INSERT, (
                 decision['decision_id'], decision['user_id'], 
                 triggered_rules, decision['selected_action'],
                 suppressed_actions, decision.get('user_state_snapshot')
@@ -329,39 +1225,78 @@ class DecisionRepository:
         except Exception as e:
             logger.error(f"Failed to create decision: {e}")
             return False
+    
+    def create_many(self, decisions: List[Dict], page_size: int = 1000) -> int:
+        """Create decision records in bulk. Returns the number of rows written."""
+        query = """
+            INSERT INTO decisions (decision_id, user_id, triggered_rules, selected_action, suppressed_actions, user_state_snapshot)
+            VALUES %s
+        """
+        template = "(%s, %s, %s, %s, %s::action_type_enum[], %s)"
+        rows = [
+            (
+                d['decision_id'], d['user_id'], d['triggered_rules'], d['selected_action'],
+                d.get('suppressed_actions') or None, d.get('user_state_snapshot')
+            )
+            for d in decisions
+        ]
+        try:
+            count = self.db.execute_values(query, rows, template, page_size)
+            logger.info(f"{count} decisions saved to database")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to create decisions in bulk: {e}")
+            return 0
 
 
 class ActionRepository:
     """Action data access layer"""
     
+    INSERT = PreparedStatement(
+        "actions_insert",
+        """
+            INSERT INTO actions (action_id, user_id, action_type, message)
+            VALUES ($1, $2, $3, $4)
+        """,
+        "%s, %s, %s, %s"
+    )
+    
+    SELECT = """
+        SELECT a.*, u.name as user_name
+        FROM actions a
+        JOIN users u ON a.user_id = u.user_id
+    """
+    
     def __init__(self, db: Database):
         self.db = db
     
-    def get_all(self, limit: int = 100) -> List[Dict]:
+    def get_page(self, filters: Optional[ActionFilter] = None, limit: int = 100,
+                 token: Optional[str] = None) -> Page:
+        """Actions matching filters, newest first, one keyset page at a time"""
+        conditions, params = (filters or ActionFilter()).conditions()
+        return fetch_page(self.db, self.SELECT, conditions, params,
+                          'a.created_at', 'a.action_id', limit, token)
+    
+    def get_all(self, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get all actions"""
-        return self.db.execute("""
-            SELECT a.*, u.name as user_name
-            FROM actions a
-            JOIN users u ON a.user_id = u.user_id
-            ORDER BY a.created_at DESC
-            LIMIT %s
-        """, (limit,))
-    
-    def get_by_user(self, user_id: str) -> List[Dict]:
+        return self.get_page(limit=limit, token=token)
+    
+    def get_by_user(self, user_id: str, limit: int = 100, token: Optional[str] = None) -> Page:
         """Get actions for a specific user"""
-        return self.db.execute(
-            "SELECT * FROM actions WHERE user_id = %s ORDER BY created_at DESC",
-            (user_id,)
-        )
+        return self.get_page(ActionFilter(user_id=user_id), limit, token)
+    
+    def stream(self, filters: Optional[ActionFilter] = None,
+               batch_size: Optional[int] = None) -> Iterator[Dict]:
+        """Actions matching filters, oldest first, read through a server-side cursor"""
+        conditions, params = (filters or ActionFilter()).conditions()
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.db.stream(f"{self.SELECT}{where} ORDER BY a.created_at, a.action_id",
+                              tuple(params), batch_size)
     
     def create(self, action: Dict) -> bool:
         """Create a new action"""
-        query = """
-            INSERT INTO actions (action_id, user_id, action_type, message)
-            VALUES (%s, %s, %s, %s)
-        """
         try:
-            self.db.execute(query, (
+            self.db.execute_prepared(self.INSERT, (
                 action['action_id'], action['user_id'],
                 action['action_type'], action.get('message', '')
             ))
@@ -370,12 +1305,28 @@ class ActionRepository:
             logger.error(f"Failed to create action: {e}")
             return False
     
+    def create_many(self, actions: List[Dict], page_size: int = 1000) -> int:
+        """Create actions in bulk. Returns the number of rows written."""
+        query = """
+            INSERT INTO actions (action_id, user_id, action_type, message)
+            VALUES %s
+        """
+        rows = [
+            (a['action_id'], a['user_id'], a['action_type'], a.get('message', ''))
+            for a in actions
+        ]
+        try:
+            return self.db.execute_values(query, rows, page_size=page_size)
+        except Exception as e:
+            logger.error(f"Failed to create actions in bulk: {e}")
+            return 0
+    
     def get_daily_counts(self) -> List[Dict]:
         """Get action counts grouped by type for today"""
         return self.db.execute("""
             SELECT action_type, COUNT(*) as count
             FROM actions
-            WHERE DATE(created_at) = CURRENT_DATE
+            WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1
             GROUP BY action_type
             ORDER BY count DESC
         """)
@@ -384,26 +1335,73 @@ class ActionRepository:
 class DashboardRepository:
     """Dashboard summary data access layer"""
     
+    # Per-day and total counts kept by triggers (migration_summary_counters.sql);
+    # 'today' and '-infinity' rows summed over the session slots
+    SUMMARY_COUNTERS_QUERY = """
+        SELECT
+            COALESCE(SUM(value) FILTER (WHERE counter = 'users' AND day = '-infinity'), 0)::bigint as total_users,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'events' AND day = '-infinity'), 0)::bigint as total_events,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'events' AND day = CURRENT_DATE), 0)::bigint as today_events,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'decisions' AND day = '-infinity'), 0)::bigint as total_decisions,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'decisions' AND day = CURRENT_DATE), 0)::bigint as today_decisions,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'actions' AND day = '-infinity'), 0)::bigint as total_actions,
+            COALESCE(SUM(value) FILTER (WHERE counter = 'actions' AND day = CURRENT_DATE), 0)::bigint as today_actions,
+            (SELECT COUNT(*) FROM rules WHERE is_active = TRUE) as active_rules
+        FROM summary_counters
+        WHERE counter IN ('users', 'events', 'decisions', 'actions')
+          AND day IN ('-infinity', CURRENT_DATE)
+    """
+    
+    RISK_ORDER = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+    
     def __init__(self, db: Database):
         self.db = db
+        self._has_counters: Optional[bool] = None
+    
+    @property
+    def has_counters(self) -> bool:
+        """Whether the summary_counters migration is applied (checked once)"""
+        if self._has_counters is None:
+            result = self.db.execute_one("SELECT to_regclass('summary_counters') IS NOT NULL AS present")
+            self._has_counters = bool(result and result['present'])
+        return self._has_counters
     
     def get_summary(self) -> Dict:
         """Get dashboard summary statistics"""
+        if self.has_counters:
+            result = self.db.execute_one(self.SUMMARY_COUNTERS_QUERY)
+            return dict(result) if result else {}
+        
         result = self.db.execute_one("""
             SELECT 
                 (SELECT COUNT(*) FROM users) as total_users,
                 (SELECT COUNT(*) FROM events) as total_events,
-                (SELECT COUNT(*) FROM events WHERE DATE(timestamp) = CURRENT_DATE) as today_events,
+                (SELECT COUNT(*) FROM events
+                 WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as today_events,
                 (SELECT COUNT(*) FROM decisions) as total_decisions,
-                (SELECT COUNT(*) FROM decisions WHERE DATE(timestamp) = CURRENT_DATE) as today_decisions,
+                (SELECT COUNT(*) FROM decisions
+                 WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as today_decisions,
                 (SELECT COUNT(*) FROM actions) as total_actions,
-                (SELECT COUNT(*) FROM actions WHERE DATE(created_at) = CURRENT_DATE) as today_actions,
+                (SELECT COUNT(*) FROM actions
+                 WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1) as today_actions,
                 (SELECT COUNT(*) FROM rules WHERE is_active = TRUE) as active_rules
         """)
         return dict(result) if result else {}
     
     def get_risk_distribution(self) -> List[Dict]:
-        """Get user distribution by risk level"""
+        """Get user distribution by risk level; users without a level come last as None"""
+        if self.has_counters:
+            # NULL levels are counted under 'risk:NULL' (summary_risk_counter)
+            rows = self.db.execute("""
+                SELECT NULLIF(substr(counter, 6), 'NULL') as risk_level, SUM(value)::bigint as count
+                FROM summary_counters
+                WHERE counter LIKE 'risk:%' AND day = '-infinity'
+                GROUP BY counter
+                HAVING SUM(value) <> 0
+            """) or []
+            order = {level: i for i, level in enumerate(self.RISK_ORDER)}
+            return sorted(rows, key=lambda row: order.get(row['risk_level'], len(order)))
+        
         return self.db.execute("""
             SELECT risk_level, COUNT(*) as count
             FROM user_state
@@ -416,6 +1414,10 @@ class DashboardRepository:
                     WHEN 'LOW' THEN 4 
                 END
         """)
+    
+    def rebuild_counters(self):
+        """Recount summary_counters from the base tables (after manual data repair)"""
+        self.db.execute("SELECT rebuild_summary_counters()")
 
 
 # Global database instance
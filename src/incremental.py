@@ -0,0 +1,157 @@
+"""
+Turkcell Decision Engine - Incremental Evaluator
+Edge-triggered rule evaluation driven by state changes
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from .config import engine_config
+from .condition_compiler import read_field
+from .rule_cache import CompiledRule, RuleSet
+
+
+@dataclass(frozen=True)
+class UserTruth:
+    """Rules that were true for a user the last time they were evaluated"""
+    version: tuple
+    state_date: Optional[date]
+    true_rules: FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class Transition:
+    """Outcome of evaluating one state change"""
+    user_id: str
+    truth: UserTruth
+    newly_true: Tuple[CompiledRule, ...]   # false -> true, in priority order
+    evaluated: int                         # rules whose condition was checked
+
+    @property
+    def triggered_rules(self):
+        """Rule rows that turned true, in priority order"""
+        return [r.rule for r in self.newly_true]
+
+
+class IncrementalEvaluator:
+    """
+    Keeps each user's last truth value per rule and, for a change from
+    old_state to new_state, only re-checks the rules whose thresholds lie
+    between the old and new values of the changed fields (plus multi-field
+    rules reading them). Rules that were already true stay silent, so a
+    user who stays above a threshold gets one decision, not one per event.
+
+    The remembered truth is reset when the rule set version or the user's
+    state_date changes; it is then rebuilt from old_state. Rebuilding gives
+    the same answer, only slower, so the map is bounded: it holds at most
+    max_users users (least recently evaluated are evicted) and is cleared
+    when a newer state_date shows the daily reset has happened.
+
+    Callers that write decisions between evaluate() and commit() must hold
+    user_lock(user_id) across both, otherwise two concurrent changes for
+    one user can both see the old truth and report the same rising edge.
+    """
+
+    def __init__(self, max_users: Optional[int] = None):
+        self.max_users = max_users if max_users is not None else engine_config.incremental_max_users
+        self._lock = threading.Lock()
+        self._truth: 'OrderedDict[str, UserTruth]' = OrderedDict()
+        self._state_date: Optional[date] = None
+        # user_id -> [lock, holders]; entries exist only while in use
+        self._user_locks: Dict[str, List] = {}
+
+        self.evaluations = 0
+        self.rules_checked = 0
+        self.transitions = 0
+
+    def evaluate(self, rule_set: RuleSet, user_id: str, old_state: Mapping,
+                 new_state: Mapping) -> Transition:
+        """
+        Compare old_state and new_state for one user. The result is not
+        remembered until commit() is called, so a failed write can be retried.
+        """
+        state_date = new_state.get('state_date')
+        with self._lock:
+            previous = self._truth.get(user_id)
+
+        if previous is None or previous.version != rule_set.version or previous.state_date != state_date:
+            true_rules = frozenset(r.rule_id for r in rule_set.match(old_state))
+        else:
+            true_rules = previous.true_rules
+
+        candidates = rule_set.thresholds.crossing({
+            field: (read_field(old_state, field), read_field(new_state, field))
+            for field in rule_set.index.fields
+        })
+
+        now_true, now_false, newly_true = set(), set(), []
+        for rule in candidates:
+            if rule.condition(new_state):
+                now_true.add(rule.rule_id)
+                if rule.rule_id not in true_rules:
+                    newly_true.append(rule)
+            else:
+                now_false.add(rule.rule_id)
+
+        truth = UserTruth(rule_set.version, state_date, (true_rules - now_false) | now_true)
+        return Transition(user_id, truth, tuple(newly_true), len(candidates))
+
+    def commit(self, transition: Transition):
+        """Remember the truth values of an evaluated transition"""
+        state_date = transition.truth.state_date
+        with self._lock:
+            if state_date is not None and (self._state_date is None or state_date > self._state_date):
+                # Daily rollover: every remembered truth belongs to an earlier day
+                if self._state_date is not None:
+                    self._truth.clear()
+                self._state_date = state_date
+
+            self._truth[transition.user_id] = transition.truth
+            self._truth.move_to_end(transition.user_id)
+            while len(self._truth) > self.max_users:
+                self._truth.popitem(last=False)
+
+            self.evaluations += 1
+            self.rules_checked += transition.evaluated
+            self.transitions += len(transition.newly_true)
+
+    @contextmanager
+    def user_lock(self, user_id: str):
+        """Serialize evaluate() ... commit() for one user within this process"""
+        with self._lock:
+            entry = self._user_locks.get(user_id)
+            if entry is None:
+                entry = self._user_locks[user_id] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._user_locks[user_id]
+
+    def forget(self, user_id: str = None):
+        """Drop remembered truth values for one user, or for everyone"""
+        with self._lock:
+            if user_id is None:
+                self._truth.clear()
+            else:
+                self._truth.pop(user_id, None)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Evaluation counters"""
+        return {
+            'users': len(self._truth),
+            'evaluations': self.evaluations,
+            'rules_checked': self.rules_checked,
+            'transitions': self.transitions
+        }
@@ -0,0 +1,289 @@
+"""
+Turkcell Decision Engine - Event Ingestion Pipeline
+Headless bulk loading of events with COPY and pre-aggregated state updates
+
+Usage:
+    python -m src.ingestion events.jsonl [--batch-size 5000] [--evaluate]
+"""
+
+import io
+import csv
+import json
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import psycopg2
+
+from .config import engine_config
+from .database import db, Database, SequenceIdAllocator
+from .metrics import metrics
+from .rule_index import UNIT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+SERVICES = {'Superonline', 'Paycell', 'TV+', 'Fizy', 'Game+', 'BiP'}
+EVENT_TYPES = {'USAGE', 'PAYMENT', 'CONTENT_CONSUMPTION'}
+
+COPY_EVENTS_SQL = """
+    COPY events (event_id, user_id, service, event_type, value, unit, timestamp, processed)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+UPSERT_STATE_SQL = """
+    INSERT INTO user_state (user_id, internet_today_gb, spend_today_try, content_minutes_today, risk_level)
+    VALUES %s
+    ON CONFLICT (user_id) DO UPDATE SET
+        internet_today_gb = user_state.internet_today_gb + EXCLUDED.internet_today_gb,
+        spend_today_try = user_state.spend_today_try + EXCLUDED.spend_today_try,
+        content_minutes_today = user_state.content_minutes_today + EXCLUDED.content_minutes_today,
+        risk_level = calculate_risk_level(
+            user_state.internet_today_gb + EXCLUDED.internet_today_gb,
+            user_state.spend_today_try + EXCLUDED.spend_today_try,
+            user_state.content_minutes_today + EXCLUDED.content_minutes_today
+        ),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_STATE_TEMPLATE = "(%s, %s, %s, %s, calculate_risk_level(%s, %s, %s))"
+
+
+class InvalidEvent(ValueError):
+    """Raised for events that do not fit the events schema"""
+
+
+@dataclass
+class IngestStats:
+    """Counters for one ingestion run"""
+    events: int = 0
+    batches: int = 0
+    state_upserts: int = 0
+    skipped: int = 0
+    decisions: int = 0
+    seconds: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+
+# ============================================================
+# Readers
+# ============================================================
+
+def read_jsonl(path: Path) -> Iterator[Dict]:
+    """Yield events from a JSON Lines file"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path: Path) -> Iterator[Dict]:
+    """Yield events from a CSV file with a header row"""
+    with open(path, encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_events(path) -> Iterator[Dict]:
+    """Yield events from a .jsonl/.json or .csv file"""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        return read_csv(path)
+    return read_jsonl(path)
+
+
+# ============================================================
+# Pipeline
+# ============================================================
+
+class EventIngestor:
+    """
+    Loads events in micro-batches. Per batch, in one transaction:
+    - rows are streamed into events with COPY (the per-row state trigger is
+      bypassed through the decision_engine.bulk_ingest setting),
+    - state deltas are summed per user in Python and written with a single
+      user_state upsert per distinct user.
+    A batch rejected by the database (e.g. an unknown user_id or a duplicate
+    event_id) is rolled back and retried in halves, so only the offending
+    events are skipped.
+    """
+
+    def __init__(self, database: Database = db, batch_size: int = 5000,
+                 evaluate: bool = False):
+        self.db = database
+        self.batch_size = batch_size
+        self.evaluate = evaluate
+        # Own sequence and prefix: event_id_seq stays a plain counter for
+        # single inserts, so its IDs cannot fall inside an allocated block
+        self.event_ids = SequenceIdAllocator(database, 'ingest_event_id_seq', 'EVT-I', engine_config.id_block_size)
+
+    def normalize(self, event: Dict) -> Tuple:
+        """Validate an event and return it as a COPY row"""
+        unit = event.get('unit')
+        if unit not in UNIT_FIELDS:
+            raise InvalidEvent(f"Unknown unit {unit!r}")
+        if event.get('service') not in SERVICES:
+            raise InvalidEvent(f"Unknown service {event.get('service')!r}")
+        if event.get('event_type') not in EVENT_TYPES:
+            raise InvalidEvent(f"Unknown event type {event.get('event_type')!r}")
+        if not event.get('user_id'):
+            raise InvalidEvent("Missing user_id")
+        try:
+            value = Decimal(str(event['value']))
+        except (KeyError, InvalidOperation):
+            raise InvalidEvent(f"Invalid value {event.get('value')!r}")
+        if value < 0:
+            raise InvalidEvent(f"Negative value {value}")
+
+        timestamp = event.get('timestamp') or datetime.now()
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat()
+
+        event_id = event.get('event_id') or self.event_ids.next_id()
+        return (event_id, event['user_id'], event['service'], event['event_type'],
+                value, unit, timestamp)
+
+    def ingest(self, events: Iterable[Dict]) -> IngestStats:
+        """Load an iterable of events; memory use is bounded by batch_size"""
+        stats = IngestStats()
+        started = time.monotonic()
+        batch: List[Tuple] = []
+
+        for event in events:
+            try:
+                batch.append(self.normalize(event))
+            except InvalidEvent as e:
+                stats.skipped += 1
+                logger.warning(f"Skipping event {event.get('event_id', '?')}: {e}")
+                continue
+
+            if len(batch) >= self.batch_size:
+                self._flush(batch, stats)
+                batch = []
+
+        if batch:
+            self._flush(batch, stats)
+
+        stats.seconds = time.monotonic() - started
+        logger.info(
+            f"Ingested {stats.events} events in {stats.batches} batches "
+            f"({stats.events_per_second:.0f} events/s, {stats.skipped} skipped)"
+        )
+        return stats
+
+    def ingest_file(self, path) -> IngestStats:
+        """Load events from a JSONL or CSV file"""
+        return self.ingest(read_events(path))
+
+    def _aggregate(self, batch: List[Tuple]) -> Dict[str, Dict[str, Decimal]]:
+        """
+        Sum state deltas per user, ordered by user_id.
+        The upsert and the follow-up evaluation iterate in this order, so
+        concurrent ingestors lock overlapping user_state rows in the same
+        order and cannot deadlock each other.
+        """
+        deltas: Dict[str, Dict[str, Decimal]] = {}
+        for _, user_id, _, _, value, unit, _ in batch:
+            user_deltas = deltas.setdefault(user_id, dict.fromkeys(UNIT_FIELDS.values(), Decimal(0)))
+            user_deltas[UNIT_FIELDS[unit]] += value
+        return dict(sorted(deltas.items()))
+
+    def _flush(self, batch: List[Tuple], stats: IngestStats):
+        """Write a batch, splitting it on data errors until the failing events are isolated"""
+        try:
+            deltas = self._write(batch)
+        except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+            if len(batch) == 1:
+                stats.skipped += 1
+                logger.warning(f"Skipping event {batch[0][0]}: {str(e).strip()}")
+                return
+            logger.warning(f"Batch of {len(batch)} events rejected, retrying in halves: {str(e).strip()}")
+            middle = len(batch) // 2
+            self._flush(batch[:middle], stats)
+            self._flush(batch[middle:], stats)
+            return
+        except psycopg2.Error as e:
+            stats.skipped += len(batch)
+            logger.error(f"Skipping batch of {len(batch)} events: {str(e).strip()}")
+            return
+
+        stats.events += len(batch)
+        stats.batches += 1
+        stats.state_upserts += len(deltas)
+
+        if self.evaluate:
+            stats.decisions += self._evaluate(deltas)
+
+    def _write(self, batch: List[Tuple]) -> Dict[str, Dict[str, Decimal]]:
+        """Write one batch in one transaction and return its per-user deltas"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow(row + (True,))
+        buffer.seek(0)
+
+        deltas = self._aggregate(batch)
+        state_rows = []
+        for user_id, d in deltas.items():
+            values = (d['internet_today_gb'], d['spend_today_try'], d['content_minutes_today'])
+            state_rows.append((user_id,) + values + values)
+
+        with metrics.stage('ingest_copy'), self.db.transaction():
+            self.db.execute("SET LOCAL decision_engine.bulk_ingest = 'on'")
+            self.db.copy_expert(COPY_EVENTS_SQL, buffer)
+            self.db.execute_values(UPSERT_STATE_SQL, state_rows, UPSERT_STATE_TEMPLATE)
+        return deltas
+
+    def _evaluate(self, deltas: Dict[str, Dict[str, Decimal]]) -> int:
+        """
+        Run the rule engine for users whose state changed in this batch.
+        With engine_config.incremental only rules crossed by the batch's
+        deltas are re-checked and only false -> true transitions are emitted.
+        """
+        from .rule_engine import rule_engine
+
+        decisions = 0
+        for user_id, d in deltas.items():
+            changed = {f: value for f, value in d.items() if value}
+            if not changed:
+                continue
+            if engine_config.incremental:
+                result = rule_engine.process_change(user_id, changed)
+            else:
+                result = rule_engine.process_user(user_id, changed_fields=list(changed))
+            if result:
+                decisions += 1
+        return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load events (JSONL/CSV) into the events table")
+    parser.add_argument('path', help="events file (.jsonl or .csv)")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--evaluate', action='store_true',
+                        help="run the rule engine for users touched by each batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+    metrics.start()
+
+    stats = EventIngestor(batch_size=args.batch_size, evaluate=args.evaluate).ingest_file(args.path)
+    print(
+        f"events={stats.events} batches={stats.batches} state_upserts={stats.state_upserts} "
+        f"skipped={stats.skipped} decisions={stats.decisions} "
+        f"rate={stats.events_per_second:.0f}/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Turkcell Decision Engine - Metrics
+Low-overhead stage timers, latency histograms and counters with Prometheus text export
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import engine_config
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds; chosen around the sub-millisecond evaluation and few-ms insert stages
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+STAGE_SECONDS = 'decision_stage_seconds'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds observations <= buckets[i] (last: +Inf)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'buckets': dict(zip(self.buckets, self.counts)),
+            'inf': self.counts[-1],
+            'sum': self.sum,
+            'count': self.count,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99)
+        }
+
+
+class _StageTimer:
+    """Context manager observing the elapsed monotonic time into a histogram"""
+
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry: 'Metrics', name: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._observe(self.name, self.labels, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    """Shared no-op timer handed out while metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    In-process metric registry.
+
+    Histograms and counters are keyed by metric name and a tuple of label
+    pairs. While disabled, timer() returns a shared no-op context manager
+    and inc()/observe() return after one attribute check, so
+    instrumented code paths pay next to nothing.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._help: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --------------------------------------------------------
+    # Recording
+    # --------------------------------------------------------
+
+    def describe(self, name: str, help_text: str):
+        """HELP text for a metric in the Prometheus export"""
+        self._help[name] = help_text
+
+    def stage(self, stage: str):
+        """Time a decision pipeline stage: with metrics.stage('state_fetch'): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, STAGE_SECONDS, (('stage', stage),))
+
+    def timer(self, name: str, **labels):
+        """Time a block into histogram name with the given labels"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name, tuple(sorted(labels.items())))
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation (seconds) to a histogram"""
+        if self.enabled:
+            self._observe(name, tuple(sorted(labels.items())), value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def inc_each(self, name: str, label: str, values, amount: float = 1):
+        """Increase one counter per value of a single label (e.g. every triggered rule)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for value in values:
+                key = (name, ((label, value),))
+                self._counters[key] = self._counters.get(key, 0) + amount
+
+    def _observe(self, name: str, labels: Labels, value: float):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # --------------------------------------------------------
+    # Reading
+    # --------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Recorded values as plain dicts:
+        {'histograms': {name: {labels: {...}}}, 'counters': {name: {labels: value}}}
+        where labels is a tuple of (label, value) pairs.
+        """
+        with self._lock:
+            histograms: Dict[str, Dict] = {}
+            for (name, labels), histogram in self._histograms.items():
+                histograms.setdefault(name, {})[labels] = histogram.to_dict()
+            counters: Dict[str, Dict] = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, {})[labels] = value
+        return {'histograms': histograms, 'counters': counters}
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Per pipeline stage: count, total/mean/max seconds and bucketed p50/p99"""
+        stages = self.snapshot()['histograms'].get(STAGE_SECONDS, {})
+        return {
+            dict(labels)['stage']: {
+                'count': h['count'],
+                'total': h['sum'],
+                'mean': h['sum'] / h['count'] if h['count'] else 0.0,
+                'max': h['max'],
+                'p50': h['p50'],
+                'p99': h['p99']
+            }
+            for labels, h in stages.items()
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+
+        for name, series in sorted(snapshot['histograms'].items()):
+            self._header(lines, name, 'histogram')
+            for labels, h in sorted(series.items()):
+                cumulative = 0
+                for bound, count in h['buckets'].items():
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h['sum']!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h['count']}")
+
+        for name, series in sorted(snapshot['counters'].items()):
+            self._header(lines, name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value!r}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    # --------------------------------------------------------
+    # Export
+    # --------------------------------------------------------
+
+    def write(self, path: str):
+        """Write the Prometheus text to a file (atomically, for node_exporter's textfile collector)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serve GET /metrics from a daemon thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info(f"Metrics available at http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+    def start(self):
+        """Start the exporters configured in engine_config (HTTP endpoint, file written at exit)"""
+        if not self.enabled:
+            return
+        if engine_config.metrics_port and self._server is None:
+            self.serve(engine_config.metrics_port)
+        if engine_config.metrics_file:
+            atexit.register(self.write, engine_config.metrics_file)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+# Global metrics instance
+metrics = Metrics(engine_config.metrics)
+
+metrics.describe(STAGE_SECONDS, "Time spent in each decision pipeline stage")
+metrics.describe('rule_triggered_total', "Evaluations in which the rule fired")
+metrics.describe('rule_selected_total', "Decisions whose selected action came from the rule")
+metrics.describe('decisions_total', "Decisions created, by selected action")
@@ -0,0 +1,194 @@
+"""
+Turkcell Decision Engine - Partition Management
+Pre-creates upcoming range partitions and expires old ones by retention
+
+Usage:
+    python -m src.partitions             # create upcoming, expire old partitions
+    python -m src.partitions --list
+    python -m src.partitions --dry-run
+"""
+
+import re
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime, time as day_time, timedelta
+from typing import Dict, List, Optional
+
+from .config import db_config
+from .database import db, Database
+
+logger = logging.getLogger(__name__)
+
+
+PARTITIONS_QUERY = """
+    SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound, c.reltuples AS rows
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(%s)
+    ORDER BY c.relname
+"""
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass
+class Partition:
+    """One range partition; start inclusive, end exclusive (None for the default partition)"""
+    table: str
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+    rows: float = 0.0
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class PartitionManager:
+    """
+    Maintains the partitions of the tables listed in partition_policies.
+
+    Partitions are created ahead of time (rows outside every partition land
+    in the <table>_default partition and are moved out by the next
+    maintain()). Partitions whose whole range is older than the table's
+    retention are detached, or dropped with partition_drop_expired. Since
+    detaching fires no delete triggers, the summary counters are corrected
+    in the same transaction.
+    """
+
+    def __init__(self, database: Database = db):
+        self.db = database
+        self._policies: Optional[Dict[str, Dict]] = None
+
+    @property
+    def policies(self) -> Dict[str, Dict]:
+        """table -> {'partition_column', 'step'}; empty before the partitioning migration"""
+        if self._policies is None:
+            present = self.db.execute_one("SELECT to_regclass('partition_policies') IS NOT NULL AS present")
+            rows = self.db.execute("SELECT * FROM partition_policies") if present and present['present'] else []
+            self._policies = {row['table_name']: dict(row) for row in rows or []}
+        return self._policies
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.policies)
+
+    def partitions(self, table: str) -> List[Partition]:
+        """Partitions of a table in range order, the default partition last"""
+        partitions = []
+        for row in self.db.execute(PARTITIONS_QUERY, (table,)) or []:
+            match = _BOUND.search(row['bound'])
+            start, end = (datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))) \
+                if match else (None, None)
+            partitions.append(Partition(table, row['name'], start, end, max(row['rows'], 0)))
+        return sorted(partitions, key=lambda p: (p.is_default, p.start or datetime.min))
+
+    def ensure(self, table: str, start: date, end: date) -> int:
+        """Create the missing partitions covering the days start..end (inclusive)"""
+        if table not in self.policies:
+            return 0
+        result = self.db.execute_one("SELECT ensure_partitions(%s, %s, %s) AS created", (table, start, end))
+        created = result['created'] if result else 0
+        if created:
+            logger.info(f"Created {created} partitions of {table} for {start}..{end}")
+        return created
+
+    def retention_days(self, table: str) -> int:
+        return getattr(db_config, f"{table}_retention_days", 0)
+
+    def expired(self, table: str, today: Optional[date] = None) -> List[Partition]:
+        """Partitions entirely older than the table's retention"""
+        retention = self.retention_days(table)
+        if not retention:
+            return []
+        cutoff = datetime.combine((today or date.today()) - timedelta(days=retention), day_time.min)
+        return [p for p in self.partitions(table) if not p.is_default and p.end <= cutoff]
+
+    def expire(self, partition: Partition, drop: bool = False):
+        """Detach (and optionally drop) a partition, taking its rows out of the summary counters"""
+        name = _quote(partition.name)
+        with self.db.transaction():
+            counters = self.db.execute_one("SELECT to_regclass('summary_counters') IS NOT NULL AS present")
+            if counters and counters['present']:
+                self.db.execute(f"""
+                    INSERT INTO summary_counters AS c (counter, day, slot, value)
+                    SELECT %s, '-infinity', 0, -COUNT(*) FROM {name}
+                    ON CONFLICT (counter, day, slot) DO UPDATE SET value = c.value + EXCLUDED.value
+                """, (partition.table,))
+                self.db.execute(
+                    "DELETE FROM summary_counters WHERE counter = %s AND day >= %s AND day < %s",
+                    (partition.table, partition.start.date(), partition.end.date())
+                )
+            self.db.execute(f"ALTER TABLE {_quote(partition.table)} DETACH PARTITION {name}")
+            if drop:
+                self.db.execute(f"DROP TABLE {name}")
+        logger.info(f"{'Dropped' if drop else 'Detached'} partition {partition.name}")
+
+    def maintain(self, today: Optional[date] = None, dry_run: bool = False) -> Dict[str, List[str]]:
+        """
+        Create partitions up to partition_premake_days ahead, move rows out
+        of the default partitions and expire partitions past retention.
+        """
+        today = today or date.today()
+        result = {'created': [], 'expired': []}
+
+        for table, policy in self.policies.items():
+            if dry_run:
+                result['expired'].extend(p.name for p in self.expired(table, today))
+                continue
+
+            created = self.ensure(table, today, today + timedelta(days=db_config.partition_premake_days))
+
+            # Rows outside every partition (e.g. backfills) get their own partitions
+            column = _quote(policy['partition_column'])
+            bounds = self.db.execute_one(
+                f"SELECT MIN({column})::date AS first, MAX({column})::date AS last FROM {_quote(table + '_default')}"
+            )
+            if bounds and bounds['first']:
+                created += self.ensure(table, bounds['first'], bounds['last'])
+            if created:
+                result['created'].append(f"{table}: {created}")
+
+            for partition in self.expired(table, today):
+                self.expire(partition, db_config.partition_drop_expired)
+                result['expired'].append(partition.name)
+
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming and expire old table partitions")
+    parser.add_argument('--list', action='store_true', help="list partitions with estimated row counts")
+    parser.add_argument('--dry-run', action='store_true', help="only show partitions past retention")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+
+    manager = PartitionManager(db)
+    if not manager.enabled:
+        raise SystemExit("partition_policies not found; apply database/migration_partitioning.sql first")
+
+    if args.list:
+        for table in manager.policies:
+            retention = manager.retention_days(table)
+            print(f"{table} (retention: {f'{retention} days' if retention else 'none'})")
+            for p in manager.partitions(table):
+                span = 'DEFAULT' if p.is_default else f"{p.start:%Y-%m-%d} .. {p.end:%Y-%m-%d}"
+                print(f"  {p.name:<24}{span:<26}~{p.rows:.0f} rows")
+        return
+
+    result = manager.maintain(dry_run=args.dry_run)
+    print(f"created: {', '.join(result['created']) or '-'}")
+    print(f"{'would expire' if args.dry_run else 'expired'}: {', '.join(result['expired']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
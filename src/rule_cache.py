@@ -0,0 +1,158 @@
+"""
+Turkcell Decision Engine - Rule Cache
+Versioned in-process cache of compiled active rules
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .database import RuleRepository
+from .condition_compiler import CompiledCondition, ConditionSyntaxError, compile_condition
+from .rule_index import FieldIndex, ThresholdIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """An active rule row together with its compiled condition"""
+    rule: Dict
+    condition: CompiledCondition
+
+    @property
+    def rule_id(self) -> str:
+        return self.rule['rule_id']
+
+    @property
+    def priority(self) -> int:
+        return self.rule['priority']
+
+    @property
+    def action(self) -> str:
+        return self.rule['action']
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Immutable snapshot of the compiled active rules, sorted by priority"""
+    version: tuple
+    rules: Tuple[CompiledRule, ...]
+    index: FieldIndex
+    thresholds: ThresholdIndex
+
+    def candidates(self, fields: Optional[Iterable[str]] = None) -> Tuple[CompiledRule, ...]:
+        """
+        Rules to evaluate when the given state fields changed.
+        None means every field may have changed.
+        """
+        if fields is None:
+            return self.rules
+        return self.index.lookup(fields)
+
+    def match(self, user_state: Mapping,
+              fields: Optional[Iterable[str]] = None) -> Tuple[CompiledRule, ...]:
+        """
+        Rules triggered by user_state, in priority order, found through the
+        threshold index. fields narrows the rules the same way as candidates().
+        """
+        return self.thresholds.match(user_state, fields)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+
+def compile_rules(rules: List[Dict], version: tuple = ()) -> RuleSet:
+    """
+    Compile rule rows into a RuleSet.
+    Rules with invalid conditions are logged and skipped.
+    """
+    compiled = []
+    for rule in rules:
+        try:
+            condition = compile_condition(rule['condition'])
+        except ConditionSyntaxError as e:
+            logger.error(f"Skipping rule {rule['rule_id']} with invalid condition '{rule['condition']}': {e}")
+            continue
+        compiled.append(CompiledRule(dict(rule), condition))
+
+    compiled.sort(key=lambda r: r.priority)
+    return RuleSet(version, tuple(compiled), FieldIndex(compiled), ThresholdIndex(compiled))
+
+
+class RuleSetCache:
+    """
+    Holds the compiled active rule set between calls.
+
+    The cached set is rebuilt when:
+    - a repository of the same class in this process wrote to its rules
+      table (RuleRepository / ShadowRuleRepository keep separate counters), or
+    - the periodic version check (rule count + MAX(updated_at)) shows
+      that another process changed the table.
+    """
+
+    def __init__(self, rule_repo: RuleRepository, check_interval: float = 5.0):
+        self.rule_repo = rule_repo
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._rule_set: Optional[RuleSet] = None
+        self._local_version = -1
+        self._last_check = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+
+    def get(self) -> RuleSet:
+        """Return the current compiled active rule set"""
+        with self._lock:
+            if self._is_stale():
+                self.misses += 1
+                self._reload()
+            else:
+                self.hits += 1
+            return self._rule_set
+
+    def invalidate(self):
+        """Drop the cached rule set; the next get() reloads it"""
+        with self._lock:
+            self._rule_set = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Cache hit/miss counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'version_checks': self.version_checks,
+            'rules': len(self._rule_set) if self._rule_set else 0
+        }
+
+    def _is_stale(self) -> bool:
+        if self._rule_set is None or self._local_version != self.rule_repo.local_version:
+            return True
+
+        if time.monotonic() - self._last_check < self.check_interval:
+            return False
+
+        self.version_checks += 1
+        self._last_check = time.monotonic()
+        return self.rule_repo.get_version() != self._rule_set.version
+
+    def _reload(self):
+        # Read the version first: a concurrent edit then shows up as a
+        # version mismatch on the next check rather than being missed
+        local_version = self.rule_repo.local_version
+        version = self.rule_repo.get_version()
+        rules = self.rule_repo.get_active() or []
+
+        self._rule_set = compile_rules(rules, version)
+        self._local_version = local_version
+        self._last_check = time.monotonic()
+        logger.debug(f"Rule cache reloaded: {len(self._rule_set)} active rules, version {version}")
@@ -3,17 +3,29 @@ Turkcell Decision Engine - Rule Engine
 Dynamic rule evaluation and decision making
 """
 
-import re
 import json
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 from datetime import datetime, date
 from decimal import Decimal
 
 from .database import (
     db, RuleRepository, UserStateRepository, 
-    DecisionRepository, ActionRepository
+    DecisionRepository, ActionRepository, SequenceIdAllocator,
+    TransactionAborted
 )
+from .condition_compiler import ConditionSyntaxError, compile_condition
+from .rule_cache import RuleSetCache, compile_rules
+from .rule_index import EVENT_TYPE_FIELDS, UNIT_FIELDS
+from .batch_evaluator import StateColumns, evaluate_batch
+from .incremental import IncrementalEvaluator
+from .rule_preview import RulePreview, preview_rule_sets
+from .shadow import ShadowEvaluator
+from .metrics import metrics
+from .state_snapshot import UserIds, load_state
+from .config import engine_config
 
 logger = logging.getLogger(__name__)
 
@@ -50,77 +62,31 @@ class RuleEngine:
         self.decision_repo = DecisionRepository(db)
         self.action_repo = ActionRepository(db)
         
-        # Initialize counters from database to avoid duplicates
-        self._decision_counter = self._get_max_decision_id()
-        self._action_counter = self._get_max_action_id()
-    
-    def _get_max_decision_id(self) -> int:
-        """Get the maximum decision ID number from database"""
-        try:
-            result = db.execute_one("SELECT MAX(CAST(SUBSTRING(decision_id FROM 3) AS INTEGER)) as max_id FROM decisions WHERE decision_id LIKE 'D-%'")
-            if result and result.get('max_id'):
-                return result['max_id']
-        except:
-            pass
-        return 900
-    
-    def _get_max_action_id(self) -> int:
-        """Get the maximum action ID number from database"""
-        try:
-            result = db.execute_one("SELECT MAX(CAST(SUBSTRING(action_id FROM 3) AS INTEGER)) as max_id FROM actions WHERE action_id LIKE 'A-%'")
-            if result and result.get('max_id'):
-                return result['max_id']
-        except:
-            pass
-        return 1000
+        # Compiled active rules, reloaded only when the rules table changes
+        self.rule_cache = RuleSetCache(self.rule_repo, engine_config.rule_cache_check_interval)
+        
+        # Sequence-backed ID allocation (hi/lo blocks, no MAX() scan at startup)
+        self.decision_ids = SequenceIdAllocator(db, 'decision_id_seq', 'D-', engine_config.id_block_size)
+        self.action_ids = SequenceIdAllocator(db, 'action_id_seq', 'A-', engine_config.id_block_size)
+        
+        # Last truth value per user and rule for edge-triggered processing
+        self.incremental = IncrementalEvaluator()
+        
+        # Candidate rule set evaluated next to production on sampled users
+        self.shadow = ShadowEvaluator()
+        
+        # Columnar user_state for impact previews, reloaded after preview_state_ttl
+        self._preview_lock = threading.Lock()
+        self._preview_state: Optional[StateColumns] = None
+        self._preview_loaded_at = 0.0
     
     def evaluate_condition(self, condition: str, user_state: Dict) -> bool:
         """
         Evaluate a rule condition against user state.
-        Supports: >, <, >=, <=, ==, AND, OR, BETWEEN
+        Supports: >, <, >=, <=, ==, AND, OR, BETWEEN, &&, ||
         """
         try:
-            # Replace field names with actual values
-            expr = condition
-            
-            # Handle BETWEEN operator (e.g., "field BETWEEN 10 AND 15")
-            between_pattern = r'(\w+)\s+BETWEEN\s+([\d.]+)\s+AND\s+([\d.]+)'
-            matches = re.findall(between_pattern, expr, re.IGNORECASE)
-            for field, low, high in matches:
-                value = float(user_state.get(field, 0) or 0)
-                result = float(low) <= value <= float(high)
-                expr = re.sub(
-                    rf'{field}\s+BETWEEN\s+{low}\s+AND\s+{high}',
-                    str(result),
-                    expr,
-                    flags=re.IGNORECASE
-                )
-            
-            # Replace field names with values
-            for field, value in user_state.items():
-                if field in expr:
-                    # Handle None values
-                    if value is None:
-                        value = 0
-                    expr = expr.replace(field, str(float(value)))
-            
-            # Replace AND/OR with Python operators
-            expr = re.sub(r'\bAND\b', 'and', expr, flags=re.IGNORECASE)
-            expr = re.sub(r'\bOR\b', 'or', expr, flags=re.IGNORECASE)
-            expr = expr.replace('&&', 'and')
-            expr = expr.replace('||', 'or')
-            
-            # Evaluate the expression safely
-            # Only allow specific operations
-            allowed_chars = set('0123456789.+-*/<>= ()andorTrueFalse')
-            clean_expr = expr.replace(' ', '')
-            if not all(c in allowed_chars for c in clean_expr.replace('and', '').replace('or', '').replace('True', '').replace('False', '')):
-                logger.warning(f"Unsafe expression detected: {condition}")
-                return False
-            
-            result = eval(expr)
-            return bool(result)
-            
+            return compile_condition(condition)(user_state)
         except Exception as e:
             logger.error(f"Failed to evaluate condition '{condition}': {e}")
             return False
@@ -128,53 +94,52 @@ class RuleEngine:
     def is_rule_relevant_to_event(self, condition: str, event_type: str) -> bool:
         """
         Check if a rule is relevant to the given event type.
-        USAGE events -> only internet_today_gb rules
-        PAYMENT events -> only spend_today_try rules
-        CONTENT_CONSUMPTION events -> only content_minutes_today rules
+        USAGE events -> rules reading internet_today_gb
+        PAYMENT events -> rules reading spend_today_try
+        CONTENT_CONSUMPTION events -> rules reading content_minutes_today
+        Rules with an invalid condition are never relevant.
         """
-        condition_lower = condition.lower()
-        
-        # Define which fields each event type affects
-        event_field_map = {
-            'USAGE': 'internet_today_gb',
-            'PAYMENT': 'spend_today_try',
-            'CONTENT_CONSUMPTION': 'content_minutes_today'
-        }
+        relevant_field = EVENT_TYPE_FIELDS.get(event_type)
         
-        relevant_field = event_field_map.get(event_type, '')
+        try:
+            fields = compile_condition(condition).fields
+        except ConditionSyntaxError as e:
+            logger.error(f"Failed to compile condition '{condition}': {e}")
+            return False
         
         if not relevant_field:
             # Unknown event type, evaluate all rules
             return True
         
-        # Check if the condition contains the relevant field
-        # Also allow CRITICAL_ALERT which may check multiple fields
-        if relevant_field in condition_lower:
-            return True
-        
-        # For combined rules (like internet AND spend), check if our field is part of it
-        return relevant_field in condition_lower
+        return relevant_field in fields
     
-    def get_triggered_rules(self, user_state: Dict, event_type: str = None) -> List[Dict]:
+    def get_triggered_rules(self, user_state: Dict, event_type: str = None,
+                            changed_fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """
         Get all rules that are triggered by the current user state.
-        If event_type is provided, only evaluate rules relevant to that event type.
+        If event_type or changed_fields is provided, only rules reading those
+        fields are considered.
+        Single-field threshold rules are matched through the rule set's
+        threshold index; the rest are evaluated with their compiled condition.
         Returns rules sorted by priority (1 = highest priority).
         """
-        active_rules = self.rule_repo.get_active()
+        if changed_fields is None and event_type in EVENT_TYPE_FIELDS:
+            changed_fields = (EVENT_TYPE_FIELDS[event_type],)
+        
         triggered = []
         
-        for rule in active_rules:
-            # Filter by event type if specified
-            if event_type and not self.is_rule_relevant_to_event(rule['condition'], event_type):
-                continue
-            
-            if self.evaluate_condition(rule['condition'], user_state):
-                triggered.append(rule)
-                logger.debug(f"Rule {rule['rule_id']} triggered for condition: {rule['condition']}")
+        with metrics.stage('rule_fetch'):
+            rule_set = self.rule_cache.get()
         
-        # Sort by priority (lower number = higher priority)
-        triggered.sort(key=lambda r: r['priority'])
+        with metrics.stage('evaluate'):
+            matched = rule_set.match(user_state, changed_fields)
+        
+        # Matches are already sorted by priority (lower number = higher priority)
+        for compiled in matched:
+            triggered.append(compiled.rule)
+            logger.debug(f"Rule {compiled.rule_id} triggered for condition: {compiled.condition.source}")
+        
+        metrics.inc_each('rule_triggered_total', 'rule_id', (r['rule_id'] for r in triggered))
         return triggered
 
     
@@ -192,36 +157,189 @@ class RuleEngine:
         
         return selected, suppressed
     
-    def process_user(self, user_id: str, event_type: str = None) -> Optional[Dict]:
+    def process_event(self, event: Dict) -> Optional[Dict]:
+        """
+        Process a user after one of their events was stored.
+        Only rules reading the state field changed by the event's unit are evaluated.
+        With engine_config.incremental, only rules that turn true because of
+        the event produce a decision (see process_change).
+        """
+        changed_field = UNIT_FIELDS.get(event.get('unit'))
+        if engine_config.incremental and changed_field:
+            return self.process_change(event['user_id'], {changed_field: event['value']})
+        
+        changed_fields = (changed_field,) if changed_field else None
+        return self.process_user(event['user_id'], changed_fields=changed_fields)
+    
+    def process_change(self, user_id: str, deltas: Mapping[str, Decimal]) -> Optional[Dict]:
+        """
+        Edge-triggered processing of a state change.
+        deltas maps state fields to the amount they just grew by; the state
+        before the change is the stored state minus the deltas. Only rules
+        with a threshold between the old and new values are re-checked, and a
+        decision is created only for rules that went from false to true.
+        Returns the decision record if any action was taken.
+        """
+        # The user lock spans evaluation, the decision write and commit(), so a
+        # concurrent change for the same user sees this change's truth values.
+        # Truth values are remembered only when the decision is committed:
+        # inside an outer unit of work (where this block is a savepoint) that
+        # is when the outer transaction commits, and not at all if it rolls back.
+        with self.incremental.user_lock(user_id):
+            try:
+                with metrics.stage('process_change'), db.transaction():
+                    with metrics.stage('state_fetch'):
+                        user_state = self.user_state_repo.get_by_user(user_id)
+                    if not user_state:
+                        logger.warning(f"No state found for user {user_id}")
+                        return None
+                    
+                    new_state = dict(user_state)
+                    old_state = dict(new_state)
+                    for field, delta in deltas.items():
+                        old_state[field] = Decimal(new_state.get(field) or 0) - Decimal(str(delta))
+                    
+                    with metrics.stage('rule_fetch'):
+                        rule_set = self.rule_cache.get()
+                    with metrics.stage('evaluate'):
+                        transition = self.incremental.evaluate(rule_set, user_id, old_state, new_state)
+                    db.on_commit(lambda: self.incremental.commit(transition))
+                    metrics.inc_each('rule_triggered_total', 'rule_id', (r.rule_id for r in transition.newly_true))
+                    
+                    if self.shadow.enabled and self.shadow.sampled(user_id):
+                        # Shadow rules are compared on level, like a non-incremental run
+                        production = [r.rule for r in rule_set.match(new_state, deltas.keys())]
+                        self.shadow.observe(user_id, new_state, production, deltas.keys(), 'EVENT')
+                    
+                    result = None
+                    if transition.newly_true:
+                        result = self._build_decision(user_id, user_state, transition.triggered_rules)
+                        if result:
+                            self._persist_decision(result)
+            except TransactionAborted as e:
+                logger.error(f"Decision for user {user_id} rolled back: {e}")
+                return None
+        
+        if result:
+            logger.info(f"Decision {result['decision']['decision_id']} created for user {user_id}: {result['action']['action_type']}")
+        else:
+            logger.debug(f"No rule turned true for user {user_id}")
+        
+        return result
+    
+    def process_user(self, user_id: str, event_type: str = None,
+                     changed_fields: Optional[Iterable[str]] = None) -> Optional[Dict]:
         """
         Process a single user: evaluate rules and create decision/action.
-        If event_type is provided, only evaluate rules relevant to that event type.
+        If event_type or changed_fields is provided, only evaluate rules reading those fields.
         Returns the decision record if any action was taken.
         """
-        # Get current user state
-        user_state = self.user_state_repo.get_by_user(user_id)
-        if not user_state:
-            logger.warning(f"No state found for user {user_id}")
+        if changed_fields is None and event_type in EVENT_TYPE_FIELDS:
+            changed_fields = (EVENT_TYPE_FIELDS[event_type],)
+        
+        try:
+            # State read, decision and action share one transaction and one commit;
+            # inside an outer transaction this becomes a savepoint
+            with metrics.stage('process_user'), db.transaction():
+                # Get current user state
+                with metrics.stage('state_fetch'):
+                    user_state = self.user_state_repo.get_by_user(user_id)
+                if not user_state:
+                    logger.warning(f"No state found for user {user_id}")
+                    return None
+                
+                # Get triggered rules (filtered by changed fields if provided)
+                triggered_rules = self.get_triggered_rules(dict(user_state), event_type, changed_fields)
+                
+                if self.shadow.enabled:
+                    self.shadow.observe(
+                        user_id, dict(user_state), triggered_rules, changed_fields,
+                        'USER' if changed_fields is None else 'EVENT'
+                    )
+                
+                if not triggered_rules:
+                    logger.debug(f"No rules triggered for user {user_id}")
+                    return None
+                
+                result = self._build_decision(user_id, user_state, triggered_rules)
+                if not result:
+                    return None
+                
+                # Save to database
+                self._persist_decision(result)
+        except TransactionAborted as e:
+            logger.error(f"Decision for user {user_id} rolled back: {e}")
             return None
         
-        # Get triggered rules (filtered by event_type if provided)
-        triggered_rules = self.get_triggered_rules(dict(user_state), event_type)
+        logger.info(f"Decision {result['decision']['decision_id']} created for user {user_id}: {result['action']['action_type']}")
         
-        if not triggered_rules:
-            logger.debug(f"No rules triggered for user {user_id}")
-            return None
+        return result
+    
+    def _persist_decision(self, result: Dict):
+        """Write one decision and its action; raises TransactionAborted if either fails"""
+        with metrics.stage('decision_insert'):
+            saved = self.decision_repo.create(result['decision'])
+        if not saved:
+            raise TransactionAborted(f"Decision {result['decision']['decision_id']} could not be saved")
+        with metrics.stage('action_insert'):
+            saved = self.action_repo.create(result['action'])
+        if not saved:
+            raise TransactionAborted(f"Action {result['action']['action_id']} could not be saved")
+        metrics.inc('decisions_total', action=result['action']['action_type'])
+        metrics.inc('rule_selected_total', rule_id=result['triggered_rules'][0]['rule_id'])
+    
+    def persist_batch(self, results: List[Dict]) -> List[Dict]:
+        """
+        Write a batch of decisions and actions in one transaction.
+        If the bulk insert fails, rows are retried one user at a time, each in
+        its own savepoint, so a single bad row does not sink the whole batch.
+        Returns the results that were persisted.
+        """
+        if not results:
+            return []
         
+        with metrics.stage('batch_insert'), db.transaction():
+            try:
+                with db.transaction():
+                    decisions = [r['decision'] for r in results]
+                    actions = [r['action'] for r in results]
+                    if self.decision_repo.create_many(decisions) != len(decisions) or \
+                            self.action_repo.create_many(actions) != len(actions):
+                        raise TransactionAborted("Bulk insert failed")
+                if metrics.enabled:
+                    for result in results:
+                        metrics.inc('decisions_total', action=result['action']['action_type'])
+                        metrics.inc('rule_selected_total', rule_id=result['triggered_rules'][0]['rule_id'])
+                return results
+            except TransactionAborted:
+                logger.warning(f"Bulk insert of {len(results)} decisions failed, retrying per user")
+            
+            persisted = []
+            for result in results:
+                try:
+                    with db.transaction():
+                        self._persist_decision(result)
+                    persisted.append(result)
+                except TransactionAborted as e:
+                    logger.error(f"Skipping decision for user {result['decision']['user_id']}: {e}")
+            return persisted
+    
+    def _build_decision(self, user_id: str, user_state: Dict, triggered_rules: List[Dict]) -> Optional[Dict]:
+        """Select the action for triggered rules and build decision + action records"""
         # Select action
-        selected_rule, suppressed_rules = self.select_action(triggered_rules)
+        with metrics.stage('select'):
+            selected_rule, suppressed_rules = self.select_action(triggered_rules)
         
         if not selected_rule:
             return None
         
         # Generate IDs
-        self._decision_counter += 1
-        self._action_counter += 1
-        decision_id = f"D-{self._decision_counter}"
-        action_id = f"A-{self._action_counter}"
+        with metrics.stage('id_allocation'):
+            decision_id = self.decision_ids.next_id()
+            action_id = self.action_ids.next_id()
+        
+        with metrics.stage('snapshot_serialize'):
+            snapshot = json.dumps(dict(user_state), cls=DecimalEncoder)
         
         # Create decision record
         decision = {
@@ -230,7 +348,7 @@ class RuleEngine:
             'triggered_rules': [r['rule_id'] for r in triggered_rules],
             'selected_action': selected_rule['action'],
             'suppressed_actions': [r['action'] for r in suppressed_rules] if suppressed_rules else None,
-            'user_state_snapshot': json.dumps(dict(user_state), cls=DecimalEncoder)
+            'user_state_snapshot': snapshot
         }
         
         # Create action (BiP notification)
@@ -244,12 +362,6 @@ class RuleEngine:
             )
         }
         
-        # Save to database
-        self.decision_repo.create(decision)
-        self.action_repo.create(action)
-        
-        logger.info(f"Decision {decision_id} created for user {user_id}: {selected_rule['action']}")
-        
         return {
             'decision': decision,
             'action': action,
@@ -257,20 +369,119 @@ class RuleEngine:
             'suppressed_rules': suppressed_rules
         }
     
-    def process_all_users(self) -> List[Dict]:
+    def process_all_users(self, batch: bool = True) -> List[Dict]:
         """
         Process all users and return list of decisions made.
+        In batch mode all rules are evaluated as vectorized masks over
+        columnar user state; otherwise each user goes through process_user.
+        user_state is streamed from a server-side cursor, so only one batch
+        of states is in memory at a time.
         """
+        if not batch:
+            results = []
+            
+            # One commit per batch of users, like the batch path, so decisions
+            # become visible as the run progresses and a failure only rolls
+            # back the current batch; process_user isolates each user in a
+            # savepoint. The state cursor runs on its own pooled connection.
+            for user_states in self.user_state_repo.stream_states(engine_config.batch_size):
+                with db.transaction():
+                    for state in user_states:
+                        result = self.process_user(state['user_id'])
+                        if result:
+                            results.append(result)
+            
+            self.shadow.flush()
+            return results
+        
         results = []
-        user_states = self.user_state_repo.get_all()
+        rule_set = self.rule_cache.get()
         
-        for state in user_states:
-            result = self.process_user(state['user_id'])
-            if result:
-                results.append(result)
+        for rows in self.user_state_repo.stream_states(engine_config.batch_size):
+            # One multi-row write per table and a single commit per batch
+            results.extend(self.persist_batch(self.evaluate_states(rule_set, rows)))
         
+        self.shadow.flush()
         return results
     
+    def evaluate_states(self, rule_set, rows: Sequence[Dict],
+                        columns: Optional[StateColumns] = None) -> List[Dict]:
+        """
+        Evaluate a rule set over a batch of user_state rows with vectorized
+        masks and build decision + action records for users with a triggered rule.
+        If the columns are already available (e.g. a shared state snapshot),
+        rows are only indexed for users with a decision. Nothing is written
+        apart from buffered shadow comparisons.
+        """
+        if columns is None:
+            with metrics.stage('batch_columns'):
+                columns = StateColumns.from_rows(rows)
+        with metrics.stage('batch_evaluate'):
+            batch_result = evaluate_batch(rule_set, columns)
+        if metrics.enabled:
+            for rule, mask in zip(batch_result.rules, batch_result.masks):
+                metrics.inc('rule_triggered_total', int(mask.sum()), rule_id=rule.rule_id)
+        self.shadow.observe_batch(columns, batch_result)
+        
+        results = []
+        with metrics.stage('batch_build'):
+            for index in batch_result.decided_users():
+                result = self._build_decision(
+                    rows[index]['user_id'], rows[index], batch_result.triggered_rules(index)
+                )
+                if result:
+                    results.append(result)
+        return results
+    
+    def preview_state(self, refresh: bool = False,
+                      cancelled: Optional[Callable[[], bool]] = None) -> StateColumns:
+        """
+        All user_state rows as columns for impact previews.
+        Loaded once and reused for engine_config.preview_state_ttl seconds.
+        A load stopped through cancelled raises LoadCancelled and is not kept.
+        """
+        with self._preview_lock:
+            age = time.monotonic() - self._preview_loaded_at
+            if refresh or self._preview_state is None or age > engine_config.preview_state_ttl:
+                user_ids, columns, _ = load_state(db, cancelled)
+                self._preview_state = StateColumns(UserIds(user_ids), columns)
+                self._preview_loaded_at = time.monotonic()
+            return self._preview_state
+    
+    def preview_rules(self, changes: List[Dict], removed: Iterable[str] = (),
+                      sample_size: int = 10,
+                      cancelled: Optional[Callable[[], bool]] = None) -> RulePreview:
+        """
+        What-if evaluation of a modified rule set over every current user_state row.
+        changes are rule dicts that are added to, or replace (by rule_id), the
+        active rules; rules listed in removed or with is_active False are taken out.
+        Returns trigger counts, per-action selection deltas, suppressed actions
+        and sample user IDs. Nothing is written.
+        Raises ConditionSyntaxError if a changed rule has an invalid condition,
+        and LoadCancelled if cancelled() returns True while user_state loads.
+        """
+        for rule in changes:
+            compile_condition(rule['condition'])
+        
+        current = self.rule_cache.get()
+        changed = {rule['rule_id']: rule for rule in changes}
+        dropped = set(removed) | {rule_id for rule_id, rule in changed.items() if not rule.get('is_active', True)}
+        
+        rules = [c.rule for c in current if c.rule_id not in changed and c.rule_id not in dropped]
+        rules += [rule for rule_id, rule in changed.items() if rule_id not in dropped]
+        proposed = compile_rules(rules, version=('preview',) + tuple(current.version))
+        
+        return preview_rule_sets(
+            current, proposed, self.preview_state(cancelled=cancelled),
+            sample_rule_ids=[rule_id for rule_id in changed if rule_id not in dropped],
+            sample_size=sample_size
+        )
+    
+    def preview_rule(self, rule: Dict, sample_size: int = 10,
+                     cancelled: Optional[Callable[[], bool]] = None) -> RulePreview:
+        """What-if evaluation of adding (or replacing) a single rule"""
+        return self.preview_rules([rule], sample_size=sample_size, cancelled=cancelled)
+    
     def simulate_evaluation(self, user_state: Dict) -> List[Dict]:
         """
         Simulate rule evaluation without saving to database.
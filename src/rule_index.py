@@ -0,0 +1,353 @@
+"""
+Turkcell Decision Engine - Rule Indexes
+Lookup structures that narrow down which rules need evaluation
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from .condition_compiler import Node, Field, Number, Comparison, Between, BoolOp, read_field
+
+if TYPE_CHECKING:
+    from .rule_cache import CompiledRule
+
+
+# user_state field updated by each event unit (mirrors update_user_state_from_event)
+UNIT_FIELDS = {
+    'GB': 'internet_today_gb',
+    'TRY': 'spend_today_try',
+    'MIN': 'content_minutes_today'
+}
+
+# user_state field updated by each event type
+EVENT_TYPE_FIELDS = {
+    'USAGE': 'internet_today_gb',
+    'PAYMENT': 'spend_today_try',
+    'CONTENT_CONSUMPTION': 'content_minutes_today'
+}
+
+
+class FieldIndex:
+    """
+    Inverted index from state field to the rules that read it.
+    Built from the parsed condition ASTs, so a multi-field rule such as
+    'internet_today_gb > 15 AND spend_today_try > 300' is listed under
+    both fields.
+    """
+
+    def __init__(self, rules: Sequence['CompiledRule']):
+        # Rules are expected in priority order; positions preserve it
+        self._rules = tuple(rules)
+        self._by_field: Dict[str, Tuple[int, ...]] = {}
+
+        positions: Dict[str, List[int]] = {}
+        for position, rule in enumerate(self._rules):
+            for field in rule.condition.fields:
+                positions.setdefault(field, []).append(position)
+        self._by_field = {field: tuple(p) for field, p in positions.items()}
+
+        # Candidate lists per field combination, computed on first use
+        self._lookups: Dict[FrozenSet[str], Tuple['CompiledRule', ...]] = {}
+
+    @property
+    def fields(self) -> FrozenSet[str]:
+        """Fields read by at least one rule"""
+        return frozenset(self._by_field)
+
+    def rule_ids(self, field: str) -> List[str]:
+        """IDs of the rules that read the given field, in priority order"""
+        return [self._rules[p].rule_id for p in self._by_field.get(field, ())]
+
+    def lookup(self, fields: Iterable[str]) -> Tuple['CompiledRule', ...]:
+        """Rules reading any of the given fields, in priority order"""
+        key = frozenset(fields)
+        candidates = self._lookups.get(key)
+        if candidates is None:
+            positions = set()
+            for field in key:
+                positions.update(self._by_field.get(field, ()))
+            candidates = tuple(self._rules[p] for p in sorted(positions))
+            self._lookups[key] = candidates
+        return candidates
+
+
+# ============================================================
+# Threshold / interval index for single-field rules
+# ============================================================
+
+_INF = float('inf')
+
+
+@dataclass(frozen=True)
+class Interval:
+    """A range of field values; unbounded ends use +/-inf"""
+    low: float
+    high: float
+    low_closed: bool = True
+    high_closed: bool = True
+
+    def __contains__(self, value: float) -> bool:
+        if value < self.low or (value == self.low and not self.low_closed):
+            return False
+        if value > self.high or (value == self.high and not self.high_closed):
+            return False
+        return True
+
+    @property
+    def is_empty(self) -> bool:
+        if self.low > self.high:
+            return True
+        return self.low == self.high and not (self.low_closed and self.high_closed)
+
+    def intersect(self, other: 'Interval') -> 'Interval':
+        if (self.low, not self.low_closed) >= (other.low, not other.low_closed):
+            low, low_closed = self.low, self.low_closed
+        else:
+            low, low_closed = other.low, other.low_closed
+        if (self.high, self.high_closed) <= (other.high, other.high_closed):
+            high, high_closed = self.high, self.high_closed
+        else:
+            high, high_closed = other.high, other.high_closed
+        return Interval(low, high, low_closed, high_closed)
+
+
+# "field op constant" as an interval of matching field values
+_COMPARISON_INTERVALS = {
+    '>': lambda c: Interval(c, _INF, False, False),
+    '>=': lambda c: Interval(c, _INF, True, False),
+    '<': lambda c: Interval(-_INF, c, False, False),
+    '<=': lambda c: Interval(-_INF, c, False, True),
+    '==': lambda c: Interval(c, c, True, True)
+}
+
+# "constant op field" rewritten as "field op' constant"
+_MIRRORED = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '==': '=='}
+
+
+def condition_intervals(node: Node) -> Optional[Tuple[str, Tuple[Interval, ...]]]:
+    """
+    Describe a single-field condition as (field, union of intervals).
+    Returns None for conditions that read several fields or compare
+    a field against something other than a constant.
+    """
+    if isinstance(node, Comparison):
+        if isinstance(node.left, Field) and isinstance(node.right, Number):
+            field, op, constant = node.left.name, node.op, node.right.value
+        elif isinstance(node.left, Number) and isinstance(node.right, Field):
+            field, op, constant = node.right.name, _MIRRORED[node.op], node.left.value
+        else:
+            return None
+        return field, _non_empty((_COMPARISON_INTERVALS[op](constant),))
+
+    if isinstance(node, Between):
+        if not (isinstance(node.operand, Field) and isinstance(node.low, Number)
+                and isinstance(node.high, Number)):
+            return None
+        return node.operand.name, _non_empty((Interval(node.low.value, node.high.value),))
+
+    if isinstance(node, BoolOp):
+        parts = [condition_intervals(child) for child in node.operands]
+        if any(p is None for p in parts) or len({field for field, _ in parts}) != 1:
+            return None
+        field = parts[0][0]
+        if node.op == 'OR':
+            return field, tuple(i for _, intervals in parts for i in intervals)
+        result = parts[0][1]
+        for _, intervals in parts[1:]:
+            result = _non_empty(tuple(a.intersect(b) for a in result for b in intervals))
+        return field, result
+
+    return None
+
+
+def _non_empty(intervals: Iterable[Interval]) -> Tuple[Interval, ...]:
+    return tuple(i for i in intervals if not i.is_empty)
+
+
+class _IntervalTree:
+    """
+    Static centered interval tree over bounded intervals.
+    stab(value) visits O(log n) nodes plus the intervals it reports.
+    """
+
+    __slots__ = ('center', 'by_low', 'by_high', 'left', 'right')
+
+    def __init__(self, entries: List[Tuple[Interval, int]]):
+        points = sorted(p for interval, _ in entries for p in (interval.low, interval.high))
+        self.center = points[len(points) // 2]
+
+        here, left, right = [], [], []
+        for entry in entries:
+            interval = entry[0]
+            if interval.high < self.center:
+                left.append(entry)
+            elif interval.low > self.center:
+                right.append(entry)
+            else:
+                here.append(entry)
+
+        self.by_low = sorted(here, key=lambda e: e[0].low)
+        self.by_high = sorted(here, key=lambda e: e[0].high, reverse=True)
+        self.left = _IntervalTree(left) if left else None
+        self.right = _IntervalTree(right) if right else None
+
+    def stab(self, value: float, out: set):
+        node = self
+        while node is not None:
+            if value < node.center:
+                for interval, position in node.by_low:
+                    if interval.low > value:
+                        break
+                    if value in interval:
+                        out.add(position)
+                node = node.left
+            elif value > node.center:
+                for interval, position in node.by_high:
+                    if interval.high < value:
+                        break
+                    if value in interval:
+                        out.add(position)
+                node = node.right
+            else:
+                out.update(p for interval, p in node.by_low if value in interval)
+                return
+
+
+class _FieldThresholds:
+    """
+    Matching structures for the single-field rules of one state field:
+    - 'field > c' / 'field >= c' in a list sorted by threshold (bisect gives
+      the prefix that matches),
+    - 'field < c' / 'field <= c' likewise (bisect gives the suffix),
+    - bounded ranges (BETWEEN, ==, AND-ed bounds) in an interval tree.
+    """
+
+    def __init__(self, entries: List[Tuple[Interval, int]]):
+        lower, upper, bounded = [], [], []
+        for interval, position in entries:
+            if interval.high == _INF:
+                # Sort key (c, 0) for >=, (c, 1) for >: value matches while key < (value, 1)
+                lower.append(((interval.low, 0 if interval.low_closed else 1), position))
+            elif interval.low == -_INF:
+                # Sort key (c, 1) for <=, (c, 0) for <: value matches while key > (value, 0)
+                upper.append(((interval.high, 1 if interval.high_closed else 0), position))
+            else:
+                bounded.append((interval, position))
+
+        lower.sort()
+        upper.sort()
+        self._lower_keys = [k for k, _ in lower]
+        self._lower_positions = [p for _, p in lower]
+        self._upper_keys = [k for k, _ in upper]
+        self._upper_positions = [p for _, p in upper]
+        self._tree = _IntervalTree(bounded) if bounded else None
+
+        # Finite interval endpoints: a rule's truth can only change between two
+        # values of the field if one of its endpoints lies between them
+        boundaries = sorted(
+            (point, position)
+            for interval, position in entries
+            for point in (interval.low, interval.high)
+            if -_INF < point < _INF
+        )
+        self._boundary_points = [p for p, _ in boundaries]
+        self._boundary_positions = [p for _, p in boundaries]
+
+    def stab(self, value: float, out: set):
+        """Add the positions of the rules matching value to out"""
+        out.update(self._lower_positions[:bisect_left(self._lower_keys, (value, 1))])
+        out.update(self._upper_positions[bisect_right(self._upper_keys, (value, 0)):])
+        if self._tree is not None:
+            self._tree.stab(value, out)
+
+    def crossing(self, low: float, high: float, out: set):
+        """Add the positions of the rules with an endpoint in [low, high] to out"""
+        start = bisect_left(self._boundary_points, low)
+        end = bisect_right(self._boundary_points, high)
+        out.update(self._boundary_positions[start:end])
+
+
+class ThresholdIndex:
+    """
+    Finds the triggered rules for a state without testing every rule.
+
+    Rules that read a single field and compare it only against constants
+    are turned into intervals of matching values and looked up by
+    bisection / interval-tree stabbing, so the cost grows with the number
+    of matches rather than the number of rules. Any other rule (multi-field,
+    field-to-field comparisons) is evaluated with its compiled condition.
+    """
+
+    def __init__(self, rules: Sequence['CompiledRule']):
+        # Rules are expected in priority order; positions preserve it
+        self._rules = tuple(rules)
+
+        entries: Dict[str, List[Tuple[Interval, int]]] = {}
+        fallback: List[int] = []
+        for position, rule in enumerate(self._rules):
+            described = condition_intervals(rule.condition.ast)
+            if described is None:
+                fallback.append(position)
+                continue
+            field, intervals = described
+            # A rule whose ranges are all empty can never fire
+            for interval in intervals:
+                entries.setdefault(field, []).append((interval, position))
+
+        self._fields = {field: _FieldThresholds(e) for field, e in entries.items()}
+        self._fallback = tuple(fallback)
+
+    @property
+    def indexed_count(self) -> int:
+        """Number of rules served by the threshold structures"""
+        return len(self._rules) - len(self._fallback)
+
+    @property
+    def fallback_count(self) -> int:
+        """Number of rules evaluated with their compiled condition"""
+        return len(self._fallback)
+
+    def match(self, user_state: Mapping,
+              fields: Optional[Iterable[str]] = None) -> Tuple['CompiledRule', ...]:
+        """
+        Rules triggered by user_state, in priority order.
+        If fields is given, only rules reading those fields are considered
+        (same narrowing as FieldIndex.lookup).
+        """
+        fields = frozenset(fields) if fields is not None else None
+        positions = set()
+
+        for field, thresholds in self._fields.items():
+            if fields is None or field in fields:
+                thresholds.stab(read_field(user_state, field), positions)
+
+        for position in self._fallback:
+            condition = self._rules[position].condition
+            if (fields is None or not condition.fields.isdisjoint(fields)) and condition(user_state):
+                positions.add(position)
+
+        return tuple(self._rules[p] for p in sorted(positions))
+
+    def crossing(self, changes: Mapping[str, Tuple[float, float]]) -> Tuple['CompiledRule', ...]:
+        """
+        Rules whose truth may differ after fields change from old to new
+        values ({field: (old, new)}), in priority order: single-field rules
+        with a threshold between the two values, plus every other rule that
+        reads a changed field.
+        """
+        positions = set()
+        changed = set()
+        for field, (old_value, new_value) in changes.items():
+            if old_value == new_value:
+                continue
+            changed.add(field)
+            thresholds = self._fields.get(field)
+            if thresholds is not None:
+                thresholds.crossing(min(old_value, new_value), max(old_value, new_value), positions)
+
+        if changed:
+            positions.update(
+                p for p in self._fallback if not self._rules[p].condition.fields.isdisjoint(changed)
+            )
+        return tuple(self._rules[p] for p in sorted(positions))
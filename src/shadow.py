@@ -0,0 +1,343 @@
+"""
+Turkcell Decision Engine - Shadow Evaluation
+Evaluates a candidate rule set next to the production rules without acting on it
+
+Usage:
+    python -m src.shadow --load candidate_rules.json
+    python -m src.shadow --copy-production
+    python -m src.shadow --report [--since 2026-10-01]
+"""
+
+import json
+import zlib
+import queue
+import atexit
+import weakref
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import engine_config
+from .database import db, Database, RuleRepository, ShadowRuleRepository, ShadowDecisionRepository
+from .batch_evaluator import BatchResult, StateColumns, evaluate_batch
+from .rule_cache import RuleSet, RuleSetCache
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# Sinks
+# ============================================================
+
+class TableSink:
+    """Buffers shadow decisions and writes them to shadow_decisions in bulk"""
+
+    def __init__(self, database: Database = db):
+        self.repo = ShadowDecisionRepository(database)
+
+    def write(self, rows: List[Dict]) -> int:
+        return self.repo.create_many(rows)
+
+
+class FileSink:
+    """Appends shadow decisions to a JSON Lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, rows: List[Dict]) -> int:
+        timestamp = datetime.now().isoformat()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(row, timestamp=timestamp), ensure_ascii=False) + '\n')
+        return len(rows)
+
+
+# ============================================================
+# Evaluator
+# ============================================================
+
+# Full buffers waiting for the writer thread; beyond this they are dropped
+MAX_PENDING_WRITES = 100
+
+# Every evaluator is flushed once at exit; discarded evaluators drop out
+_evaluators: 'weakref.WeakSet[ShadowEvaluator]' = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for evaluator in list(_evaluators):
+        evaluator.flush()
+
+
+class ShadowEvaluator:
+    """
+    Runs the active shadow_rules next to production on a sample of users.
+
+    The shadow set is evaluated against the state production already
+    fetched (and, in sweeps, against the same columns), so the extra cost
+    is evaluation only. Users are sampled by a stable hash of user_id, so
+    the same cohort is compared over time; a rate of 0 disables shadowing.
+
+    Evaluations where neither rule set fires are only counted; the rest
+    are buffered and written to shadow_decisions (or a JSONL file) by a
+    background writer thread, on its own connection: production never waits
+    for a shadow write, and a production rollback does not undo one. The
+    same thread keeps the shadow rule set fresh, so no shadow query runs
+    inside a production transaction.
+    """
+
+    def __init__(self, sample_rate: Optional[float] = None, output: Optional[str] = None,
+                 database: Database = db):
+        self.sample_rate = engine_config.shadow_sample_rate if sample_rate is None else sample_rate
+        output = engine_config.shadow_output if output is None else output
+        self.db = database
+        self.sink = FileSink(output) if output else TableSink(database)
+        self.rule_cache = RuleSetCache(ShadowRuleRepository(database), engine_config.rule_cache_check_interval)
+
+        self._threshold = int(self.sample_rate * 10000)
+        self._lock = threading.Lock()
+        self._buffer: List[Dict] = []
+        self._shadow_set: Optional[RuleSet] = None
+        self._pending: queue.Queue = queue.Queue(MAX_PENDING_WRITES)
+        self._writer: Optional[threading.Thread] = None
+
+        self.evaluations = 0
+        self.agreements = 0
+        self.written = 0
+        self.dropped = 0
+        self.rule_counts: Counter = Counter()   # (rule_id, 'production' | 'shadow' | 'both')
+
+        _evaluators.add(self)
+
+    @property
+    def enabled(self) -> bool:
+        return self._threshold > 0
+
+    def sampled(self, user_id: str) -> bool:
+        """Whether this user is part of the shadow cohort"""
+        return zlib.crc32(user_id.encode()) % 10000 < self._threshold
+
+    def observe(self, user_id: str, user_state: Dict, production_rules: Sequence[Dict],
+                fields=None, source: str = 'USER'):
+        """
+        Compare production's triggered rules for one user with the shadow
+        set evaluated on the same state (narrowed to the same fields).
+        """
+        if not self.enabled or not self.sampled(user_id):
+            return
+        shadow_set = self._rule_set()
+        if shadow_set is None:
+            return
+        try:
+            shadow = shadow_set.match(user_state, fields)
+        except Exception as e:
+            logger.error(f"Shadow evaluation failed for user {user_id}: {e}")
+            return
+        self._record(
+            user_id, source,
+            [r['rule_id'] for r in production_rules], [r.rule_id for r in shadow],
+            production_rules[0]['action'] if production_rules else None,
+            shadow[0].action if shadow else None
+        )
+
+    def observe_batch(self, columns: StateColumns, production: BatchResult, source: str = 'SWEEP'):
+        """Compare a vectorized production batch with the shadow set on the sampled users"""
+        if not self.enabled or not len(columns):
+            return
+        sampled = np.fromiter(
+            (self.sampled(user_id) for user_id in columns.user_ids), dtype=bool, count=len(columns)
+        )
+        indices = np.flatnonzero(sampled)
+        if not len(indices):
+            return
+
+        shadow_set = self._rule_set()
+        if shadow_set is None:
+            return
+        subset = StateColumns(
+            [columns.user_ids[i] for i in indices],
+            {field: values[indices] for field, values in columns.columns.items()}
+        )
+        shadow = evaluate_batch(shadow_set, subset)
+
+        for position, index in enumerate(indices):
+            production_rules = [production.rules[r] for r in np.flatnonzero(production.masks[:, index])]
+            shadow_rules = [shadow.rules[r] for r in np.flatnonzero(shadow.masks[:, position])]
+            self._record(
+                subset.user_ids[position], source,
+                [r.rule_id for r in production_rules], [r.rule_id for r in shadow_rules],
+                production.rules[production.selected[index]].action if production.has_decision[index] else None,
+                shadow.rules[shadow.selected[position]].action if shadow.has_decision[position] else None
+            )
+
+    def _rule_set(self) -> Optional[RuleSet]:
+        """
+        The shadow rule set as last loaded by the writer thread. Outside a
+        transaction the first load happens inline; inside one, observations
+        are skipped until the writer has loaded it.
+        """
+        self._start_writer()
+        if self._shadow_set is None and not self.db.in_transaction:
+            self._refresh_rules()
+        return self._shadow_set
+
+    def _refresh_rules(self):
+        try:
+            self._shadow_set = self.rule_cache.get()
+        except Exception as e:
+            logger.error(f"Shadow rule set could not be loaded: {e}")
+
+    def _record(self, user_id: str, source: str, production_rules: List[str], shadow_rules: List[str],
+                production_action: Optional[str], shadow_action: Optional[str]):
+        with self._lock:
+            self.evaluations += 1
+            if production_action == shadow_action:
+                self.agreements += 1
+            shadow_set = set(shadow_rules)
+            for rule_id in production_rules:
+                self.rule_counts[(rule_id, 'production')] += 1
+                if rule_id in shadow_set:
+                    self.rule_counts[(rule_id, 'both')] += 1
+            for rule_id in shadow_rules:
+                self.rule_counts[(rule_id, 'shadow')] += 1
+
+            if not production_rules and not shadow_rules:
+                return
+            self._buffer.append({
+                'user_id': user_id,
+                'source': source,
+                'production_rules': production_rules,
+                'shadow_rules': shadow_rules,
+                'production_action': production_action,
+                'shadow_action': shadow_action
+            })
+            if len(self._buffer) < engine_config.shadow_flush_size:
+                return
+            rows, self._buffer = self._buffer, []
+        self._enqueue(rows)
+
+    def flush(self):
+        """Hand buffered shadow decisions to the writer and wait until all are written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if rows:
+            self._enqueue(rows)
+        if self._writer is not None:
+            self._pending.join()
+
+    def _enqueue(self, rows: List[Dict]):
+        self._start_writer()
+        try:
+            self._pending.put_nowait(rows)
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(rows)
+            logger.warning(f"Shadow writer is behind; dropped {len(rows)} shadow decisions")
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name='shadow-writer', daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            # RuleSetCache only queries when its check interval has passed
+            self._refresh_rules()
+            try:
+                rows = self._pending.get(timeout=engine_config.rule_cache_check_interval)
+            except queue.Empty:
+                continue
+            try:
+                written = self.sink.write(rows)
+                with self._lock:
+                    self.written += written
+            except Exception as e:
+                with self._lock:
+                    self.dropped += len(rows)
+                logger.error(f"Writing {len(rows)} shadow decisions failed: {e}")
+            finally:
+                self._pending.task_done()
+
+    @property
+    def stats(self) -> Dict:
+        """In-process counters: evaluations, action agreement and per-rule firing"""
+        rules = {}
+        for (rule_id, side), count in self.rule_counts.items():
+            rules.setdefault(rule_id, {'production': 0, 'shadow': 0, 'both': 0})[side] = count
+        return {
+            'sample_rate': self.sample_rate,
+            'evaluations': self.evaluations,
+            'agreements': self.agreements,
+            'written': self.written,
+            'dropped': self.dropped,
+            'rules': rules
+        }
+
+
+# ============================================================
+# Report / CLI
+# ============================================================
+
+def divergence_report(since: Optional[datetime] = None, database: Database = db) -> str:
+    """Text summary of stored shadow decisions: action agreement and per-rule divergence"""
+    repo = ShadowDecisionRepository(database)
+    agreement = repo.get_action_agreement(since) or []
+    rules = repo.get_rule_divergence(since) or []
+
+    total = sum(row['evaluations'] for row in agreement)
+    same = sum(row['evaluations'] for row in agreement if row['production_action'] == row['shadow_action'])
+
+    lines = [f"Stored evaluations: {total}, same selected action: {same}"
+             + (f" ({same / total:.1%})" if total else "")]
+    lines.append("")
+    lines.append(f"{'rule':<12}{'production':>12}{'shadow':>10}{'both':>8}{'only prod':>11}{'only shadow':>13}")
+    for row in rules:
+        lines.append(
+            f"{row['rule_id']:<12}{row['production']:>12}{row['shadow']:>10}{row['both']:>8}"
+            f"{row['only_production']:>11}{row['only_shadow']:>13}"
+        )
+    lines.append("")
+    lines.append("Action pairs (production -> shadow):")
+    for row in agreement:
+        if row['production_action'] != row['shadow_action']:
+            lines.append(f"  {row['production_action'] or '-'} -> {row['shadow_action'] or '-'}: {row['evaluations']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage and report on the shadow rule set")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--load', metavar='FILE', help="replace shadow_rules with the rules in a JSON file")
+    group.add_argument('--copy-production', action='store_true', help="replace shadow_rules with the production rules")
+    group.add_argument('--report', action='store_true', help="print the divergence report")
+    parser.add_argument('--since', type=datetime.fromisoformat, help="report only decisions since this time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not db.connect():
+        raise SystemExit("Database connection failed")
+
+    if args.report:
+        print(divergence_report(args.since))
+        return
+
+    if args.load:
+        with open(args.load, encoding='utf-8') as f:
+            rules = json.load(f)
+    else:
+        rules = RuleRepository(db).get_all() or []
+    count = ShadowRuleRepository(db).replace_all(rules)
+    print(f"Loaded {count} shadow rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Turkcell Decision Engine - Shared State Snapshot
+Columnar user_state in shared memory for zero-copy multi-process evaluation
+"""
+
+import sys
+import logging
+import threading
+from contextlib import closing
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .condition_compiler import STATE_FIELDS
+from .batch_evaluator import StateColumns
+from .database import db, Database
+
+logger = logging.getLogger(__name__)
+
+
+RISK_LEVELS: Tuple[str, ...] = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+RISK_CODES = {level: code for code, level in enumerate(RISK_LEVELS)}
+RISK_UNKNOWN = -1                    # NULL or unrecognized risk_level
+
+USER_ID_DTYPE = np.dtype('S10')     # user_id VARCHAR(10)
+
+_MAGIC = 0x5553544154450002          # "USTATE" + layout version
+_HEADER = np.dtype([('magic', '<i8'), ('epoch', '<i8'), ('count', '<i8')])
+_HEADER_SIZE = 64
+_ALIGN = 64
+
+# Metrics are cast to float8 so rows arrive as floats instead of Decimals
+SNAPSHOT_QUERY = f"""
+    SELECT user_id, {', '.join(f'COALESCE({f}, 0)::float8' for f in STATE_FIELDS)}, risk_level
+    FROM user_state
+    ORDER BY user_id
+"""
+
+
+def _layout(count: int) -> Tuple[Dict[str, Tuple[int, np.dtype]], int]:
+    """Byte offset and dtype of every column for a block holding count users"""
+    columns = [('user_id', USER_ID_DTYPE)]
+    columns += [(field, np.dtype('<f8')) for field in STATE_FIELDS]
+    columns.append(('risk_level', np.dtype('i1')))
+
+    offsets = {}
+    offset = _HEADER_SIZE
+    for name, dtype in columns:
+        offsets[name] = (offset, dtype)
+        offset += -(-count * dtype.itemsize // _ALIGN) * _ALIGN
+    return offsets, offset
+
+
+class LoadCancelled(Exception):
+    """Raised by load_state() when its cancelled() callback returns True"""
+
+
+def risk_code(level: Optional[str]) -> int:
+    """int8 code of a risk_level; NULL and unknown levels get RISK_UNKNOWN"""
+    return RISK_CODES.get(level, RISK_UNKNOWN)
+
+
+def risk_level(code: int) -> Optional[str]:
+    """risk_level for a code from risk_code(); None for RISK_UNKNOWN"""
+    return RISK_LEVELS[code] if 0 <= code < len(RISK_LEVELS) else None
+
+
+def partitions(count: int, parts: int) -> Iterator[Tuple[int, int]]:
+    """(start, stop) ranges splitting count users into parts contiguous slices"""
+    for part in range(parts):
+        yield count * part // parts, count * (part + 1) // parts
+
+
+def load_state(database: Database = db, cancelled: Optional[Callable[[], bool]] = None
+               ) -> Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+    """
+    Read user_state as columns: user_ids (USER_ID_DTYPE), {field: float64},
+    risk level codes (int8, see risk_code()).
+    Batches from a server-side cursor are copied straight into preallocated
+    arrays, so memory stays at the size of the final columns (plus one
+    batch) instead of one boxed Python object per value.
+    cancelled is checked before every batch; LoadCancelled is raised once
+    it returns True.
+    """
+    # Only a size hint: users added meanwhile grow the arrays geometrically
+    estimate = database.execute_one("SELECT COUNT(*) AS count FROM user_state")
+    capacity = max(int(estimate['count']) if estimate else 0, 1024)
+
+    user_ids = np.empty(capacity, dtype=USER_ID_DTYPE)
+    columns = {field: np.empty(capacity, dtype=np.float64) for field in STATE_FIELDS}
+    risks = np.empty(capacity, dtype=np.int8)
+
+    count = 0
+    # Closed explicitly so a cancelled load returns its pooled connection at once
+    with closing(database.stream_batches(SNAPSHOT_QUERY, dict_cursor=False)) as batches:
+        for rows in batches:
+            if cancelled is not None and cancelled():
+                raise LoadCancelled(f"user_state load cancelled after {count} rows")
+            end = count + len(rows)
+            if end > capacity:
+                capacity = max(end, capacity * 2)
+                user_ids = _grow(user_ids, count, capacity)
+                columns = {field: _grow(values, count, capacity) for field, values in columns.items()}
+                risks = _grow(risks, count, capacity)
+
+            values = list(zip(*rows))
+            user_ids[count:end] = values[0]
+            for field, column in zip(STATE_FIELDS, values[1:-1]):
+                columns[field][count:end] = column
+            risks[count:end] = [risk_code(level) for level in values[-1]]
+            count = end
+
+    return user_ids[:count], {field: values[:count] for field, values in columns.items()}, risks[:count]
+
+
+def _grow(array: np.ndarray, count: int, capacity: int) -> np.ndarray:
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:count] = array[:count]
+    return grown
+
+
+def _block_name(name: str, epoch: int) -> str:
+    return f"{name}_{epoch}"
+
+
+def _control_name(name: str) -> str:
+    return f"{name}_ctl"
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing block. Only the publisher unlinks blocks.
+    Before Python 3.13 attaching also registers the block with the resource
+    tracker; processes started by the publisher's process share its tracker,
+    where the publisher's unlink() removes the entry again, but a reader in
+    an unrelated process would have the block removed when it exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    """Close and remove a block owned by this process"""
+    shm.close()
+    shm.unlink()
+
+
+class SnapshotSlice:
+    """
+    A contiguous range of users in a snapshot.
+    columns are zero-copy views; indexing builds a user_state-like dict
+    for one user, so only decided users are ever materialized.
+    """
+
+    def __init__(self, snapshot: 'StateSnapshot', start: int, stop: int):
+        self.snapshot = snapshot
+        self.start = start
+        self.stop = stop
+        self.columns = StateColumns(
+            UserIds(snapshot.user_ids[start:stop]),
+            {field: snapshot.columns[field][start:stop] for field in STATE_FIELDS}
+        )
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index: int) -> Dict:
+        return self.snapshot.row(self.start + index)
+
+
+class UserIds(Sequence):
+    """Decodes user_ids from the fixed-width column on access"""
+
+    def __init__(self, raw: np.ndarray):
+        self._raw = raw
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [v.decode() for v in self._raw[index]]
+        return self._raw[index].decode()
+
+
+class StateSnapshot:
+    """
+    Read-only view of one epoch of the shared user_state columns.
+    Attach with StateSnapshot.attach(name); nothing is copied or unpickled.
+    """
+
+    def __init__(self, name: str, control: shared_memory.SharedMemory,
+                 block: shared_memory.SharedMemory):
+        self.name = name
+        self._control = control
+        self._block = block
+
+        header = np.ndarray((1,), dtype=_HEADER, buffer=block.buf)[0]
+        if header['magic'] != _MAGIC:
+            raise ValueError(f"Shared memory block {block.name} is not a state snapshot")
+        self.epoch = int(header['epoch'])
+        self.count = int(header['count'])
+
+        offsets, _ = _layout(self.count)
+        arrays = {
+            column: np.ndarray((self.count,), dtype=dtype, buffer=block.buf, offset=offset)
+            for column, (offset, dtype) in offsets.items()
+        }
+        for array in arrays.values():
+            array.flags.writeable = False
+
+        self.user_ids: np.ndarray = arrays.pop('user_id')
+        self.risk_levels: np.ndarray = arrays.pop('risk_level')
+        self.columns: Dict[str, np.ndarray] = arrays
+
+    @classmethod
+    def attach(cls, name: str, retries: int = 5) -> 'StateSnapshot':
+        """Attach to the current epoch of the snapshot published under name"""
+        control = _open(_control_name(name))
+        for _ in range(retries):
+            epoch = int(np.ndarray((1,), dtype='<i8', buffer=control.buf)[0])
+            try:
+                block = _open(_block_name(name, epoch))
+            except FileNotFoundError:
+                # The publisher swapped epochs and removed this block in between
+                continue
+            return cls(name, control, block)
+        control.close()
+        raise FileNotFoundError(f"No readable epoch for state snapshot {name!r}")
+
+    @property
+    def current_epoch(self) -> int:
+        """Epoch currently published (may be newer than this view)"""
+        return int(np.ndarray((1,), dtype='<i8', buffer=self._control.buf)[0])
+
+    @property
+    def is_current(self) -> bool:
+        return self.current_epoch == self.epoch
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row(self, index: int) -> Dict:
+        """user_state-like dict for one user"""
+        row = {field: float(self.columns[field][index]) for field in STATE_FIELDS}
+        row['user_id'] = self.user_ids[index].decode()
+        row['risk_level'] = risk_level(self.risk_levels[index])
+        return row
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> SnapshotSlice:
+        """Zero-copy view of users [start, stop)"""
+        stop = self.count if stop is None else min(stop, self.count)
+        return SnapshotSlice(self, start, stop)
+
+    def close(self):
+        """Detach from shared memory; views into it become invalid"""
+        self.user_ids = self.risk_levels = None
+        self.columns = {}
+        self._block.close()
+        self._control.close()
+
+
+class SnapshotPublisher:
+    """
+    Owns a shared-memory state snapshot and refreshes it by epochs.
+
+    Each refresh writes a complete new block, then publishes its epoch
+    number in a small control block with a single 8-byte store. Readers that
+    attached earlier keep their (still mapped) old block; new readers see
+    the new epoch. The old block is unlinked right after the swap.
+    """
+
+    def __init__(self, name: str = 'turkcell_state', database: Database = db):
+        self.name = name
+        self.db = database
+        self.epoch = 0
+        self.count = 0
+        self._lock = threading.Lock()
+        self._block: Optional[shared_memory.SharedMemory] = None
+        self._control = shared_memory.SharedMemory(name=_control_name(name), create=True, size=8)
+        np.ndarray((1,), dtype='<i8', buffer=self._control.buf)[0] = 0
+
+    def refresh(self) -> int:
+        """Load user_state from the database into a new epoch; returns the epoch"""
+        return self.publish(*load_state(self.db))
+
+    def publish(self, user_ids: Sequence, columns: Dict[str, Sequence[float]],
+                risk_levels: Sequence[int]) -> int:
+        """Write the given columns as a new epoch and swap it in"""
+        with self._lock:
+            count = len(user_ids)
+            epoch = self.epoch + 1
+            offsets, size = _layout(count)
+
+            block = shared_memory.SharedMemory(name=_block_name(self.name, epoch), create=True, size=size)
+            header = np.ndarray((1,), dtype=_HEADER, buffer=block.buf)
+            header[0] = (_MAGIC, epoch, count)
+
+            def column(name):
+                offset, dtype = offsets[name]
+                return np.ndarray((count,), dtype=dtype, buffer=block.buf, offset=offset)
+
+            column('user_id')[:] = np.asarray(user_ids, dtype=USER_ID_DTYPE)
+            for field in STATE_FIELDS:
+                column(field)[:] = np.asarray(columns[field], dtype=np.float64)
+            column('risk_level')[:] = np.asarray(risk_levels, dtype=np.int8)
+
+            # Swap: readers attaching from now on open the new block
+            np.ndarray((1,), dtype='<i8', buffer=self._control.buf)[0] = epoch
+
+            previous, self._block = self._block, block
+            self.epoch, self.count = epoch, count
+            if previous is not None:
+                _unlink(previous)
+
+        logger.info(f"State snapshot {self.name} epoch {epoch}: {count} users ({size / 1e6:.1f} MB)")
+        return epoch
+
+    def close(self):
+        """Unlink the snapshot; attached readers keep their mapping until they close"""
+        with self._lock:
+            if self._block is not None:
+                _unlink(self._block)
+                self._block = None
+            if self._control is not None:
+                _unlink(self._control)
+                self._control = None
+
+    def __enter__(self) -> 'SnapshotPublisher':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,200 @@
+"""
+Turkcell Decision Engine - Sharded Sweep
+Full-population rule evaluation split across worker processes
+
+Usage:
+    python -m src.sweep [--workers 4] [--shards 16] [--dry-run] [--shared-state]
+"""
+
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import db_config, engine_config
+from .database import db, UserStateRepository
+from .rule_engine import rule_engine
+from .state_snapshot import SnapshotPublisher, StateSnapshot, partitions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepStats:
+    """Counters for one shard, or merged over all shards of a sweep"""
+    users: int = 0
+    decisions: int = 0
+    shards: int = 0
+    workers: int = 0
+    seconds: float = 0.0            # wall time (worker time for a single shard)
+    actions: Counter = field(default_factory=Counter)
+    rule_versions: set = field(default_factory=set)
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.seconds if self.seconds else 0.0
+
+    def merge(self, other: 'SweepStats'):
+        """Add another shard's counters to this one"""
+        self.users += other.users
+        self.decisions += other.decisions
+        self.shards += other.shards
+        self.actions.update(other.actions)
+        self.rule_versions |= other.rule_versions
+
+
+# ============================================================
+# Worker side
+# ============================================================
+
+def init_worker():
+    """
+    ProcessPoolExecutor initializer for engine worker processes.
+    Workers run one transaction at a time; their pools are kept small so
+    that many workers do not exhaust the server's connection limit.
+    """
+    db_config.pool_min_size = 1
+    db_config.pool_max_size = 2
+    if not db.connect():
+        raise RuntimeError("Database connection failed in sweep worker")
+
+
+def sweep_shard(shard: int, shard_count: int, persist: bool = True) -> SweepStats:
+    """
+    Evaluate every user of one hash shard with vectorized batches and write
+    the decisions with bulk inserts. Runs in the worker's own process, with
+    its own connection pool and compiled rule set.
+    """
+    started = time.monotonic()
+    rule_set = rule_engine.rule_cache.get()
+    batches = UserStateRepository(db).stream_shard_states(shard, shard_count, engine_config.batch_size)
+
+    stats = SweepStats(shards=1, rule_versions={rule_set.version})
+    for rows in batches:
+        results = rule_engine.evaluate_states(rule_set, rows)
+        if persist:
+            results = rule_engine.persist_batch(results)
+        stats.users += len(rows)
+        stats.decisions += len(results)
+        stats.actions.update(r['action']['action_type'] for r in results)
+    rule_engine.shadow.flush()
+
+    stats.seconds = time.monotonic() - started
+    return stats
+
+
+def sweep_snapshot_slice(name: str, start: int, stop: int, persist: bool = True) -> SweepStats:
+    """
+    Evaluate users [start, stop) of a shared state snapshot. The worker
+    attaches to the parent's shared memory instead of fetching user_state.
+    """
+    started = time.monotonic()
+    rule_set = rule_engine.rule_cache.get()
+    snapshot = StateSnapshot.attach(name)
+
+    stats = SweepStats(shards=1, rule_versions={rule_set.version})
+    try:
+        batch_size = engine_config.batch_size
+        for batch_start in range(start, stop, batch_size):
+            rows = snapshot.slice(batch_start, min(batch_start + batch_size, stop))
+            results = rule_engine.evaluate_states(rule_set, rows, rows.columns)
+            if persist:
+                results = rule_engine.persist_batch(results)
+            stats.decisions += len(results)
+            stats.actions.update(r['action']['action_type'] for r in results)
+    finally:
+        snapshot.close()
+    rule_engine.shadow.flush()
+
+    stats.users = stop - start
+    stats.seconds = time.monotonic() - started
+    return stats
+
+
+# ============================================================
+# Parent side
+# ============================================================
+
+def run_sweep(workers: Optional[int] = None, shards: Optional[int] = None,
+              persist: bool = True, shared_state: bool = False) -> SweepStats:
+    """
+    Sweep the whole user population with a pool of worker processes.
+    user_ids are split into hash shards (by default one per worker; more
+    shards even out skew) and the per-shard stats are merged here.
+
+    With shared_state, user_state is loaded once into a shared-memory
+    snapshot and workers evaluate contiguous slices of it in place.
+    """
+    workers = workers or engine_config.sweep_workers or os.cpu_count() or 1
+    shards = shards or workers
+
+    # Spawned workers start with fresh modules, so no pooled connection
+    # of this process is ever shared with a child
+    context = multiprocessing.get_context('spawn')
+    total = SweepStats(workers=workers)
+    started = time.monotonic()
+
+    publisher = None
+    try:
+        if shared_state:
+            publisher = SnapshotPublisher(f"turkcell_sweep_{os.getpid()}")
+            publisher.refresh()
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker) as executor:
+            if publisher:
+                futures = [
+                    executor.submit(sweep_snapshot_slice, publisher.name, start, stop, persist)
+                    for start, stop in partitions(publisher.count, shards)
+                ]
+            else:
+                futures = [executor.submit(sweep_shard, shard, shards, persist) for shard in range(shards)]
+            for future in as_completed(futures):
+                total.merge(future.result())
+    finally:
+        if publisher:
+            publisher.close()
+
+    total.seconds = time.monotonic() - started
+
+    if len(total.rule_versions) > 1:
+        logger.warning(
+            f"Rules changed during the sweep; shards used {len(total.rule_versions)} rule versions"
+        )
+    logger.info(
+        f"Sweep finished: {total.users} users, {total.decisions} decisions in "
+        f"{total.seconds:.2f}s with {workers} workers ({total.users_per_second:.0f} users/s)"
+    )
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate all users with a pool of worker processes")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: ENGINE_SWEEP_WORKERS or CPU count)")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="hash shards (default: one per worker)")
+    parser.add_argument('--dry-run', action='store_true', help="evaluate without writing decisions")
+    parser.add_argument('--shared-state', action='store_true',
+                        help="load user_state once into shared memory for all workers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stats = run_sweep(args.workers, args.shards, persist=not args.dry_run,
+                      shared_state=args.shared_state)
+
+    print(
+        f"users={stats.users} decisions={stats.decisions} shards={stats.shards} "
+        f"workers={stats.workers} seconds={stats.seconds:.2f} rate={stats.users_per_second:.0f}/s"
+    )
+    for action, count in stats.actions.most_common():
+        print(f"  {action}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -327,7 +327,7 @@ class DashboardPanel(QWidget):
             if heights:
                 self.risk_chart.setYRange(0, max(heights) * 1.1)
             
-            labels = [(i, item['risk_level']) for i, item in enumerate(risk_data)]
+            labels = [(i, item['risk_level'] or '-') for i, item in enumerate(risk_data)]
             ax = self.risk_chart.getAxis('bottom')
             ax.setTicks([labels])
             
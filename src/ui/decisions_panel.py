@@ -14,9 +14,11 @@ import json
 
 from .widgets import DataTable, SectionHeader
 from .styles import TURKCELL_BLUE, ACTION_COLORS
-from ..database import db, DecisionRepository, UserRepository
+from ..database import db, DecisionRepository, DecisionFilter, UserRepository
 from ..rule_engine import rule_engine
 
+PAGE_SIZE = 100
+
 
 class DecisionDetailDialog(QDialog):
     """Dialog showing decision details"""
@@ -96,6 +98,8 @@ class DecisionsPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.decision_repo = DecisionRepository(db)
+        self.current_decisions = []
+        self.next_token = None
         self.setup_ui()
         self.load_data()
     
@@ -135,22 +139,32 @@ class DecisionsPanel(QWidget):
         self.decisions_table.doubleClicked.connect(self.show_decision_detail)
         layout.addWidget(self.decisions_table)
         
+        # Next page (keyset pagination)
+        self.more_btn = QPushButton("Daha Fazla Yükle")
+        self.more_btn.clicked.connect(self.load_more)
+        layout.addWidget(self.more_btn, alignment=Qt.AlignmentFlag.AlignRight)
+        
         # Info text
         info = QLabel("💡 Detayları görmek için bir satıra çift tıklayın. 'Tüm Kullanıcıları İşle' butonuyla kural motorunu çalıştırabilirsiniz.")
         info.setStyleSheet("color: #8B8B8B; font-size: 12px;")
         layout.addWidget(info)
     
     def load_data(self):
-        """Load decisions from database"""
+        """Load the first page of decisions"""
+        self.current_decisions = []
+        self.next_token = None
+        self.load_more()
+    
+    def load_more(self):
+        """Load the next page of decisions and append it to the table"""
         try:
-            user_id = self.user_filter.currentData()
-            
-            if user_id:
-                decisions = self.decision_repo.get_by_user(user_id)
-            else:
-                decisions = self.decision_repo.get_all(100)
+            filters = DecisionFilter(user_id=self.user_filter.currentData())
+            page = self.decision_repo.get_page(filters, PAGE_SIZE, self.next_token)
+            self.next_token = page.next_token
+            self.more_btn.setEnabled(page.has_more)
             
-            self.current_decisions = decisions  # Store for detail view
+            self.current_decisions.extend(page.rows)  # Store for detail view
+            decisions = self.current_decisions
             
             self.decisions_table.setRowCount(len(decisions))
             
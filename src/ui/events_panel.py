@@ -12,11 +12,13 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QDateTime
 from datetime import datetime
 
-from .widgets import DataTable, SectionHeader
+from .widgets import DataTable, SectionHeader, PeriodComboBox
 from .styles import TURKCELL_BLUE
-from ..database import db, EventRepository, UserRepository
+from ..database import db, EventRepository, EventFilter, UserRepository
 from ..rule_engine import rule_engine
 
+PAGE_SIZE = 100
+
 
 class AddEventDialog(QDialog):
     """Dialog for adding a new event"""
@@ -163,6 +165,9 @@ class EventsPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.event_repo = EventRepository(db)
+        self.events = []
+        self.filters = EventFilter()
+        self.next_token = None
         self.setup_ui()
         self.load_data()
     
@@ -200,10 +205,15 @@ class EventsPanel(QWidget):
         
         filter_layout.addWidget(QLabel("Servis:"))
         self.service_filter = QComboBox()
-        self.service_filter.addItems(['Tümü', 'Superonline', 'Paycell', 'TV+', 'Fizy', 'Game+'])
+        self.service_filter.addItems(['Tümü', 'Superonline', 'Paycell', 'TV+', 'Fizy', 'Game+', 'BiP'])
         self.service_filter.currentIndexChanged.connect(self.load_data)
         filter_layout.addWidget(self.service_filter)
         
+        filter_layout.addWidget(QLabel("Dönem:"))
+        self.period_filter = PeriodComboBox()
+        self.period_filter.currentIndexChanged.connect(self.load_data)
+        filter_layout.addWidget(self.period_filter)
+        
         filter_layout.addStretch()
         layout.addLayout(filter_layout)
         
@@ -212,24 +222,34 @@ class EventsPanel(QWidget):
             "Event ID", "Kullanıcı", "Servis", "Tür", "Değer", "Birim", "Zaman"
         ])
         layout.addWidget(self.events_table)
+        
+        # Next page (keyset pagination)
+        self.more_btn = QPushButton("Daha Fazla Yükle")
+        self.more_btn.clicked.connect(self.load_more)
+        layout.addWidget(self.more_btn, alignment=Qt.AlignmentFlag.AlignRight)
     
     def load_data(self):
-        """Load events from database"""
+        """Load the first page of events matching the filters"""
+        service = self.service_filter.currentText()
+        self.filters = EventFilter(
+            user_id=self.user_filter.currentData(),
+            service=service if service != 'Tümü' else None,
+            since=self.period_filter.since()
+        )
+        self.events = []
+        self.next_token = None
+        self.load_more()
+    
+    def load_more(self):
+        """Load the next page of events and append it to the table"""
         try:
-            user_id = self.user_filter.currentData()
-            
-            if user_id:
-                events = self.event_repo.get_by_user(user_id)
-            else:
-                events = self.event_repo.get_all(100)
-            
-            # Filter by service if selected
-            service = self.service_filter.currentText()
-            if service != 'Tümü':
-                events = [e for e in events if e.get('service') == service]
+            page = self.event_repo.get_page(self.filters, PAGE_SIZE, self.next_token)
+            self.next_token = page.next_token
+            self.more_btn.setEnabled(page.has_more)
+            self.events.extend(page.rows)
             
             table_data = []
-            for event in events:
+            for event in self.events:
                 table_data.append({
                     'event id': event.get('event_id', ''),
                     'kullanıcı': event.get('user_id', ''),
@@ -253,10 +273,11 @@ class EventsPanel(QWidget):
                 self.load_data()
                 
                 # Automatically run rule engine for this user
-                # Evaluate ALL rules based on cumulative user_state totals
-                # This catches thresholds exceeded by many small events (e.g., 2GB x 40 = 80GB)
+                # Rules reading the field changed by this event's unit are evaluated
+                # against cumulative user_state totals, so thresholds exceeded by
+                # many small events (e.g., 2GB x 40 = 80GB) are still caught
                 user_id = event_data['user_id']
-                result = rule_engine.process_user(user_id)  # No event_type filter - check all rules
+                result = rule_engine.process_event(event_data)
                 
                 if result:
                     # Build detailed message
@@ -21,6 +21,7 @@ from .decisions_panel import DecisionsPanel
 from .notifications_panel import NotificationsPanel
 from ..config import app_config
 from ..database import db
+from ..metrics import metrics
 
 
 class MainWindow(QMainWindow):
@@ -147,6 +148,7 @@ def run_app():
     """Run the application"""
     import sys
     app = QApplication(sys.argv)
+    metrics.start()
     
     # Set application font
     font = QFont("Segoe UI", 10)
@@ -11,9 +11,11 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor
 
-from .widgets import DataTable, SectionHeader
+from .widgets import DataTable, SectionHeader, PeriodComboBox
 from .styles import TURKCELL_BLUE, ACTION_COLORS, TEXT_SECONDARY
-from ..database import db, ActionRepository, UserRepository
+from ..database import db, ActionRepository, ActionFilter, UserRepository
+
+PAGE_SIZE = 100
 
 
 class NotificationDetailDialog(QDialog):
@@ -62,6 +64,9 @@ class NotificationsPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.action_repo = ActionRepository(db)
+        self.current_actions = []
+        self.filters = ActionFilter()
+        self.next_token = None
         self.setup_ui()
         self.load_data()
     
@@ -110,6 +115,11 @@ class NotificationsPanel(QWidget):
         self.type_filter.currentIndexChanged.connect(self.load_data)
         filter_layout.addWidget(self.type_filter)
         
+        filter_layout.addWidget(QLabel("Dönem:"))
+        self.period_filter = PeriodComboBox()
+        self.period_filter.currentIndexChanged.connect(self.load_data)
+        filter_layout.addWidget(self.period_filter)
+        
         filter_layout.addStretch()
         layout.addLayout(filter_layout)
         
@@ -126,24 +136,34 @@ class NotificationsPanel(QWidget):
         self.stats_label.setStyleSheet(f"color: {TEXT_SECONDARY};")
         stats_layout.addWidget(self.stats_label)
         stats_layout.addStretch()
+        
+        # Next page (keyset pagination)
+        self.more_btn = QPushButton("Daha Fazla Yükle")
+        self.more_btn.clicked.connect(self.load_more)
+        stats_layout.addWidget(self.more_btn)
         layout.addLayout(stats_layout)
     
     def load_data(self):
-        """Load notifications from database"""
+        """Load the first page of notifications matching the filters"""
+        action_type = self.type_filter.currentText()
+        self.filters = ActionFilter(
+            user_id=self.user_filter.currentData(),
+            action_type=action_type if action_type != 'Tümü' else None,
+            since=self.period_filter.since()
+        )
+        self.current_actions = []
+        self.next_token = None
+        self.load_more()
+    
+    def load_more(self):
+        """Load the next page of notifications and append it to the table"""
         try:
-            user_id = self.user_filter.currentData()
-            
-            if user_id:
-                actions = self.action_repo.get_by_user(user_id)
-            else:
-                actions = self.action_repo.get_all(100)
-            
-            # Filter by type if selected
-            action_type = self.type_filter.currentText()
-            if action_type != 'Tümü':
-                actions = [a for a in actions if a.get('action_type') == action_type]
+            page = self.action_repo.get_page(self.filters, PAGE_SIZE, self.next_token)
+            self.next_token = page.next_token
+            self.more_btn.setEnabled(page.has_more)
             
-            self.current_actions = actions  # Store for detail view
+            self.current_actions.extend(page.rows)  # Store for detail view
+            actions = self.current_actions
             
             self.notifications_table.setRowCount(len(actions))
             
@@ -173,7 +193,8 @@ class NotificationsPanel(QWidget):
                 self.notifications_table.setItem(row_idx, 4, 
                     QTableWidgetItem(str(action.get('created_at', ''))[:19]))
             
-            self.stats_label.setText(f"Toplam: {len(actions)} bildirim")
+            more = " (devamı var)" if page.has_more else ""
+            self.stats_label.setText(f"Toplam: {len(actions)} bildirim{more}")
                 
         except Exception as e:
             print(f"Error loading notifications: {e}")
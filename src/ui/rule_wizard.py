@@ -9,7 +9,7 @@ from PyQt6.QtWidgets import (
     QDoubleSpinBox, QLineEdit, QCheckBox, QWidget,
     QButtonGroup, QRadioButton, QMessageBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont
 
 from .styles import (
@@ -17,6 +17,34 @@ from .styles import (
     BG_WHITE, BG_GRAY, BORDER_GRAY, TEXT_PRIMARY, TEXT_SECONDARY,
     COLOR_SUCCESS, ACTION_COLORS
 )
+from ..rule_engine import rule_engine
+from ..state_snapshot import LoadCancelled
+
+
+class RulePreviewWorker(QThread):
+    """
+    Runs a rule impact preview over the whole population off the UI thread.
+    requestInterruption() stops it at the next user_state batch; a stopped
+    worker emits nothing.
+    """
+    
+    preview_ready = pyqtSignal(int, object)
+    preview_failed = pyqtSignal(int, str)
+    
+    def __init__(self, generation: int, rule: dict, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.rule = rule
+    
+    def run(self):
+        try:
+            preview = rule_engine.preview_rule(self.rule, cancelled=self.isInterruptionRequested)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            self.preview_failed.emit(self.generation, str(e))
+            return
+        self.preview_ready.emit(self.generation, preview)
 
 
 class RuleWizardDialog(QDialog):
@@ -73,6 +101,14 @@ class RuleWizardDialog(QDialog):
         self.is_edit = rule_data is not None
         self.conditions = []  # List of condition dicts
         
+        # Impact preview: restarted on every change, runs once input settles
+        self._preview_generation = 0
+        self._preview_workers = set()
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(400)
+        self._preview_timer.timeout.connect(self.start_impact_preview)
+        
         self.setWindowTitle("Kural Oluşturma Sihirbazı" if not self.is_edit else "Kural Düzenleme")
         self.setMinimumSize(600, 500)
         self.setStyleSheet(f"background-color: {BG_WHITE};")
@@ -445,6 +481,25 @@ class RuleWizardDialog(QDialog):
         """)
         layout.addWidget(self.summary_text)
         
+        # Impact preview against current user states
+        impact_label = QLabel("Etki Önizlemesi:")
+        impact_label.setStyleSheet(f"font-weight: 600; color: {TURKCELL_DARK}; font-size: 14px; margin-top: 10px;")
+        layout.addWidget(impact_label)
+        
+        self.impact_text = QLabel("")
+        self.impact_text.setWordWrap(True)
+        self.impact_text.setStyleSheet(f"""
+            background-color: {BG_GRAY};
+            padding: 20px;
+            border-radius: 8px;
+            font-size: 13px;
+            color: {TEXT_PRIMARY};
+        """)
+        layout.addWidget(self.impact_text)
+        
+        self.priority_spin.valueChanged.connect(self.update_summary)
+        self.rule_id_input.textChanged.connect(self.schedule_impact_preview)
+        
         layout.addStretch()
         
         return widget
@@ -501,6 +556,77 @@ class RuleWizardDialog(QDialog):
         """
         
         self.summary_text.setText(summary)
+        self.schedule_impact_preview()
+    
+    def schedule_impact_preview(self):
+        """Debounce: (re)start the preview timer while the summary step is shown"""
+        if self.stack.currentIndex() != 3:
+            return
+        self.impact_text.setText(f"<span style='color:{TEXT_SECONDARY};'>Etki hesaplanıyor...</span>")
+        self._preview_timer.start()
+    
+    def start_impact_preview(self):
+        """Evaluate the rule being built over all current user states in the background"""
+        self._preview_generation += 1
+        # Older previews would be discarded anyway
+        for worker in self._preview_workers:
+            worker.requestInterruption()
+        
+        rule = self.get_rule_data()
+        rule['rule_id'] = rule['rule_id'] or '__preview__'
+        
+        worker = RulePreviewWorker(self._preview_generation, rule, self)
+        worker.preview_ready.connect(self.on_impact_ready)
+        worker.preview_failed.connect(self.on_impact_failed)
+        worker.finished.connect(lambda: self._preview_workers.discard(worker))
+        self._preview_workers.add(worker)
+        worker.start()
+    
+    def on_impact_ready(self, generation: int, preview):
+        """Show a preview result unless a newer one has been requested"""
+        if generation != self._preview_generation:
+            return
+        
+        rule_id = next(iter(preview.samples), None)
+        triggers = preview.rule_triggers.get(rule_id, 0)
+        
+        lines = [f"<b>Tetiklenen kullanıcı:</b> {triggers:,} / {preview.users:,}"]
+        lines.append(f"<b>Aksiyonu değişen kullanıcı:</b> {preview.changed_users:,}")
+        
+        if preview.action_deltas:
+            lines.append("<br><b>Aksiyon değişimleri:</b>")
+            for action, delta in preview.action_deltas.items():
+                color = COLOR_SUCCESS if delta > 0 else TEXT_SECONDARY
+                lines.append(f"{self.ACTIONS.get(action, action)}: <span style='color:{color};'>{delta:+,}</span>")
+        
+        if preview.suppressed:
+            lines.append("<br><b>Bastırılacak mevcut aksiyonlar:</b>")
+            for action, count in sorted(preview.suppressed.items(), key=lambda item: -item[1]):
+                lines.append(f"{self.ACTIONS.get(action, action)}: {count:,} kullanıcı")
+        
+        samples = preview.samples.get(rule_id) or []
+        if samples:
+            lines.append(f"<br><b>Örnek kullanıcılar:</b> {', '.join(samples)}")
+        
+        lines.append(f"<br><small style='color:{TEXT_SECONDARY};'>{preview.seconds * 1000:.0f} ms</small>")
+        self.impact_text.setText("<br>".join(lines))
+    
+    def on_impact_failed(self, generation: int, message: str):
+        if generation != self._preview_generation:
+            return
+        self.impact_text.setText(f"<span style='color:{TEXT_SECONDARY};'>Önizleme hesaplanamadı: {message}</span>")
+    
+    def done(self, result):
+        """Cancel pending previews and close without waiting for them"""
+        self._preview_timer.stop()
+        # Running workers stop at their next batch; the dialog stays their
+        # parent, so they are not destroyed while still running
+        for worker in self._preview_workers:
+            worker.requestInterruption()
+            worker.preview_ready.disconnect()
+            worker.preview_failed.disconnect()
+        self._preview_workers.clear()
+        super().done(result)
     
     def build_condition(self) -> str:
         """Build condition string from wizard inputs"""
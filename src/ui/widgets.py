@@ -6,9 +6,11 @@ Yeniden kullanılabilir UI bileşenleri
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
     QTableWidget, QTableWidgetItem, QHeaderView,
-    QFrame, QSizePolicy
+    QFrame, QSizePolicy, QComboBox
 )
 from PyQt6.QtCore import Qt
+from datetime import datetime, timedelta
+from typing import Optional
 from PyQt6.QtGui import QColor, QFont
 
 from .styles import (
@@ -102,6 +104,24 @@ class DataTable(QTableWidget):
                 self.setItem(row_idx, col_idx, item)
 
 
+class PeriodComboBox(QComboBox):
+    """Dönem seçimi; since() seçilen dönemin başlangıcını verir (Tümü için None)"""
+    
+    # Etiket -> bugünün gece yarısından geriye gün sayısı
+    PERIODS = [('Tümü', None), ('Bugün', 0), ('Son 7 gün', 6), ('Son 30 gün', 29)]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        for label, days in self.PERIODS:
+            self.addItem(label, days)
+    
+    def since(self) -> Optional[datetime]:
+        days = self.currentData()
+        if days is None:
+            return None
+        return datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(days=days)
+
+
 class RiskBadge(QLabel):
     """Risk seviyesi badge'i"""
     
@@ -0,0 +1,516 @@
+"""
+Turkcell Decision Engine - Synthetic Workload Generator
+Deterministic users, events, user_state and rule sets at any scale
+
+Usage:
+    python -m src.workload --users 1000000 --days 7 --copy [--replace]
+    python -m src.workload --users 100000 --out events.jsonl --users-out users.csv
+    python -m src.workload --users 100000 --rules 500 --rule-shape mixed --rules-out rules.json
+
+Every (day, hour, block of users) draws from its own random stream derived
+from the seed, so output is identical for the same arguments regardless of
+how much of it is consumed, and memory use depends only on the block size.
+"""
+
+import csv
+import json
+import time
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .condition_compiler import STATE_FIELDS
+from .database import db, Database
+from .ingestion import COPY_EVENTS_SQL
+from .partitions import PartitionManager
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# Model
+# ============================================================
+
+# Event kinds with their unit and the services that emit them (share within the kind)
+EVENT_KINDS: Tuple[Tuple[str, str, Tuple[Tuple[str, float], ...]], ...] = (
+    ('USAGE', 'GB', (('Superonline', 0.85), ('BiP', 0.15))),
+    ('PAYMENT', 'TRY', (('Paycell', 1.0),)),
+    ('CONTENT_CONSUMPTION', 'MIN', (('TV+', 0.45), ('Fizy', 0.35), ('Game+', 0.20))),
+)
+KIND_SHARES = np.array([0.45, 0.15, 0.40])
+KIND_FIELDS = ('internet_today_gb', 'spend_today_try', 'content_minutes_today')
+
+# Per-event value: lognormal median and sigma per service (GB, TRY or minutes)
+SERVICE_VALUES = {
+    'Superonline': (1.2, 0.9),
+    'BiP': (0.05, 0.8),
+    'Paycell': (45.0, 1.0),
+    'TV+': (25.0, 0.7),
+    'Fizy': (15.0, 0.8),
+    'Game+': (20.0, 0.9),
+}
+
+# Relative activity per hour of day: quiet nights, daytime plateau, evening peak
+HOURLY_WEIGHTS = np.array([
+    0.30, 0.15, 0.10, 0.08, 0.08, 0.15, 0.50, 1.00, 1.30, 1.20, 1.10, 1.20,
+    1.40, 1.30, 1.20, 1.20, 1.30, 1.50, 1.80, 2.10, 2.40, 2.30, 1.70, 0.90
+])
+HOURLY_WEIGHTS = HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum()
+
+# Weekend multiplier per kind (more streaming and shopping, slightly more data)
+WEEKEND_FACTORS = np.array([1.10, 1.25, 1.35])
+
+CITIES = (
+    ('Istanbul', 0.30), ('Ankara', 0.12), ('Izmir', 0.09), ('Bursa', 0.06), ('Antalya', 0.05),
+    ('Adana', 0.04), ('Konya', 0.04), ('Gaziantep', 0.04), ('Kocaeli', 0.04), ('Diyarbakir', 0.04),
+    ('Mersin', 0.03), ('Kayseri', 0.03), ('Eskisehir', 0.03), ('Samsun', 0.03), ('Trabzon', 0.02),
+    ('Erzurum', 0.02), ('Denizli', 0.02),
+)
+NAMES = (
+    'Ayşe', 'Ali', 'Deniz', 'Mert', 'Ece', 'Zeynep', 'Mehmet', 'Elif', 'Can', 'Selin',
+    'Emre', 'Burak', 'Merve', 'Kerem', 'Cem', 'Derya', 'Oğuz', 'Ebru', 'Hakan', 'Gizem'
+)
+
+RULE_SHAPES = ('threshold', 'band', 'compound', 'mixed')
+
+# events.event_id is VARCHAR(20)
+EVENT_ID_LENGTH = 20
+
+# Generated rules fire on roughly this share of users (log-uniform)
+RULE_FIRE_RATES = (0.002, 0.3)
+
+_SERVICES = tuple(service for _, _, services in EVENT_KINDS for service, _ in services)
+_SERVICE_LOG_MEDIAN = np.log([SERVICE_VALUES[s][0] for s in _SERVICES])
+_SERVICE_SIGMA = np.array([SERVICE_VALUES[s][1] for s in _SERVICES])
+
+# Streams are keyed by (seed, purpose, ...) so each purpose is independent
+_PROFILE, _EVENTS, _USERS, _RULES = range(4)
+
+
+class WorkloadGenerator:
+    """
+    Synthetic Turkcell workload.
+
+    Users are processed in blocks of block_size. Each user has a stable
+    profile (overall activity, preference between data / payments /
+    content, and per-kind intensity); hourly event counts are Poisson draws
+    shaped by the daily curve and a weekend factor, and per-event values
+    are lognormal per service.
+    """
+
+    def __init__(self, users: int, days: int = 1, start: Optional[date] = None,
+                 events_per_day: float = 12.0, seed: int = 42,
+                 user_prefix: str = 'W', block_size: int = 10000):
+        self.users = users
+        self.days = days
+        self.start = start or date.today() - timedelta(days=days - 1)
+        self.events_per_day = events_per_day
+        self.seed = seed
+        self.user_prefix = user_prefix
+        self.block_size = block_size
+
+        if block_size < 1:
+            raise ValueError("block size must be at least 1")
+        if len(self.user_id(users - 1)) > 10:
+            raise ValueError("user_id would exceed VARCHAR(10); use a shorter prefix")
+
+        # event_id = prefix + yymmddhh + block + index within the block's hour
+        self._block_width = len(str(max(self.blocks - 1, 0)))
+        self._index_width = EVENT_ID_LENGTH - len(user_prefix) - 8 - self._block_width
+        if self._index_width < 1 or 10 ** self._index_width <= 2 * self.peak_hourly_events:
+            raise ValueError(
+                f"event_id would exceed VARCHAR({EVENT_ID_LENGTH}): up to "
+                f"{self.peak_hourly_events:.0f} events per hour per block of {block_size} users "
+                f"need more than {max(self._index_width, 0)} index digits; "
+                f"use a smaller block size or a shorter prefix"
+            )
+
+    @property
+    def blocks(self) -> int:
+        return -(-self.users // self.block_size)
+
+    @property
+    def peak_hourly_events(self) -> float:
+        """Expected events of one block in the busiest weekend hour"""
+        mean_activity = np.exp(0.6 ** 2 / 2)        # mean of lognormal(0, 0.6)
+        return (self.block_size * self.events_per_day * mean_activity
+                * HOURLY_WEIGHTS.max() * WEEKEND_FACTORS.max())
+
+    @property
+    def end(self) -> date:
+        """Day after the last generated day"""
+        return self.start + timedelta(days=self.days)
+
+    def user_id(self, index: int) -> str:
+        return f"{self.user_prefix}{index + 1:0{9 - len(self.user_prefix)}d}"
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, *key])
+
+    def _block_range(self, block: int) -> Tuple[int, int]:
+        start = block * self.block_size
+        return start, min(start + self.block_size, self.users)
+
+    def _profile(self, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Per user of a block: event rate per kind (events/day) and value intensity per kind"""
+        start, stop = self._block_range(block)
+        rng = self._rng(_PROFILE, block)
+        count = stop - start
+        activity = rng.lognormal(0.0, 0.6, count)
+        preference = KIND_SHARES * rng.lognormal(0.0, 0.5, (count, len(EVENT_KINDS)))
+        preference /= preference.sum(axis=1, keepdims=True)
+        rates = self.events_per_day * activity[:, None] * preference
+        intensity = rng.lognormal(0.0, 0.4, (count, len(EVENT_KINDS)))
+        return rates, intensity
+
+    # --------------------------------------------------------
+    # Users
+    # --------------------------------------------------------
+
+    def iter_users(self) -> Iterator[Tuple[str, str, str]]:
+        """(user_id, name, city) for every user"""
+        cities = [city for city, _ in CITIES]
+        weights = np.array([weight for _, weight in CITIES])
+        weights /= weights.sum()
+        for block in range(self.blocks):
+            start, stop = self._block_range(block)
+            rng = self._rng(_USERS, block)
+            names = rng.integers(0, len(NAMES), stop - start)
+            city_codes = rng.choice(len(cities), stop - start, p=weights)
+            for offset, (name, city) in enumerate(zip(names, city_codes)):
+                yield self.user_id(start + offset), NAMES[name], cities[city]
+
+    # --------------------------------------------------------
+    # Events
+    # --------------------------------------------------------
+
+    def _hour_events(self, day: int, hour: int, block: int,
+                     profile: Tuple[np.ndarray, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Events of one block of users in one hour, ordered by time"""
+        rates, intensity = profile
+        rng = self._rng(_EVENTS, day, hour, block)
+        weekend = (self.start + timedelta(days=day)).weekday() >= 5
+        hourly = rates * HOURLY_WEIGHTS[hour] * (WEEKEND_FACTORS if weekend else 1.0)
+
+        counts = rng.poisson(hourly)
+        users, kinds = np.nonzero(counts)
+        repeats = counts[users, kinds]
+        users = np.repeat(users, repeats)
+        kinds = np.repeat(kinds, repeats)
+
+        services = np.empty(len(kinds), dtype=np.int64)
+        service_offset = 0
+        for kind, (_, _, kind_services) in enumerate(EVENT_KINDS):
+            selected = kinds == kind
+            shares = np.array([share for _, share in kind_services])
+            services[selected] = service_offset + rng.choice(len(kind_services), selected.sum(), p=shares)
+            service_offset += len(kind_services)
+
+        values = rng.lognormal(_SERVICE_LOG_MEDIAN[services], _SERVICE_SIGMA[services])
+        values = np.maximum(np.round(values * intensity[users, kinds], 2), 0.01)
+        seconds = rng.integers(0, 3600, len(users))
+
+        order = np.argsort(seconds, kind='stable')
+        return {
+            'user': users[order],
+            'kind': kinds[order],
+            'service': services[order],
+            'value': values[order],
+            'second': seconds[order]
+        }
+
+    def iter_events(self, days: Optional[Sequence[int]] = None) -> Iterator[Tuple]:
+        """
+        (event_id, user_id, service, event_type, value, unit, timestamp) rows
+        for the given day offsets (default: all), hour by hour. Within an
+        hour events are time-ordered per block of users.
+        """
+        kinds = [(event_type, unit) for event_type, unit, _ in EVENT_KINDS]
+        for day in (range(self.days) if days is None else days):
+            midnight = datetime.combine(self.start + timedelta(days=day), datetime.min.time())
+            for hour in range(24):
+                hour_start = midnight + timedelta(hours=hour)
+                for block in range(self.blocks):
+                    first_user = block * self.block_size
+                    events = self._hour_events(day, hour, block, self._profile(block))
+                    if len(events['user']) > 10 ** self._index_width:
+                        raise ValueError(f"Block {block} has {len(events['user'])} events in hour {hour}; "
+                                         f"use a smaller block size")
+                    # prefix + yymmdd + hour + block + index: unique per user prefix and date
+                    id_prefix = f"{self.user_prefix}{midnight:%y%m%d}{hour:02d}{block:0{self._block_width}d}"
+                    for index, (user, kind, service, value, second) in enumerate(zip(
+                            events['user'].tolist(), events['kind'].tolist(), events['service'].tolist(),
+                            events['value'].tolist(), events['second'].tolist())):
+                        event_type, unit = kinds[kind]
+                        yield (
+                            f"{id_prefix}{index:0{self._index_width}d}", self.user_id(first_user + user),
+                            _SERVICES[service], event_type, value, unit,
+                            (hour_start + timedelta(seconds=second)).isoformat()
+                        )
+
+    def daily_totals(self, day: int = 0, max_users: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Per-user state field totals for one day (first max_users users)"""
+        blocks = self.blocks if max_users is None else min(self.blocks, -(-max_users // self.block_size))
+        totals = []
+        for block in range(blocks):
+            start, stop = self._block_range(block)
+            profile = self._profile(block)
+            block_totals = np.zeros((stop - start, len(EVENT_KINDS)))
+            for hour in range(24):
+                events = self._hour_events(day, hour, block, profile)
+                np.add.at(block_totals, (events['user'], events['kind']), events['value'])
+            totals.append(block_totals)
+        totals = np.concatenate(totals) if totals else np.zeros((0, len(EVENT_KINDS)))
+        return {field: totals[:, kind] for kind, field in enumerate(KIND_FIELDS)}
+
+    # --------------------------------------------------------
+    # Rules
+    # --------------------------------------------------------
+
+    def generate_rules(self, count: int, shape: str = 'mixed', sample_users: int = 20000,
+                       rule_prefix: str = 'G-') -> List[Dict]:
+        """
+        Rule set of the given shape with thresholds taken from quantiles of
+        simulated daily totals, so each rule fires on a realistic share of users.
+        shape: threshold (x > t), band (x BETWEEN a AND b), compound
+        (AND / OR over two or three fields) or mixed.
+        """
+        if shape not in RULE_SHAPES:
+            raise ValueError(f"Unknown rule shape {shape!r}; expected one of {RULE_SHAPES}")
+        totals = self.daily_totals(0, sample_users)
+        rng = self._rng(_RULES, count, RULE_SHAPES.index(shape))
+        low_rate, high_rate = np.log(RULE_FIRE_RATES)
+
+        def threshold(field: str, rate: float) -> float:
+            return round(float(np.quantile(totals[field], 1.0 - rate)), 2)
+
+        def fire_rate() -> float:
+            return float(np.exp(rng.uniform(low_rate, high_rate)))
+
+        rules = []
+        for index in range(count):
+            rule_shape = shape if shape != 'mixed' else RULE_SHAPES[rng.choice(3, p=[0.5, 0.3, 0.2])]
+            field = STATE_FIELDS[rng.integers(len(STATE_FIELDS))]
+            kind = KIND_FIELDS.index(field)
+
+            if rule_shape == 'threshold':
+                condition = f"{field} > {threshold(field, fire_rate())}"
+                action = ('DATA_USAGE_WARNING', 'SPEND_ALERT', 'CONTENT_COOLDOWN_SUGGESTION')[kind]
+            elif rule_shape == 'band':
+                upper_rate = fire_rate()
+                low, high = threshold(field, min(upper_rate * 3, 0.9)), threshold(field, upper_rate)
+                condition = f"{field} BETWEEN {low} AND {high}"
+                action = ('DATA_USAGE_NUDGE', 'SPEND_NUDGE', 'CONTENT_COOLDOWN_SUGGESTION')[kind]
+            else:
+                fields = [STATE_FIELDS[i] for i in rng.permutation(len(STATE_FIELDS))]
+                first, second = (f"{f} > {threshold(f, min(fire_rate() * 4, 0.9))}" for f in fields[:2])
+                if rng.random() < 0.5:
+                    condition = f"{first} AND {second}"
+                else:
+                    condition = f"({first} OR {second}) AND {fields[2]} < {threshold(fields[2], 0.5)}"
+                action = 'CRITICAL_ALERT'
+
+            rules.append({
+                'rule_id': f"{rule_prefix}{index + 1}",
+                'condition': condition,
+                'action': action,
+                'priority': int(rng.integers(1, count + 1)),
+                'is_active': True,
+                'description': f"Üretilmiş kural ({rule_shape})"
+            })
+        return rules
+
+
+# ============================================================
+# Writers
+# ============================================================
+
+EVENT_COLUMNS = ('event_id', 'user_id', 'service', 'event_type', 'value', 'unit', 'timestamp')
+
+
+def write_events(rows: Iterator[Tuple], path: str) -> int:
+    """Write events as .csv (with header) or JSON Lines; returns the row count"""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            writer = csv.writer(f)
+            writer.writerow(EVENT_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(EVENT_COLUMNS, row)), ensure_ascii=False) + '\n')
+                count += 1
+    return count
+
+
+def write_users(rows: Iterator[Tuple[str, str, str]], path: str) -> int:
+    """Write users as CSV with a header row"""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('user_id', 'name', 'city'))
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+class _LineStream:
+    """File-like read() over an iterator of text lines, for COPY FROM STDIN"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._rest = ''
+
+    def read(self, size: int = -1) -> str:
+        chunks, length = [self._rest], len(self._rest)
+        if size < 0 or length < size:
+            for line in self._lines:
+                chunks.append(line)
+                length += len(line)
+                if 0 <= size <= length:
+                    break
+        data = ''.join(chunks)
+        if size < 0:
+            self._rest = ''
+            return data
+        self._rest = data[size:]
+        return data[:size]
+
+
+COPY_USERS_SQL = "COPY users (user_id, name, city) FROM STDIN WITH (FORMAT csv)"
+
+# user_state as of the last generated day, summed from that day's events
+BUILD_STATE_SQL = """
+    INSERT INTO user_state (user_id, internet_today_gb, spend_today_try, content_minutes_today,
+                            risk_level, state_date)
+    SELECT u.user_id, COALESCE(e.gb, 0), COALESCE(e.try, 0), COALESCE(e.mins, 0),
+           calculate_risk_level(COALESCE(e.gb, 0), COALESCE(e.try, 0), COALESCE(e.mins, 0)), %s
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id,
+               SUM(value) FILTER (WHERE unit = 'GB') AS gb,
+               SUM(value) FILTER (WHERE unit = 'TRY') AS try,
+               SUM(value) FILTER (WHERE unit = 'MIN') AS mins
+        FROM events
+        WHERE timestamp >= %s AND timestamp < %s AND user_id LIKE %s
+        GROUP BY user_id
+    ) e ON e.user_id = u.user_id
+    WHERE u.user_id LIKE %s
+    ON CONFLICT (user_id) DO UPDATE SET
+        internet_today_gb = EXCLUDED.internet_today_gb,
+        spend_today_try = EXCLUDED.spend_today_try,
+        content_minutes_today = EXCLUDED.content_minutes_today,
+        risk_level = EXCLUDED.risk_level,
+        state_date = EXCLUDED.state_date,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def load_database(generator: WorkloadGenerator, database: Database = db, replace: bool = False) -> Dict[str, int]:
+    """
+    Stream users and events into Postgres with COPY (one transaction per
+    day of events, user_state trigger bypassed) and build user_state from
+    the last day's events. With replace, users with the generator's prefix
+    are deleted first (their events, state and decisions cascade).
+    """
+    pattern = generator.user_prefix + '%'
+    counts = {'users': 0, 'events': 0}
+
+    with database.transaction():
+        if replace:
+            database.execute("DELETE FROM users WHERE user_id LIKE %s", (pattern,))
+        counts['users'] = database.copy_expert(COPY_USERS_SQL, _LineStream(
+            f"{user_id},{name},{city}\n" for user_id, name, city in generator.iter_users()
+        ))
+    logger.info(f"Loaded {counts['users']} users")
+
+    # Backfilled days get their partitions first instead of landing in events_default
+    PartitionManager(database).ensure('events', generator.start, generator.end - timedelta(days=1))
+
+    for day in range(generator.days):
+        started = time.monotonic()
+        with database.transaction():
+            database.execute("SET LOCAL decision_engine.bulk_ingest = 'on'")
+            loaded = database.copy_expert(COPY_EVENTS_SQL, _LineStream(
+                f"{event_id},{user_id},{service},{event_type},{value},{unit},{timestamp},t\n"
+                for event_id, user_id, service, event_type, value, unit, timestamp
+                in generator.iter_events([day])
+            ))
+        counts['events'] += loaded
+        logger.info(
+            f"Day {generator.start + timedelta(days=day)}: {loaded} events "
+            f"({loaded / (time.monotonic() - started):.0f} events/s)"
+        )
+
+    last_day = generator.end - timedelta(days=1)
+    with database.transaction():
+        database.execute(BUILD_STATE_SQL, (last_day, last_day, generator.end, pattern, pattern))
+    logger.info(f"Built user_state for {last_day}")
+    return counts
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic workload")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--start', type=date.fromisoformat, default=None,
+                        help="first day (default: so that the last day is today)")
+    parser.add_argument('--events-per-day', type=float, default=12.0, help="mean events per user per day")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--prefix', default='W', help="user_id prefix")
+    parser.add_argument('--block-size', type=int, default=10000, help="users generated together (bounds memory)")
+
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--copy', action='store_true', help="load users, events and user_state with COPY")
+    output.add_argument('--out', help="write events to this .jsonl or .csv file")
+    parser.add_argument('--users-out', help="write users to this CSV file")
+    parser.add_argument('--replace', action='store_true', help="with --copy: delete existing users with the prefix")
+
+    parser.add_argument('--rules', type=int, default=0, help="number of rules to generate")
+    parser.add_argument('--rule-shape', choices=RULE_SHAPES, default='mixed')
+    parser.add_argument('--rules-out', help="write generated rules to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        generator = WorkloadGenerator(
+            args.users, args.days, args.start, args.events_per_day, args.seed,
+            user_prefix=args.prefix, block_size=args.block_size
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.users_out:
+        print(f"users={write_users(generator.iter_users(), args.users_out)} -> {args.users_out}")
+    if args.out:
+        started = time.monotonic()
+        count = write_events(generator.iter_events(), args.out)
+        print(f"events={count} -> {args.out} ({count / (time.monotonic() - started):.0f} events/s)")
+    if args.copy:
+        if not db.connect():
+            raise SystemExit("Database connection failed")
+        counts = load_database(generator, db, replace=args.replace)
+        print(f"users={counts['users']} events={counts['events']}")
+
+    if args.rules:
+        rules = generator.generate_rules(args.rules, args.rule_shape)
+        if args.rules_out:
+            with open(args.rules_out, 'w', encoding='utf-8') as f:
+                json.dump(rules, f, ensure_ascii=False, indent=2)
+            print(f"rules={len(rules)} -> {args.rules_out}")
+        else:
+            print(json.dumps(rules, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Shared fixtures. Tests that need PostgreSQL use the `database` fixture and
+are skipped when the database configured by the DB_* settings is not
+reachable; `fake_db` runs the Database unit-of-work code on recording
+fake connections instead.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+
+from src.database import Database, db
+
+
+@pytest.fixture(scope='session')
+def database():
+    if not db.connect():
+        pytest.skip("PostgreSQL is not reachable (see DB_* settings)")
+    yield db
+    db.disconnect()
+
+
+class FakeCursor:
+    """Records statements on its connection; every SELECT returns one row"""
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, query, params=None):
+        if self.connection.closed:
+            raise RuntimeError("connection already closed")
+        self.connection.statements.append(query)
+        if query in self.connection.fail_on:
+            raise RuntimeError(f"statement failed: {query}")
+        if query.startswith(('SELECT', 'EXECUTE')):
+            self.description = [('value',)]
+            self._rows = [{'value': len(self.connection.statements)}]
+        self.rowcount = len(self._rows)
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    """psycopg2 connection stand-in that logs SQL, commits and rollbacks"""
+
+    def __init__(self, number):
+        self.number = number
+        self.statements = []
+        self.fail_on = set()
+        self.closed = 0
+
+    def cursor(self, name=None, cursor_factory=None):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def fake_db():
+    """
+    A Database (not the shared singleton) whose connection() hands out
+    FakeConnections: the idle one if there is one, else a new one.
+    Closed connections are dropped, like the pool discards them.
+    """
+    database = object.__new__(Database)
+    database._init_pool_state()
+    database.connections = []
+    database.idle = []
+
+    @contextmanager
+    def connection():
+        conn = database.idle.pop() if database.idle else FakeConnection(len(database.connections) + 1)
+        if conn not in database.connections:
+            database.connections.append(conn)
+        try:
+            yield conn
+        finally:
+            if conn.closed:
+                database.connections.remove(conn)
+            else:
+                database.idle.append(conn)
+
+    database.connection = connection
+    return database
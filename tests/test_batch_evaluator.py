@@ -0,0 +1,128 @@
+"""
+Parity tests: vectorized batch evaluation vs. the scalar compiled conditions
+"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from src.batch_evaluator import StateColumns, evaluate_batch
+from src.condition_compiler import STATE_FIELDS
+from src.rule_cache import compile_rules
+
+
+CONDITIONS = [
+    'internet_today_gb > 15',
+    'internet_today_gb >= 15',
+    'spend_today_try < 200',
+    'spend_today_try <= 200',
+    'content_minutes_today == 240',
+    'internet_today_gb BETWEEN 10 AND 15',
+    'spend_today_try BETWEEN 200 AND 300',
+    '10 < internet_today_gb < 15',
+    '200 <= spend_today_try < 300',
+    'internet_today_gb > 15 AND spend_today_try > 300',
+    'internet_today_gb > 15 && spend_today_try >= 300 || content_minutes_today > 240',
+    'internet_today_gb > 15 OR spend_today_try > 300 AND content_minutes_today <= 240',
+    '(internet_today_gb BETWEEN 10 AND 15 || spend_today_try == 200) AND content_minutes_today < 240',
+    'spend_today_try > internet_today_gb',
+    'content_minutes_today >= spend_today_try',
+    'internet_today_gb BETWEEN spend_today_try AND content_minutes_today',
+    'internet_today_gb > -1',
+]
+
+# Thresholds used above, probed exactly and just around
+BOUNDARIES = [0.0, 10.0, 15.0, 200.0, 240.0, 300.0]
+BOUNDARY_VALUES = sorted({v + d for v in BOUNDARIES for d in (-0.001, 0.0, 0.001)})
+
+
+def make_rule_set(seed: int):
+    rng = random.Random(seed)
+    rules = [
+        {
+            'rule_id': f'R-{i:02d}',
+            'condition': condition,
+            'action': f'ACTION_{i}',
+            # Few distinct priorities, so ties are common
+            'priority': rng.randint(1, 4),
+            'is_active': True
+        }
+        for i, condition in enumerate(CONDITIONS)
+    ]
+    return compile_rules(rules)
+
+
+def make_states(seed: int, count: int):
+    rng = random.Random(seed)
+    states = []
+    # Every combination of boundary values for the two threshold-heavy fields
+    for internet, spend in itertools.product(BOUNDARY_VALUES, repeat=2):
+        states.append({
+            'internet_today_gb': internet,
+            'spend_today_try': spend,
+            'content_minutes_today': rng.choice(BOUNDARY_VALUES)
+        })
+    for _ in range(count):
+        states.append({
+            field: rng.choice([
+                rng.uniform(0, 400),
+                float(rng.randint(0, 400)),
+                rng.choice(BOUNDARY_VALUES)
+            ])
+            for field in STATE_FIELDS
+        })
+    # NULL and missing values read as 0 in both paths
+    states.append({'internet_today_gb': None, 'spend_today_try': 250.0, 'content_minutes_today': None})
+    states.append({'spend_today_try': 15.0})
+    for index, state in enumerate(states):
+        state['user_id'] = f'U{index:06d}'
+    return states
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_batch_matches_scalar(seed):
+    rule_set = make_rule_set(seed)
+    states = make_states(seed, 5000)
+
+    result = evaluate_batch(rule_set, StateColumns.from_rows(states))
+
+    for index, state in enumerate(states):
+        expected = [r for r in rule_set.rules if r.condition(state)]
+        assert result.triggered_rules(index) == [r.rule for r in expected], state
+        assert bool(result.has_decision[index]) == bool(expected)
+        if expected:
+            assert rule_set.rules[result.selected[index]] is expected[0], state
+
+
+def test_selected_prefers_first_rule_among_equal_priorities():
+    rule_set = compile_rules([
+        {'rule_id': 'R-B', 'condition': 'internet_today_gb > 1', 'action': 'B', 'priority': 1},
+        {'rule_id': 'R-A', 'condition': 'internet_today_gb > 2', 'action': 'A', 'priority': 1},
+        {'rule_id': 'R-C', 'condition': 'internet_today_gb > 0', 'action': 'C', 'priority': 2},
+    ])
+    result = evaluate_batch(rule_set, StateColumns.from_rows([{'user_id': 'U1', 'internet_today_gb': 5}]))
+    assert rule_set.rules[result.selected[0]].rule_id == 'R-B'
+
+
+def test_shared_mask_cache_gives_same_result():
+    rule_set = make_rule_set(7)
+    state = StateColumns.from_rows(make_states(7, 500))
+    cache = {}
+    first = evaluate_batch(rule_set, state, mask_cache=cache)
+    second = evaluate_batch(rule_set, state, mask_cache=cache)
+    assert len(cache) == len(CONDITIONS)
+    assert np.array_equal(first.masks, second.masks)
+    assert np.array_equal(first.selected, second.selected)
+
+
+def test_empty_inputs():
+    rule_set = make_rule_set(1)
+    result = evaluate_batch(rule_set, StateColumns.from_rows([]))
+    assert result.masks.shape == (len(rule_set), 0)
+    assert len(result.decided_users()) == 0
+
+    empty = compile_rules([])
+    result = evaluate_batch(empty, StateColumns.from_rows(make_states(1, 3)))
+    assert not result.has_decision.any()
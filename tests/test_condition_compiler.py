@@ -0,0 +1,99 @@
+"""
+Tests for the rule condition parser and compiler
+"""
+
+import pytest
+
+from src.condition_compiler import (
+    Between, BoolOp, Comparison, ConditionSyntaxError, Field, Number,
+    compile_condition, parse_condition
+)
+
+
+STATE = {'internet_today_gb': 12.0, 'spend_today_try': 300.0, 'content_minutes_today': 0.0}
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ('internet_today_gb > 10', True),
+    ('internet_today_gb > 12', False),
+    ('internet_today_gb >= 12', True),
+    ('spend_today_try == 300', True),
+    ('spend_today_try <= 299.5', False),
+    ('content_minutes_today < .5', True),
+    ('internet_today_gb > -1', True),
+    ('internet_today_gb BETWEEN 12 AND 15', True),
+    ('internet_today_gb between 10 and 11', False),
+    ('10 < internet_today_gb < 15', True),
+    ('10 < internet_today_gb < 12', False),
+    ('internet_today_gb > 15 AND spend_today_try > 200', False),
+    ('internet_today_gb > 15 OR spend_today_try > 200', True),
+    ('internet_today_gb > 15 || spend_today_try > 200 && content_minutes_today > 1', False),
+    ('(internet_today_gb > 15 || spend_today_try > 200) && content_minutes_today < 1', True),
+    ('spend_today_try > internet_today_gb', True),
+    ('content_minutes_today BETWEEN 0 AND internet_today_gb', True),
+])
+def test_valid_conditions(condition, expected):
+    assert compile_condition(condition)(STATE) is expected
+
+
+def test_missing_and_null_fields_read_as_zero():
+    condition = compile_condition('internet_today_gb < 1 AND spend_today_try < 1')
+    assert condition({}) is True
+    assert condition({'internet_today_gb': None, 'spend_today_try': None}) is True
+
+
+def test_ast_shape():
+    assert parse_condition('internet_today_gb > 15') == \
+        Comparison('>', Field('internet_today_gb'), Number(15.0))
+    assert parse_condition('spend_today_try BETWEEN 200 AND 300') == \
+        Between(Field('spend_today_try'), Number(200.0), Number(300.0))
+    # AND binds tighter than OR; nested operators of the same kind are flattened
+    ast = parse_condition('internet_today_gb > 1 OR spend_today_try > 2 AND content_minutes_today > 3 AND spend_today_try < 9')
+    assert isinstance(ast, BoolOp) and ast.op == 'OR'
+    assert isinstance(ast.operands[1], BoolOp) and ast.operands[1].op == 'AND'
+    assert len(ast.operands[1].operands) == 3
+
+
+def test_referenced_fields():
+    condition = compile_condition('internet_today_gb > 15 AND spend_today_try BETWEEN 1 AND 2')
+    assert condition.fields == {'internet_today_gb', 'spend_today_try'}
+
+
+@pytest.mark.parametrize('condition', [
+    '',
+    '   ',
+    'unknown_field > 1',
+    'internet_today_gb = 15',
+    'internet_today_gb >',
+    'internet_today_gb > 15 AND',
+    'internet_today_gb > 15 OR',
+    'internet_today_gb > 1e3',
+    'internet_today_gb',
+    'internet_today_gb BETWEEN 10',
+    'internet_today_gb BETWEEN 10 OR 15',
+    '(internet_today_gb > 15',
+    'internet_today_gb > 15)',
+    'internet_today_gb > - spend_today_try',
+    'internet_today_gb > 15; DROP TABLE rules',
+    '__import__("os").system("true")',
+])
+def test_rejected_conditions(condition):
+    with pytest.raises(ConditionSyntaxError):
+        parse_condition(condition)
+
+
+@pytest.mark.parametrize('condition', [
+    '1 > 2',
+    '2 > 1',
+    '5 BETWEEN 1 AND 10',
+    '1 < 2 < internet_today_gb',
+    'internet_today_gb > 15 OR 1 < 2',
+])
+def test_constant_only_predicates_are_rejected(condition):
+    with pytest.raises(ConditionSyntaxError, match='constants only'):
+        parse_condition(condition)
+
+
+def test_any_identifier_accepted_without_field_list():
+    assert parse_condition('custom_metric > 1', fields=None) == \
+        Comparison('>', Field('custom_metric'), Number(1.0))
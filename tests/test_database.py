@@ -0,0 +1,277 @@
+"""
+Tests for the Database unit of work (transaction(), nested savepoints and
+on-commit callbacks) and for server-side prepared statements
+"""
+
+import gc
+
+import pytest
+
+from src.database import PreparedStatement, TransactionAborted
+
+
+GET_USER = PreparedStatement(
+    "test_get_user",
+    "SELECT user_id FROM users WHERE user_id = $1",
+    "%s"
+)
+COUNT_USERS = PreparedStatement("test_count_users", "SELECT COUNT(*) AS value FROM users")
+
+
+def test_transaction_commits_once_on_one_connection(fake_db):
+    with fake_db.transaction() as conn:
+        assert fake_db.in_transaction
+        fake_db.execute("UPDATE a")
+        fake_db.execute("UPDATE b")
+
+    assert not fake_db.in_transaction
+    assert len(fake_db.connections) == 1
+    assert conn.statements == ['UPDATE a', 'UPDATE b', 'COMMIT']
+
+
+def test_execute_outside_transaction_commits_per_statement(fake_db):
+    fake_db.execute("UPDATE a")
+    fake_db.execute("UPDATE b")
+
+    assert fake_db.connections[0].statements == ['UPDATE a', 'COMMIT', 'UPDATE b', 'COMMIT']
+
+
+def test_exception_rolls_back_and_unbinds_the_thread(fake_db):
+    with pytest.raises(TransactionAborted):
+        with fake_db.transaction() as conn:
+            fake_db.execute("UPDATE a")
+            raise TransactionAborted("no")
+
+    assert conn.statements == ['UPDATE a', 'ROLLBACK']
+    assert not fake_db.in_transaction
+
+    # The next unit of work starts clean at depth 0
+    with fake_db.transaction():
+        with fake_db.transaction():
+            pass
+    assert conn.statements[-3:] == ['SAVEPOINT sp_1', 'RELEASE SAVEPOINT sp_1', 'COMMIT']
+
+
+def test_nested_block_is_a_released_savepoint(fake_db):
+    with fake_db.transaction() as conn:
+        fake_db.execute("UPDATE a")
+        with fake_db.transaction() as inner:
+            assert inner is conn
+            fake_db.execute("UPDATE b")
+        fake_db.execute("UPDATE c")
+
+    assert conn.statements == [
+        'UPDATE a', 'SAVEPOINT sp_1', 'UPDATE b', 'RELEASE SAVEPOINT sp_1', 'UPDATE c', 'COMMIT'
+    ]
+
+
+def test_failed_savepoint_rolls_back_only_its_block(fake_db):
+    with fake_db.transaction() as conn:
+        fake_db.execute("UPDATE a")
+        with pytest.raises(TransactionAborted):
+            with fake_db.transaction():
+                fake_db.execute("UPDATE b")
+                raise TransactionAborted("user U1")
+        assert fake_db.in_transaction
+        fake_db.execute("UPDATE c")
+
+    assert conn.statements == [
+        'UPDATE a', 'SAVEPOINT sp_1', 'UPDATE b', 'ROLLBACK TO SAVEPOINT sp_1', 'UPDATE c', 'COMMIT'
+    ]
+
+
+def test_savepoint_names_follow_depth_after_rollback(fake_db):
+    with fake_db.transaction() as conn:
+        with fake_db.transaction():
+            with pytest.raises(TransactionAborted):
+                with fake_db.transaction():
+                    raise TransactionAborted("inner")
+            with fake_db.transaction():
+                pass
+
+    assert conn.statements == [
+        'SAVEPOINT sp_1',
+        'SAVEPOINT sp_2', 'ROLLBACK TO SAVEPOINT sp_2',
+        'SAVEPOINT sp_2', 'RELEASE SAVEPOINT sp_2',
+        'RELEASE SAVEPOINT sp_1',
+        'COMMIT'
+    ]
+
+
+def test_failed_statement_in_savepoint_keeps_the_outer_transaction(fake_db):
+    with fake_db.transaction() as conn:
+        conn.fail_on.add("INSERT bad")
+        with pytest.raises(RuntimeError):
+            with fake_db.transaction():
+                fake_db.execute("INSERT bad")
+        fake_db.execute("INSERT good")
+
+    assert conn.statements == [
+        'SAVEPOINT sp_1', 'INSERT bad', 'ROLLBACK TO SAVEPOINT sp_1', 'INSERT good', 'COMMIT'
+    ]
+
+
+def test_error_escaping_savepoint_rolls_back_the_whole_transaction(fake_db):
+    with pytest.raises(RuntimeError):
+        with fake_db.transaction() as conn:
+            fake_db.execute("UPDATE a")
+            with fake_db.transaction():
+                raise RuntimeError("late failure")
+
+    assert conn.statements == [
+        'UPDATE a', 'SAVEPOINT sp_1', 'ROLLBACK TO SAVEPOINT sp_1', 'ROLLBACK'
+    ]
+    assert not fake_db.in_transaction
+
+
+def test_closed_connection_is_not_rolled_back(fake_db):
+    with pytest.raises(RuntimeError):
+        with fake_db.transaction() as conn:
+            with fake_db.transaction():
+                conn.close()
+                raise RuntimeError("backend terminated")
+
+    assert conn.statements == ['SAVEPOINT sp_1']
+    assert conn not in fake_db.connections
+    assert not fake_db.in_transaction
+
+
+# ------------------------------------------------------------
+# Prepared statements
+# ------------------------------------------------------------
+
+def test_statement_is_prepared_once_per_connection(fake_db):
+    fake_db.execute_prepared(GET_USER, ('U1',))
+    fake_db.execute_prepared(GET_USER, ('U2',), fetch='one')
+    fake_db.execute_prepared(COUNT_USERS)
+
+    assert fake_db.connections[0].statements == [
+        f"PREPARE test_get_user AS {GET_USER.query}", "EXECUTE test_get_user (%s)", 'COMMIT',
+        "EXECUTE test_get_user (%s)", 'COMMIT',
+        f"PREPARE test_count_users AS {COUNT_USERS.query}", "EXECUTE test_count_users", 'COMMIT',
+    ]
+
+
+def test_fetch_modes(fake_db):
+    assert isinstance(fake_db.execute_prepared(COUNT_USERS), list)
+    assert isinstance(fake_db.execute_prepared(COUNT_USERS, fetch='one'), dict)
+
+
+def test_each_connection_prepares_for_itself(fake_db):
+    with fake_db.transaction():
+        fake_db.execute_prepared(COUNT_USERS)
+        # A second connection checked out while the first one is busy
+        with fake_db.connection():
+            pass
+    first, second = fake_db.connections
+    fake_db.idle.remove(first)
+    fake_db.execute_prepared(COUNT_USERS)
+
+    assert [s for s in second.statements if s.startswith('PREPARE')] == [
+        f"PREPARE test_count_users AS {COUNT_USERS.query}"
+    ]
+
+
+def test_recycled_connection_prepares_again(fake_db):
+    fake_db.execute_prepared(COUNT_USERS)
+    old = fake_db.connections[0]
+    assert fake_db._prepared[old] == {'test_count_users'}
+
+    # The pool discards a dead connection and opens a new one
+    fake_db.idle.remove(old)
+    old.close()
+    fake_db.connections.remove(old)
+    del old
+    gc.collect()
+    assert len(fake_db._prepared) == 0
+
+    fake_db.execute_prepared(COUNT_USERS)
+
+    new = fake_db.connections[0]
+    assert new.statements[0] == f"PREPARE test_count_users AS {COUNT_USERS.query}"
+
+
+def test_failed_prepare_is_not_remembered(fake_db):
+    with fake_db.connection() as conn:
+        conn.fail_on.add(f"PREPARE test_count_users AS {COUNT_USERS.query}")
+
+    with pytest.raises(RuntimeError):
+        fake_db.execute_prepared(COUNT_USERS)
+    assert 'test_count_users' not in fake_db._prepared.get(conn, set())
+
+    conn.fail_on.clear()
+    fake_db.execute_prepared(COUNT_USERS)
+    assert conn.statements.count(f"PREPARE test_count_users AS {COUNT_USERS.query}") == 2
+
+
+def test_prepared_statement_survives_rollback(database):
+    # PREPARE is not transactional, so a rolled-back unit of work keeps it
+    with pytest.raises(TransactionAborted):
+        with database.transaction() as conn:
+            database.execute_prepared(COUNT_USERS)
+            raise TransactionAborted("discard")
+
+    assert 'test_count_users' in database._prepared[conn]
+    with conn.cursor() as cur:
+        cur.execute("EXECUTE test_count_users")
+        assert cur.fetchone()[0] >= 0
+    conn.rollback()
+
+
+def test_prepared_statement_after_connection_loss(database):
+    with database.transaction() as conn:
+        database.execute_prepared(COUNT_USERS)
+        expected = database.execute_prepared(COUNT_USERS, fetch='one')['value']
+    conn.close()
+
+    # Every pooled connection, including the replacement, can run it
+    for _ in range(3):
+        assert database.execute_prepared(COUNT_USERS, fetch='one')['value'] == expected
+
+
+# ------------------------------------------------------------
+# On-commit callbacks
+# ------------------------------------------------------------
+
+def test_on_commit_runs_after_the_outermost_commit(fake_db):
+    seen = []
+    with fake_db.transaction() as conn:
+        fake_db.on_commit(lambda: seen.append(('outer', list(conn.statements), fake_db.in_transaction)))
+        with fake_db.transaction():
+            fake_db.on_commit(lambda: seen.append(('inner', None, None)))
+        assert seen == []
+
+    assert seen == [('outer', ['SAVEPOINT sp_1', 'RELEASE SAVEPOINT sp_1', 'COMMIT'], False),
+                    ('inner', None, None)]
+
+
+def test_on_commit_is_dropped_on_rollback(fake_db):
+    seen = []
+    with pytest.raises(TransactionAborted):
+        with fake_db.transaction():
+            with fake_db.transaction():
+                fake_db.on_commit(lambda: seen.append('inner'))
+            raise TransactionAborted("outer")
+
+    with fake_db.transaction():
+        pass
+    assert seen == []
+
+
+def test_on_commit_of_rolled_back_savepoint_is_dropped(fake_db):
+    seen = []
+    with fake_db.transaction():
+        fake_db.on_commit(lambda: seen.append('before'))
+        with pytest.raises(TransactionAborted):
+            with fake_db.transaction():
+                fake_db.on_commit(lambda: seen.append('rolled back'))
+                raise TransactionAborted("user U1")
+        fake_db.on_commit(lambda: seen.append('after'))
+
+    assert seen == ['before', 'after']
+
+
+def test_on_commit_outside_transaction_runs_immediately(fake_db):
+    seen = []
+    fake_db.on_commit(lambda: seen.append('now'))
+    assert seen == ['now']
@@ -0,0 +1,112 @@
+"""
+Tests for edge-triggered incremental evaluation
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+
+from src.incremental import IncrementalEvaluator
+from src.rule_cache import compile_rules
+
+
+TODAY = date(2026, 10, 17)
+
+RULES = [
+    {'rule_id': 'R-01', 'condition': 'internet_today_gb > 15', 'action': 'DATA_USAGE_WARNING', 'priority': 3},
+    {'rule_id': 'R-05', 'condition': 'internet_today_gb BETWEEN 10 AND 15', 'action': 'DATA_USAGE_NUDGE', 'priority': 6},
+    {'rule_id': 'R-04', 'condition': 'internet_today_gb > 15 AND spend_today_try > 300',
+     'action': 'CRITICAL_ALERT', 'priority': 1},
+]
+
+
+def state(internet, spend=0, day=TODAY):
+    return {'internet_today_gb': internet, 'spend_today_try': spend,
+            'content_minutes_today': 0, 'state_date': day}
+
+
+def step(evaluator, rule_set, old, new, user_id='U1'):
+    transition = evaluator.evaluate(rule_set, user_id, old, new)
+    evaluator.commit(transition)
+    return [r.rule_id for r in transition.newly_true]
+
+
+def test_only_rising_edges_are_reported():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator()
+
+    values = [0, 16, 20, 5, 17]      # false -> true -> true -> false -> true for R-01
+    fired = [step(evaluator, rule_set, state(a), state(b)) for a, b in zip(values, values[1:])]
+
+    assert fired == [['R-01'], [], [], ['R-01']]
+
+
+def test_multi_field_rule_edges():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator()
+
+    assert step(evaluator, rule_set, state(0), state(16)) == ['R-01']
+    assert step(evaluator, rule_set, state(16), state(16, 301)) == ['R-04']
+    assert step(evaluator, rule_set, state(16, 301), state(16, 400)) == []
+    assert step(evaluator, rule_set, state(16, 400), state(12, 400)) == ['R-05']
+    assert step(evaluator, rule_set, state(12, 400), state(18, 400)) == ['R-04', 'R-01']
+
+
+def test_uncommitted_transition_is_reported_again():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator()
+
+    first = evaluator.evaluate(rule_set, 'U1', state(0), state(16))
+    retry = evaluator.evaluate(rule_set, 'U1', state(0), state(16))
+    assert [r.rule_id for r in first.newly_true] == [r.rule_id for r in retry.newly_true] == ['R-01']
+
+
+def test_truth_is_rebuilt_after_eviction_and_rule_change():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator(max_users=2)
+
+    for user_id in ('U1', 'U2', 'U3'):
+        step(evaluator, rule_set, state(0), state(16), user_id)
+    assert evaluator.stats['users'] == 2
+
+    # U1 was evicted: its truth comes from old_state, so staying above is silent
+    assert step(evaluator, rule_set, state(16), state(20), 'U1') == []
+    assert step(evaluator, rule_set, state(20), state(25), 'U3') == []
+
+    changed = compile_rules(RULES, version=(2,))
+    assert step(evaluator, changed, state(25), state(30), 'U3') == []
+
+
+def test_daily_rollover_clears_remembered_truth():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator()
+
+    step(evaluator, rule_set, state(0), state(16), 'U1')
+    step(evaluator, rule_set, state(0), state(16), 'U2')
+    assert evaluator.stats['users'] == 2
+
+    tomorrow = TODAY + timedelta(days=1)
+    assert step(evaluator, rule_set, state(0, day=tomorrow), state(16, day=tomorrow), 'U1') == ['R-01']
+    assert evaluator.stats['users'] == 1
+
+
+def test_user_lock_serializes_same_rising_edge():
+    rule_set = compile_rules(RULES, version=(1,))
+    evaluator = IncrementalEvaluator()
+    fired = []
+
+    def change():
+        with evaluator.user_lock('U1'):
+            transition = evaluator.evaluate(rule_set, 'U1', state(0), state(16))
+            time.sleep(0.01)        # decision write
+            evaluator.commit(transition)
+        fired.extend(r.rule_id for r in transition.newly_true)
+
+    threads = [threading.Thread(target=change) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fired == ['R-01']
+    assert evaluator._user_locks == {}
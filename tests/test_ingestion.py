@@ -0,0 +1,173 @@
+"""
+Tests for the batch aggregation of EventIngestor
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+import psycopg2.errors
+import pytest
+
+from src.database import TransactionAborted
+from src.ingestion import EventIngestor, IngestStats, UPSERT_STATE_SQL
+
+
+class RecordingDatabase:
+    """Captures the statements of one _flush() instead of running them"""
+
+    def __init__(self, unknown_users=(), error=psycopg2.errors.ForeignKeyViolation):
+        self.upserts = []
+        self.sequences = []
+        self.copied = []
+        self.unknown_users = set(unknown_users)
+        self.error = error
+        self._pending = None
+
+    @contextmanager
+    def transaction(self):
+        # Rows become visible only when the block exits without an error
+        self._pending = ([], [])
+        yield None
+        self.copied.extend(self._pending[0])
+        self.upserts.extend(self._pending[1])
+
+    def execute(self, query, params=None):
+        return None
+
+    def execute_one(self, query, params=None):
+        self.sequences.append(params[0])
+        return {'hi': 7}
+
+    def copy_expert(self, query, file):
+        rows = file.getvalue().splitlines()
+        for row in rows:
+            if row.split(',')[1] in self.unknown_users:
+                raise self.error(f"user_id {row.split(',')[1]} is not present in table users")
+        self._pending[0].extend(row.split(',')[0] for row in rows)
+        return len(rows)
+
+    def execute_values(self, query, rows, template=None, page_size=1000):
+        if query == UPSERT_STATE_SQL:
+            self._pending[1].extend(rows)
+        return len(rows)
+
+
+def _row(index, user_id, unit, value):
+    return (f'EVT-{index}', user_id, 'BiP', 'USAGE', Decimal(value), unit, datetime(2026, 10, 17))
+
+
+def test_deltas_are_summed_per_user_in_user_id_order():
+    batch = [
+        _row(1, 'U9', 'GB', '0.5'),
+        _row(2, 'U1', 'TRY', '10'),
+        _row(3, 'U5', 'MIN', '3'),
+        _row(4, 'U1', 'GB', '1'),
+        _row(5, 'U9', 'TRY', '2.5'),
+    ]
+    deltas = EventIngestor(RecordingDatabase())._aggregate(batch)
+
+    assert list(deltas) == ['U1', 'U5', 'U9']
+    assert deltas['U1']['internet_today_gb'] == Decimal(1)
+    assert deltas['U9']['spend_today_try'] == Decimal('2.5')
+    assert deltas['U5']['content_minutes_today'] == Decimal(3)
+
+
+def test_upsert_locks_users_in_sorted_order():
+    database = RecordingDatabase()
+    ingestor = EventIngestor(database)
+    batch = [_row(i, f'U{user:03d}', 'TRY', '1') for i, user in enumerate([42, 7, 999, 7, 100, 1])]
+
+    stats = IngestStats()
+    ingestor._flush(batch, stats)
+
+    user_ids = [row[0] for row in database.upserts]
+    assert user_ids == sorted(set(user_ids))
+    assert stats.state_upserts == 5
+
+
+def test_generated_event_ids_use_their_own_sequence_and_prefix():
+    database = RecordingDatabase()
+    ingestor = EventIngestor(database)
+    event = {'user_id': 'U1', 'service': 'BiP', 'event_type': 'USAGE', 'value': 1, 'unit': 'GB'}
+
+    ids = [ingestor.normalize(event)[0] for _ in range(3)]
+
+    block = 7 * ingestor.event_ids.block_size
+    assert ids == [f'EVT-I{block}', f'EVT-I{block + 1}', f'EVT-I{block + 2}']
+    assert database.sequences == ['ingest_event_id_seq']
+    assert ingestor.normalize(dict(event, event_id='EVT-1001'))[0] == 'EVT-1001'
+
+
+def test_rejected_events_are_isolated_and_skipped():
+    database = RecordingDatabase(unknown_users={'NOPE'})
+    batch = [_row(i, 'NOPE' if i in (3, 6) else f'U{i}', 'GB', '1') for i in range(8)]
+
+    stats = IngestStats()
+    EventIngestor(database)._flush(batch, stats)
+
+    assert database.copied == [f'EVT-{i}' for i in range(8) if i not in (3, 6)]
+    assert stats.events == 6
+    assert stats.skipped == 2
+    assert stats.state_upserts == 6
+    assert 'NOPE' not in [row[0] for row in database.upserts]
+
+
+def test_failing_batch_does_not_stop_the_run():
+    database = RecordingDatabase(unknown_users={'NOPE'})
+    events = [
+        {'user_id': 'NOPE' if i == 4 else f'U{i}', 'service': 'BiP', 'event_type': 'PAYMENT',
+         'value': 1, 'unit': 'TRY', 'event_id': f'EVT-{i}'}
+        for i in range(10)
+    ]
+
+    stats = EventIngestor(database, batch_size=3).ingest(events)
+
+    assert stats.events == 9
+    assert stats.skipped == 1
+    assert len(database.copied) == 9
+
+
+def test_database_failure_skips_the_whole_batch():
+    database = RecordingDatabase(unknown_users={'U1'}, error=psycopg2.OperationalError)
+    batch = [_row(i, f'U{i}', 'GB', '1') for i in range(4)]
+
+    stats = IngestStats()
+    EventIngestor(database)._flush(batch, stats)
+
+    assert stats.skipped == 4
+    assert stats.events == 0
+    assert database.copied == []
+
+
+def test_unknown_user_and_duplicate_event_id(database):
+    user = database.execute_one("SELECT user_id FROM users ORDER BY user_id LIMIT 1")['user_id']
+    now = datetime.now()
+    events = [
+        {'event_id': 'EVT-T1', 'user_id': user, 'service': 'BiP', 'event_type': 'USAGE',
+         'value': 1, 'unit': 'GB', 'timestamp': now},
+        {'event_id': 'EVT-T2', 'user_id': 'NO-USER', 'service': 'BiP', 'event_type': 'USAGE',
+         'value': 1, 'unit': 'GB', 'timestamp': now},
+        {'event_id': 'EVT-T1', 'user_id': user, 'service': 'BiP', 'event_type': 'USAGE',
+         'value': 1, 'unit': 'GB', 'timestamp': now},
+        {'event_id': 'EVT-T3', 'user_id': user, 'service': 'BiP', 'event_type': 'USAGE',
+         'value': 2, 'unit': 'GB', 'timestamp': now},
+    ]
+
+    # Batches commit as savepoints of this transaction, which is rolled back
+    with pytest.raises(TransactionAborted):
+        with database.transaction():
+            before = database.execute_one(
+                "SELECT internet_today_gb FROM user_state WHERE user_id = %s", (user,))['internet_today_gb']
+            stats = EventIngestor(database, batch_size=4).ingest(events)
+            loaded = database.execute(
+                "SELECT event_id FROM events WHERE event_id LIKE 'EVT-T%%' ORDER BY event_id")
+            after = database.execute_one(
+                "SELECT internet_today_gb FROM user_state WHERE user_id = %s", (user,))['internet_today_gb']
+            raise TransactionAborted("test data")
+
+    assert stats.skipped == 2
+    assert stats.events == 2
+    assert [row['event_id'] for row in loaded] == ['EVT-T1', 'EVT-T3']
+    assert after - before == 3
@@ -0,0 +1,157 @@
+"""
+Tests for keyset pagination: page tokens, the continuation predicate and
+listing filters
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database import (
+    ActionFilter, DecisionFilter, EventFilter, Page,
+    decode_page_token, encode_page_token, fetch_page
+)
+
+
+class RecordingDatabase:
+    """Returns canned rows and records the statement fetch_page builds"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, query, params=None):
+        self.calls.append((query, params))
+        return self.rows
+
+
+def _token(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+# ------------------------------------------------------------
+# Token codec
+# ------------------------------------------------------------
+
+@pytest.mark.parametrize('timestamp, row_id', [
+    (datetime(2026, 10, 17, 12, 30), 'EVT-1001'),
+    (datetime(2026, 10, 17, 12, 30, 0, 123456), 'D-1'),
+    (datetime(2026, 1, 1), "id with 'quotes' and ünicode"),
+])
+def test_token_round_trip(timestamp, row_id):
+    token = encode_page_token(timestamp, row_id)
+    assert decode_page_token(token) == (timestamp, row_id)
+    # URL-safe and unpadded, so it can travel as a query parameter
+    assert set(token) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_')
+
+
+@pytest.mark.parametrize('token', [
+    '',
+    'not a token',
+    '!!!!',
+    'ü',
+    _token('2026-10-17T12:30:00'),
+    _token(['2026-10-17T12:30:00']),
+    _token(['2026-10-17T12:30:00', 'EVT-1', 'extra']),
+    _token(['yesterday', 'EVT-1']),
+    _token([1760700000, 'EVT-1']),
+    _token(['2026-10-17T12:30:00', None]),
+    _token({'2026-10-17T12:30:00': 1, 'EVT-1': 2}),
+    base64.urlsafe_b64encode(b'\xff\xfe\x00').decode(),
+    None,
+])
+def test_tampered_tokens_are_rejected(token):
+    with pytest.raises(ValueError, match='Invalid page token'):
+        decode_page_token(token)
+
+
+# ------------------------------------------------------------
+# Statement construction
+# ------------------------------------------------------------
+
+def _rows(count, start=datetime(2026, 10, 17, 12, 0)):
+    return [{'timestamp': start - timedelta(minutes=i), 'event_id': f'EVT-{i}'} for i in range(count)]
+
+
+def test_first_page_has_no_continuation_predicate():
+    database = RecordingDatabase(_rows(3))
+    page = fetch_page(database, "SELECT e.* FROM events e", ["e.user_id = %s"], ['U1'],
+                      'e.timestamp', 'e.event_id', limit=5)
+
+    query, params = database.calls[0]
+    assert query == ("SELECT e.* FROM events e WHERE e.user_id = %s "
+                     "ORDER BY e.timestamp DESC, e.event_id DESC LIMIT %s")
+    assert params == ('U1', 6)
+    assert len(page) == 3 and not page.has_more
+
+
+def test_next_page_uses_row_comparison_after_the_last_row():
+    rows = _rows(6)
+    database = RecordingDatabase(rows)
+    page = fetch_page(database, "SELECT e.* FROM events e", [], [], 'e.timestamp', 'e.event_id', limit=5)
+
+    assert [r['event_id'] for r in page] == [r['event_id'] for r in rows[:5]]
+    assert page.has_more
+    assert decode_page_token(page.next_token) == (rows[4]['timestamp'], rows[4]['event_id'])
+
+    fetch_page(database, "SELECT e.* FROM events e", ["e.service = %s"], ['BiP'],
+               'e.timestamp', 'e.event_id', limit=5, token=page.next_token)
+    query, params = database.calls[1]
+    assert "WHERE e.service = %s AND (e.timestamp, e.event_id) < (%s, %s) ORDER BY" in query
+    assert params == ('BiP', rows[4]['timestamp'], rows[4]['event_id'], 6)
+
+
+def test_invalid_token_fails_before_querying():
+    database = RecordingDatabase([])
+    with pytest.raises(ValueError):
+        fetch_page(database, "SELECT 1", [], [], 't', 'id', limit=5, token='garbage')
+    assert database.calls == []
+
+
+def test_page_behaves_like_its_rows():
+    page = Page([{'id': 1}, {'id': 2}])
+    assert len(page) == 2 and page[1] == {'id': 2} and list(page) == page.rows
+
+
+# ------------------------------------------------------------
+# Filters
+# ------------------------------------------------------------
+
+def test_filter_conditions():
+    since, until = datetime(2026, 10, 1), datetime(2026, 10, 17)
+    assert EventFilter().conditions() == ([], [])
+    assert EventFilter(user_id='U1', service='BiP', since=since, until=until).conditions() == (
+        ['e.user_id = %s', 'e.service = %s', 'e.timestamp >= %s', 'e.timestamp < %s'],
+        ['U1', 'BiP', since, until]
+    )
+    assert DecisionFilter(selected_action='SPEND_ALERT').conditions() == (['d.selected_action = %s'], ['SPEND_ALERT'])
+    assert ActionFilter(action_type='SPEND_NUDGE', since=since).conditions() == (
+        ['a.action_type = %s', 'a.created_at >= %s'], ['SPEND_NUDGE', since]
+    )
+
+
+# ------------------------------------------------------------
+# Against PostgreSQL
+# ------------------------------------------------------------
+
+def test_pages_break_timestamp_ties_by_id(database):
+    # Many rows share a timestamp; paging must neither skip nor repeat any
+    with database.transaction():
+        database.execute("CREATE TEMP TABLE page_test (ts TIMESTAMP, id VARCHAR(20)) ON COMMIT DROP")
+        base = datetime(2026, 10, 17, 12, 0)
+        rows = [(base - timedelta(seconds=i // 7), f'R-{i:03d}') for i in range(100)]
+        database.execute_values("INSERT INTO page_test (ts, id) VALUES %s", rows)
+
+        seen, token, pages = [], None, 0
+        while True:
+            page = fetch_page(database, "SELECT t.* FROM page_test t", [], [], 't.ts', 't.id', 9, token)
+            seen.extend((row['ts'], row['id']) for row in page)
+            pages += 1
+            if not page.has_more:
+                break
+            token = page.next_token
+
+    assert seen == sorted(rows, reverse=True)
+    assert pages == 12
@@ -0,0 +1,187 @@
+"""
+Tests for RuleSetCache invalidation: local writes and the periodic version check
+"""
+
+import pytest
+
+from src import rule_cache as rule_cache_module
+from src.database import RuleRepository, ShadowRuleRepository
+from src.rule_cache import RuleSetCache
+
+
+RULES = [
+    {'rule_id': 'R-02', 'condition': 'spend_today_try > 100', 'action': 'SPEND_ALERT', 'priority': 2},
+    {'rule_id': 'R-01', 'condition': 'internet_today_gb > 10', 'action': 'DATA_USAGE_WARNING', 'priority': 1},
+]
+
+
+class FakeRuleRepository:
+    """In-memory stand-in for RuleRepository that counts its queries"""
+
+    def __init__(self, rules):
+        self.rules = [dict(r) for r in rules]
+        self.version = (len(rules), 'v1')
+        self.local_version = 0
+        self.version_queries = 0
+        self.loads = 0
+
+    def get_version(self):
+        self.version_queries += 1
+        return self.version
+
+    def get_active(self):
+        self.loads += 1
+        return [dict(r) for r in self.rules]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class NullDatabase:
+    def execute(self, query, params=None):
+        return None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rule_cache_module.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def repo():
+    return FakeRuleRepository(RULES)
+
+
+def test_first_get_compiles_rules_in_priority_order(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+
+    rule_set = cache.get()
+
+    assert [r.rule_id for r in rule_set] == ['R-01', 'R-02']
+    assert rule_set.version == repo.version
+    assert cache.stats == {'hits': 0, 'misses': 1, 'version_checks': 0, 'rules': 2}
+
+
+def test_hits_inside_check_interval_do_not_query(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    first = cache.get()
+    queries = repo.version_queries
+
+    clock.now += 4.9
+    assert cache.get() is first
+    assert repo.version_queries == queries
+    assert repo.loads == 1
+    assert cache.hits == 1
+
+
+def test_local_version_bump_reloads_without_waiting(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    first = cache.get()
+
+    repo.rules[0]['condition'] = 'spend_today_try > 50'
+    repo.local_version += 1
+
+    second = cache.get()
+    assert second is not first
+    assert repo.loads == 2
+    assert second.rules[1].condition.source == 'spend_today_try > 50'
+    assert cache.get() is second
+
+
+def test_stale_version_reloads_after_check_interval(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    first = cache.get()
+
+    # Another process edited the table: only the fingerprint changes
+    repo.rules.pop()
+    repo.version = (1, 'v2')
+
+    assert cache.get() is first
+
+    clock.now += 5.0
+    second = cache.get()
+    assert [r.rule_id for r in second] == ['R-02']
+    assert second.version == (1, 'v2')
+    assert cache.version_checks == 1
+    assert cache.misses == 2
+
+
+def test_unchanged_version_keeps_rule_set(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    first = cache.get()
+
+    clock.now += 5.0
+    assert cache.get() is first
+    assert cache.version_checks == 1
+    assert repo.loads == 1
+
+    # The check restarts the interval
+    clock.now += 1.0
+    assert cache.get() is first
+    assert cache.version_checks == 1
+
+
+def test_invalidate_forces_reload(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    first = cache.get()
+
+    cache.invalidate()
+
+    assert cache.get() is not first
+    assert repo.loads == 2
+
+
+def test_edit_during_reload_is_picked_up_on_next_get(repo, clock):
+    cache = RuleSetCache(repo, check_interval=5.0)
+    get_active = repo.get_active
+
+    def edited_while_loading():
+        rows = get_active()
+        repo.local_version += 1
+        return rows
+
+    repo.get_active = edited_while_loading
+    cache.get()
+    repo.get_active = get_active
+
+    cache.get()
+    assert repo.loads == 2
+
+
+def test_invalid_condition_is_skipped(repo, clock):
+    repo.rules.append({'rule_id': 'R-03', 'condition': 'internet_today_gb >', 'action': 'X', 'priority': 0})
+
+    rule_set = RuleSetCache(repo).get()
+
+    assert [r.rule_id for r in rule_set] == ['R-01', 'R-02']
+
+
+def test_repository_writes_bump_their_own_local_version(monkeypatch):
+    monkeypatch.setattr(RuleRepository, 'local_version', 0)
+    monkeypatch.setattr(ShadowRuleRepository, 'local_version', 0)
+
+    rules = RuleRepository(NullDatabase())
+    assert rules.update('R-01', {'priority': 4})
+    assert rules.toggle_active('R-01')
+
+    assert RuleRepository.local_version == 2
+    assert ShadowRuleRepository.local_version == 0
+    assert RuleRepository(NullDatabase()).local_version == 2
+
+
+def test_failed_write_does_not_bump_local_version(monkeypatch):
+    monkeypatch.setattr(RuleRepository, 'local_version', 0)
+
+    class FailingDatabase:
+        def execute(self, query, params=None):
+            raise RuntimeError("connection lost")
+
+    assert not RuleRepository(FailingDatabase()).toggle_active('R-01')
+    assert RuleRepository.local_version == 0
@@ -0,0 +1,167 @@
+"""
+Tests for RuleEngine helpers that do not need a database
+"""
+
+import logging
+
+import pytest
+
+from src import rule_engine as rule_engine_module
+from src.config import engine_config
+from src.database import TransactionAborted
+from src.rule_cache import compile_rules
+from src.rule_engine import RuleEngine
+from src.state_snapshot import LoadCancelled
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine()
+
+
+@pytest.mark.parametrize('condition, event_type, expected', [
+    ('internet_today_gb > 15', 'USAGE', True),
+    ('internet_today_gb > 15', 'PAYMENT', False),
+    ('spend_today_try > 300 AND internet_today_gb > 15', 'PAYMENT', True),
+    ('content_minutes_today > 240', 'CONTENT_CONSUMPTION', True),
+    ('content_minutes_today > 240', 'UNKNOWN', True),
+])
+def test_rule_relevance_follows_condition_fields(engine, condition, event_type, expected):
+    assert engine.is_rule_relevant_to_event(condition, event_type) is expected
+
+
+@pytest.mark.parametrize('event_type', ['USAGE', 'UNKNOWN'])
+def test_invalid_condition_is_logged_and_not_relevant(engine, event_type, caplog):
+    with caplog.at_level(logging.ERROR, logger='src.rule_engine'):
+        assert engine.is_rule_relevant_to_event('internet_today_gb >', event_type) is False
+    assert 'internet_today_gb >' in caplog.text
+
+
+def test_invalid_stored_rule_does_not_break_matching(engine, monkeypatch):
+    rule_set = compile_rules([
+        {'rule_id': 'R-99', 'condition': 'internet_today_gb >> 1', 'action': 'X', 'priority': 0},
+        {'rule_id': 'R-01', 'condition': 'internet_today_gb > 15', 'action': 'DATA_USAGE_WARNING', 'priority': 3},
+    ], version=(2,))
+    monkeypatch.setattr(engine.rule_cache, 'get', lambda: rule_set)
+
+    triggered = engine.get_triggered_rules({'internet_today_gb': 16}, 'USAGE')
+
+    assert [r['rule_id'] for r in triggered] == ['R-01']
+
+
+@pytest.fixture
+def sweep_engine(engine, fake_db, monkeypatch):
+    """Engine whose non-batch sweep writes one statement per user to fake_db"""
+    monkeypatch.setattr(rule_engine_module, 'db', fake_db)
+    monkeypatch.setattr(engine_config, 'batch_size', 2)
+    users = [{'user_id': f'U{i}'} for i in range(5)]
+
+    def stream_states(batch_size=None):
+        for start in range(0, len(users), batch_size):
+            yield users[start:start + batch_size]
+
+    def process_user(user_id):
+        with fake_db.transaction():
+            fake_db.execute(f"INSERT {user_id}")
+        return {'user_id': user_id}
+
+    monkeypatch.setattr(engine.user_state_repo, 'stream_states', stream_states)
+    monkeypatch.setattr(engine, 'process_user', process_user)
+    return engine
+
+
+def test_non_batch_sweep_commits_per_batch(sweep_engine, fake_db):
+    results = sweep_engine.process_all_users(batch=False)
+
+    assert [r['user_id'] for r in results] == ['U0', 'U1', 'U2', 'U3', 'U4']
+    committed = [s for s in fake_db.connections[0].statements if s.startswith(('INSERT', 'COMMIT'))]
+    assert committed == ['INSERT U0', 'INSERT U1', 'COMMIT', 'INSERT U2', 'INSERT U3', 'COMMIT',
+                         'INSERT U4', 'COMMIT']
+    assert fake_db.connections[0].statements[0] == 'SAVEPOINT sp_1'
+
+
+def test_late_failure_keeps_committed_batches(sweep_engine, fake_db):
+    with fake_db.connection() as conn:
+        conn.fail_on.add("INSERT U3")
+
+    with pytest.raises(RuntimeError):
+        sweep_engine.process_all_users(batch=False)
+
+    assert conn.statements.count('COMMIT') == 1
+    assert conn.statements.index('INSERT U1') < conn.statements.index('COMMIT')
+    assert conn.statements[-3:] == ['INSERT U3', 'ROLLBACK TO SAVEPOINT sp_1', 'ROLLBACK']
+    assert not fake_db.in_transaction
+
+
+@pytest.fixture
+def change_engine(engine, fake_db, monkeypatch):
+    """Engine whose process_change reads one fixed state and writes to fake_db"""
+    monkeypatch.setattr(rule_engine_module, 'db', fake_db)
+    rule_set = compile_rules([
+        {'rule_id': 'R-01', 'condition': 'internet_today_gb > 15', 'action': 'DATA_USAGE_WARNING', 'priority': 3},
+    ], version=(1,))
+    monkeypatch.setattr(engine.rule_cache, 'get', lambda: rule_set)
+    monkeypatch.setattr(engine.user_state_repo, 'get_by_user', lambda user_id: {
+        'user_id': user_id, 'internet_today_gb': 16, 'spend_today_try': 0,
+        'content_minutes_today': 0, 'state_date': None
+    })
+    ids = iter(range(1, 100))
+    monkeypatch.setattr(engine.decision_ids, 'next_id', lambda: f'D-{next(ids)}')
+    monkeypatch.setattr(engine.action_ids, 'next_id', lambda: f'A-{next(ids)}')
+    monkeypatch.setattr(engine, '_persist_decision',
+                        lambda result: fake_db.execute(f"INSERT {result['decision']['decision_id']}"))
+    return engine
+
+
+def test_change_is_remembered_once_committed(change_engine):
+    assert change_engine.process_change('U1', {'internet_today_gb': 2}) is not None
+    assert change_engine.process_change('U1', {'internet_today_gb': 2}) is None
+
+
+def test_change_in_rolled_back_outer_transaction_is_not_remembered(change_engine, fake_db):
+    with pytest.raises(TransactionAborted):
+        with fake_db.transaction():
+            assert change_engine.process_change('U1', {'internet_today_gb': 2}) is not None
+            assert change_engine.incremental.stats['users'] == 0
+            raise TransactionAborted("ingestion batch failed")
+
+    # The decision was rolled back, so the rising edge is reported again
+    assert change_engine.process_change('U1', {'internet_today_gb': 2}) is not None
+
+
+def test_change_in_outer_transaction_is_remembered_at_its_commit(change_engine, fake_db):
+    with fake_db.transaction():
+        assert change_engine.process_change('U1', {'internet_today_gb': 2}) is not None
+        assert change_engine.incremental.stats['users'] == 0
+
+    assert change_engine.incremental.stats['users'] == 1
+    assert change_engine.process_change('U1', {'internet_today_gb': 2}) is None
+
+
+class UserStateDatabase:
+    """Serves user_state rows to load_state() in batches of two"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute_one(self, query, params=None):
+        return {'count': len(self.rows)}
+
+    def stream_batches(self, query, params=None, batch_size=None, dict_cursor=True):
+        for start in range(0, len(self.rows), 2):
+            yield self.rows[start:start + 2]
+
+
+def test_cancelled_preview_is_not_cached(engine, monkeypatch):
+    rows = [(f'U{i}', float(i * 5), 0.0, 0.0, 'LOW') for i in range(6)]
+    monkeypatch.setattr(rule_engine_module, 'db', UserStateDatabase(rows))
+    monkeypatch.setattr(engine.rule_cache, 'get', lambda: compile_rules([], version=(1,)))
+    rule = {'rule_id': 'R-09', 'condition': 'internet_today_gb > 12', 'action': 'DATA_USAGE_WARNING', 'priority': 1}
+
+    with pytest.raises(LoadCancelled):
+        engine.preview_rule(rule, cancelled=lambda: True)
+    assert engine._preview_state is None
+
+    preview = engine.preview_rule(rule, cancelled=lambda: False)
+    assert preview.rule_triggers == {'R-09': 3}
+    assert preview.samples == {'R-09': ['U3', 'U4', 'U5']}
@@ -0,0 +1,116 @@
+"""
+Property tests: ThresholdIndex / FieldIndex lookups vs. brute-force evaluation
+"""
+
+import random
+
+import pytest
+
+from src.condition_compiler import STATE_FIELDS
+from src.rule_cache import compile_rules
+
+
+# Thresholds come from a small grid, so states hit them exactly
+GRID = [0, 5, 10, 12.5, 15, 200, 240, 300]
+VALUES = sorted({float(v + d) for v in GRID for d in (-0.5, 0, 0.5)} | {-1.0, 1e9})
+
+
+def _single_field_condition(rng: random.Random, field: str) -> str:
+    a, b = sorted(rng.sample(GRID, 2))
+    op = rng.choice(['>', '>=', '<', '<=', '=='])
+    mirrored = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '==': '=='}[op]
+    return rng.choice([
+        f'{field} {op} {a}',
+        f'{a} {mirrored} {field}',
+        f'{field} BETWEEN {a} AND {b}',
+        f'{field} BETWEEN {b} AND {a}',                     # empty range
+        f'{a} < {field} <= {b}',
+        f'{a} <= {field} < {b}',
+        f'{field} >= {a} AND {field} < {b}',
+        f'{field} > {b} AND {field} < {a}',                 # empty range
+        f'{field} < {a} OR {field} > {b}',
+        f'{field} BETWEEN {a} AND {b} OR {field} == {rng.choice(GRID)}',
+        f'({field} > {b} || {field} <= {a}) && {field} >= {rng.choice(GRID)}',
+        f'{field} == {a} OR {field} BETWEEN {b} AND {b + 10}',
+    ])
+
+
+def _fallback_condition(rng: random.Random) -> str:
+    first, second = rng.sample(STATE_FIELDS, 2)
+    return rng.choice([
+        f'{first} > {rng.choice(GRID)} AND {second} > {rng.choice(GRID)}',
+        f'{first} BETWEEN {rng.choice(GRID)} AND 300 OR {second} == {rng.choice(GRID)}',
+        f'{first} > {second}',
+        f'{first} BETWEEN 0 AND {second}',
+    ])
+
+
+def make_rule_set(seed: int, count: int = 60):
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        if rng.random() < 0.8:
+            condition = _single_field_condition(rng, rng.choice(STATE_FIELDS))
+        else:
+            condition = _fallback_condition(rng)
+        rules.append({
+            'rule_id': f'R-{i:03d}', 'condition': condition,
+            'action': f'ACTION_{i}', 'priority': rng.randint(1, 10)
+        })
+    rule_set = compile_rules(rules)
+    assert len(rule_set) == count
+    return rule_set
+
+
+def make_states(seed: int, count: int = 2000):
+    rng = random.Random(seed)
+    states = [{field: rng.choice(VALUES) for field in STATE_FIELDS} for _ in range(count)]
+    states += [{field: rng.uniform(-10, 400) for field in STATE_FIELDS} for _ in range(count // 4)]
+    states.append({})
+    states.append({field: None for field in STATE_FIELDS})
+    return states
+
+
+def brute_force(rule_set, state, fields=None):
+    return tuple(
+        r for r in rule_set.rules
+        if (fields is None or not r.condition.fields.isdisjoint(fields)) and r.condition(state)
+    )
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_match_equals_brute_force(seed):
+    rule_set = make_rule_set(seed)
+    assert rule_set.thresholds.indexed_count > 0
+    assert rule_set.thresholds.fallback_count > 0
+
+    for state in make_states(seed):
+        assert rule_set.match(state) == brute_force(rule_set, state), state
+        for field in STATE_FIELDS:
+            assert rule_set.match(state, [field]) == brute_force(rule_set, state, [field]), (state, field)
+        assert rule_set.match(state, STATE_FIELDS[:2]) == brute_force(rule_set, state, STATE_FIELDS[:2])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_candidates_cover_every_rule_reading_the_fields(seed):
+    rule_set = make_rule_set(seed)
+    for field in STATE_FIELDS:
+        assert rule_set.candidates([field]) == tuple(r for r in rule_set.rules if field in r.condition.fields)
+    assert rule_set.candidates(None) == rule_set.rules
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_crossing_includes_every_rule_that_flips(seed):
+    rng = random.Random(seed)
+    rule_set = make_rule_set(seed)
+
+    for old_state in make_states(seed, 500):
+        field = rng.choice(STATE_FIELDS)
+        new_state = dict(old_state)
+        new_state[field] = rng.choice(VALUES)
+        old_value = float(old_state.get(field) or 0)
+        new_value = float(new_state[field])
+
+        crossing = set(r.rule_id for r in rule_set.thresholds.crossing({field: (old_value, new_value)}))
+        flipped = {r.rule_id for r in rule_set.rules if r.condition(old_state) != r.condition(new_state)}
+        assert flipped <= crossing, (old_state, field, new_value)
@@ -0,0 +1,118 @@
+"""
+Tests for shadow evaluation: sampling, buffering and the background writer
+"""
+
+import json
+import threading
+
+import pytest
+
+from src import shadow as shadow_module
+from src.config import engine_config
+from src.rule_cache import compile_rules
+from src.shadow import ShadowEvaluator
+
+
+SHADOW_RULES = [
+    {'rule_id': 'S-01', 'condition': 'internet_today_gb > 10', 'action': 'DATA_USAGE_WARNING', 'priority': 1},
+]
+PRODUCTION_RULES = [
+    {'rule_id': 'R-01', 'condition': 'internet_today_gb > 15', 'action': 'DATA_USAGE_WARNING', 'priority': 3},
+]
+
+
+class RecordingSink:
+    def __init__(self):
+        self.rows = []
+        self.threads = set()
+
+    def write(self, rows):
+        self.threads.add(threading.current_thread().name)
+        self.rows.extend(rows)
+        return len(rows)
+
+
+class FailingSink:
+    def write(self, rows):
+        raise RuntimeError("shadow_decisions is gone")
+
+
+@pytest.fixture
+def evaluator(monkeypatch, tmp_path):
+    monkeypatch.setattr(engine_config, 'shadow_flush_size', 3)
+    evaluator = ShadowEvaluator(sample_rate=1.0, output=str(tmp_path / 'shadow.jsonl'))
+    rule_set = compile_rules(SHADOW_RULES, version=('shadow',))
+    monkeypatch.setattr(evaluator.rule_cache, 'get', lambda: rule_set)
+    return evaluator
+
+
+def observe(evaluator, user_id, internet):
+    production = [r for r in PRODUCTION_RULES if internet > 15]
+    evaluator.observe(user_id, {'internet_today_gb': internet}, production)
+
+
+def test_sampling_is_stable_and_bounded():
+    half = ShadowEvaluator(sample_rate=0.5, output='unused.jsonl')
+    users = [f'U{i}' for i in range(2000)]
+    sampled = [u for u in users if half.sampled(u)]
+    assert 800 < len(sampled) < 1200
+    assert sampled == [u for u in users if half.sampled(u)]
+    assert not ShadowEvaluator(sample_rate=0, output='unused.jsonl').enabled
+
+
+def test_full_buffers_are_written_by_the_writer_thread(evaluator):
+    sink = evaluator.sink = RecordingSink()
+
+    for i in range(7):
+        observe(evaluator, f'U{i}', 12 + i)
+    evaluator.flush()
+
+    assert len(sink.rows) == 7
+    assert sink.threads == {'shadow-writer'}
+    assert evaluator.stats['written'] == 7
+    assert evaluator.stats['evaluations'] == 7
+    # 12..15 fire only in shadow, 16.. in both
+    assert evaluator.stats['agreements'] == 3
+
+
+def test_silent_evaluations_are_counted_but_not_written(evaluator):
+    sink = evaluator.sink = RecordingSink()
+    observe(evaluator, 'U1', 1)
+    evaluator.flush()
+    assert sink.rows == []
+    assert evaluator.stats['evaluations'] == 1
+
+
+def test_file_sink_output(evaluator, tmp_path):
+    observe(evaluator, 'U1', 20)
+    evaluator.flush()
+    lines = (tmp_path / 'shadow.jsonl').read_text(encoding='utf-8').splitlines()
+    row = json.loads(lines[0])
+    assert row['production_rules'] == ['R-01'] and row['shadow_rules'] == ['S-01']
+
+
+def test_failed_writes_are_counted_and_do_not_raise(evaluator):
+    evaluator.sink = FailingSink()
+    for i in range(3):
+        observe(evaluator, f'U{i}', 20)
+    evaluator.flush()
+    assert evaluator.stats['dropped'] == 3
+
+
+def test_no_rule_set_load_inside_a_transaction(evaluator, monkeypatch):
+    calls = []
+    monkeypatch.setattr(evaluator.rule_cache, 'get', lambda: calls.append(1))
+    monkeypatch.setattr(evaluator, '_start_writer', lambda: None)
+    monkeypatch.setattr(type(evaluator.db), 'in_transaction', property(lambda self: True))
+
+    observe(evaluator, 'U1', 20)
+    assert calls == []
+    assert evaluator.stats['evaluations'] == 0
+
+
+def test_evaluators_are_flushed_once_at_exit(evaluator):
+    assert evaluator in shadow_module._evaluators
+    sink = evaluator.sink = RecordingSink()
+    observe(evaluator, 'U1', 20)
+    shadow_module._flush_all()
+    assert len(sink.rows) == 1
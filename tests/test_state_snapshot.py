@@ -0,0 +1,143 @@
+"""
+Tests for the columnar user_state loader and the shared-memory snapshot
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.condition_compiler import STATE_FIELDS
+from src.state_snapshot import (
+    RISK_LEVELS, RISK_UNKNOWN, LoadCancelled, SnapshotPublisher, StateSnapshot, load_state, risk_level
+)
+
+
+class StreamingDatabase:
+    """Serves SNAPSHOT_QUERY rows in batches, with a stale row count"""
+
+    def __init__(self, rows, count, batch_size):
+        self.rows = rows
+        self.count = count
+        self.batch_size = batch_size
+        self.batches_served = 0
+        self.closed = False
+
+    def execute_one(self, query, params=None):
+        return {'count': self.count}
+
+    def stream_batches(self, query, params=None, batch_size=None, dict_cursor=True):
+        try:
+            for start in range(0, len(self.rows), self.batch_size):
+                self.batches_served += 1
+                yield self.rows[start:start + self.batch_size]
+        finally:
+            self.closed = True
+
+
+def make_rows(count):
+    return [
+        (f'U{i:07d}', float(i), i * 0.5, float(i % 7), RISK_LEVELS[i % len(RISK_LEVELS)])
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize('estimate', [0, 10, 5000, 100000])
+def test_load_state_fills_columns(estimate):
+    rows = make_rows(5000)
+    user_ids, columns, risks = load_state(StreamingDatabase(rows, estimate, batch_size=777))
+
+    assert user_ids.dtype == np.dtype('S10') and len(user_ids) == 5000
+    assert user_ids[4999] == b'U0004999'
+    for position, field in enumerate(STATE_FIELDS, start=1):
+        assert columns[field].dtype == np.float64
+        assert np.array_equal(columns[field], [row[position] for row in rows])
+    assert risks.tolist() == [i % len(RISK_LEVELS) for i in range(5000)]
+
+
+def test_null_and_unknown_risk_levels_are_not_read_as_low():
+    rows = [('U1', 1.0, 0.0, 0.0, None), ('U2', 2.0, 0.0, 0.0, 'EXTREME'), ('U3', 3.0, 0.0, 0.0, 'LOW')]
+    _, _, risks = load_state(StreamingDatabase(rows, 3, batch_size=2))
+
+    assert risks.tolist() == [RISK_UNKNOWN, RISK_UNKNOWN, 0]
+    assert [risk_level(code) for code in risks] == [None, None, 'LOW']
+
+
+def test_cancelled_load_stops_between_batches():
+    database = StreamingDatabase(make_rows(1000), 1000, batch_size=100)
+    checks = []
+
+    def cancelled():
+        checks.append(database.batches_served)
+        return len(checks) > 3
+
+    with pytest.raises(LoadCancelled):
+        load_state(database, cancelled)
+
+    assert checks == [1, 2, 3, 4]
+    assert database.closed
+
+
+def test_load_state_empty():
+    user_ids, columns, risks = load_state(StreamingDatabase([], 0, batch_size=100))
+    assert len(user_ids) == len(risks) == 0
+    assert all(len(values) == 0 for values in columns.values())
+
+
+def test_load_state_matches_user_state(database):
+    user_ids, columns, risks = load_state(database)
+    rows = database.execute(
+        "SELECT user_id, internet_today_gb, risk_level FROM user_state ORDER BY user_id"
+    ) or []
+
+    assert [u.decode() for u in user_ids] == [row['user_id'] for row in rows]
+    assert np.allclose(columns['internet_today_gb'], [float(row['internet_today_gb'] or 0) for row in rows])
+    assert [risk_level(code) for code in risks] == [row['risk_level'] for row in rows]
+
+
+def test_publish_and_attach_round_trip():
+    rows = make_rows(300)
+    rows[9] = rows[9][:-1] + (None,)
+    user_ids, columns, risks = load_state(StreamingDatabase(rows, 300, batch_size=64))
+
+    with SnapshotPublisher(f"test_state_{os.getpid()}", database=None) as publisher:
+        publisher.publish(user_ids, columns, risks)
+        snapshot = StateSnapshot.attach(publisher.name)
+        try:
+            assert len(snapshot) == 300
+            assert snapshot.row(7) == {
+                'user_id': 'U0000007', 'internet_today_gb': 7.0, 'spend_today_try': 3.5,
+                'content_minutes_today': 0.0, 'risk_level': RISK_LEVELS[3]
+            }
+            assert snapshot.row(9)['risk_level'] is None
+            part = snapshot.slice(100, 200)
+            assert part.columns.user_ids[0] == 'U0000100'
+            assert np.array_equal(part.columns.columns['spend_today_try'], columns['spend_today_try'][100:200])
+        finally:
+            snapshot.close()
+
+
+def _read_row(name, index):
+    snapshot = StateSnapshot.attach(name)
+    try:
+        return snapshot.row(index)
+    finally:
+        snapshot.close()
+
+
+def test_readers_in_worker_processes_do_not_remove_the_block():
+    user_ids, columns, risks = load_state(StreamingDatabase(make_rows(50), 50, batch_size=64))
+
+    with SnapshotPublisher(f"test_workers_{os.getpid()}", database=None) as publisher:
+        publisher.publish(user_ids, columns, risks)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            rows = list(pool.map(_read_row, [publisher.name] * 4, range(4)))
+        assert [row['user_id'] for row in rows] == ['U0000000', 'U0000001', 'U0000002', 'U0000003']
+
+        # Worker exit left the block in place for later readers
+        assert _read_row(publisher.name, 49)['user_id'] == 'U0000049'
+        publisher.publish(user_ids, columns, risks)
+        assert _read_row(publisher.name, 1)['internet_today_gb'] == 1.0
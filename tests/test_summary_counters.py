@@ -0,0 +1,64 @@
+"""
+Tests for the trigger-maintained risk distribution in summary_counters
+"""
+
+import pytest
+
+from src.database import DashboardRepository, TransactionAborted
+
+
+USER_ID = '~TESTRISK'
+
+
+def distribution(repo):
+    return {row['risk_level']: row['count'] for row in repo.get_risk_distribution()}
+
+
+def counted_from_table(database):
+    rows = database.execute("SELECT risk_level, COUNT(*) AS count FROM user_state GROUP BY risk_level")
+    return {row['risk_level']: row['count'] for row in rows}
+
+
+@pytest.fixture
+def repo(database):
+    repo = DashboardRepository(database)
+    if not repo.has_counters:
+        pytest.skip("migration_summary_counters.sql is not applied")
+    return repo
+
+
+def test_null_risk_level_transitions_are_counted(database, repo):
+    steps = []
+    with pytest.raises(TransactionAborted):
+        with database.transaction():
+            before = distribution(repo)
+            database.execute("INSERT INTO users (user_id, name, city) VALUES (%s, 'test', '-')", (USER_ID,))
+            database.execute("INSERT INTO user_state (user_id, risk_level) VALUES (%s, NULL)", (USER_ID,))
+            steps.append(distribution(repo))
+            database.execute("UPDATE user_state SET risk_level = 'HIGH' WHERE user_id = %s", (USER_ID,))
+            steps.append(distribution(repo))
+            database.execute("UPDATE user_state SET risk_level = NULL WHERE user_id = %s", (USER_ID,))
+            steps.append(distribution(repo))
+            assert steps[-1] == counted_from_table(database)
+
+            repo.rebuild_counters()
+            steps.append(distribution(repo))
+            database.execute("DELETE FROM user_state WHERE user_id = %s", (USER_ID,))
+            steps.append(distribution(repo))
+            raise TransactionAborted("test data")
+
+    with_null = {**before, None: before.get(None, 0) + 1}
+    with_high = {**before, 'HIGH': before.get('HIGH', 0) + 1}
+    assert steps == [with_null, with_high, with_null, with_null, before]
+
+
+def test_null_level_is_listed_last(database, repo):
+    with pytest.raises(TransactionAborted):
+        with database.transaction():
+            database.execute("INSERT INTO users (user_id, name, city) VALUES (%s, 'test', '-')", (USER_ID,))
+            database.execute("INSERT INTO user_state (user_id, risk_level) VALUES (%s, NULL)", (USER_ID,))
+            levels = [row['risk_level'] for row in repo.get_risk_distribution()]
+            raise TransactionAborted("test data")
+
+    assert levels[-1] is None
+    assert levels[:-1] == [level for level in DashboardRepository.RISK_ORDER if level in levels]
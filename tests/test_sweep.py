@@ -0,0 +1,43 @@
+"""
+Tests for the sharded full-population sweep
+"""
+
+from collections import Counter
+
+import pytest
+
+from src import sweep
+from src.database import UserStateRepository
+from src.rule_engine import rule_engine
+from src.state_snapshot import partitions
+
+
+@pytest.mark.parametrize('count, parts', [(0, 4), (1, 4), (10, 3), (1000, 7), (5, 5)])
+def test_snapshot_partitions_cover_every_user_once(count, parts):
+    ranges = list(partitions(count, parts))
+    assert len(ranges) == parts
+    covered = [index for start, stop in ranges for index in range(start, stop)]
+    assert covered == list(range(count))
+
+
+@pytest.mark.parametrize('shards', [1, 3, 8])
+def test_sweep_shards_are_disjoint_and_cover_all_users(database, monkeypatch, shards):
+    everyone = Counter(
+        row['user_id'] for rows in UserStateRepository(database).stream_states() for row in rows
+    )
+    if not everyone:
+        pytest.skip("user_state is empty")
+
+    seen = Counter()
+    evaluate_states = rule_engine.evaluate_states
+
+    def recording_evaluate(rule_set, rows, columns=None):
+        seen.update(row['user_id'] for row in rows)
+        return evaluate_states(rule_set, rows, columns)
+
+    monkeypatch.setattr(rule_engine, 'evaluate_states', recording_evaluate)
+
+    users = sum(sweep.sweep_shard(shard, shards, persist=False).users for shard in range(shards))
+
+    assert seen == everyone            # every user exactly once
+    assert users == sum(everyone.values())
@@ -0,0 +1,57 @@
+"""
+Tests for the synthetic workload generator
+"""
+
+import sys
+from datetime import date
+
+import pytest
+
+from src import workload
+from src.workload import EVENT_ID_LENGTH, WorkloadGenerator
+
+
+START = date(2026, 10, 10)
+
+
+def test_events_are_deterministic():
+    first = list(WorkloadGenerator(300, days=2, start=START, block_size=128).iter_events())
+    second = list(WorkloadGenerator(300, days=2, start=START, block_size=128).iter_events())
+    assert first and first == second
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(users=300, block_size=128),
+    dict(users=300, block_size=1),
+    dict(users=300, block_size=300, user_prefix='WKL'),
+    dict(users=5, block_size=5, user_prefix='ABCDEF'),
+])
+def test_event_ids_are_unique_and_fit_the_column(kwargs):
+    generator = WorkloadGenerator(days=2, start=START, **kwargs)
+    ids = [event[0] for event in generator.iter_events()]
+    assert len(ids) == len(set(ids))
+    assert max(len(i) for i in ids) <= EVENT_ID_LENGTH
+    assert all(i.startswith(generator.user_prefix) for i in ids)
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(users=10, block_size=0),
+    dict(users=10, user_prefix='ABCDEFGH'),                 # 3 index digits left
+    dict(users=10 ** 7, block_size=10 ** 7, user_prefix='WW', events_per_day=1000),
+])
+def test_oversized_ids_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        WorkloadGenerator(start=START, **kwargs)
+
+
+def test_large_blocks_are_accepted_when_ids_fit():
+    generator = WorkloadGenerator(10 ** 6, start=START, block_size=10 ** 6)
+    assert generator.blocks == 1
+
+
+def test_cli_reports_oversized_ids_as_usage_error(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['workload', '--users', '10', '--prefix', 'ABCDEFGH'])
+    with pytest.raises(SystemExit) as exit_info:
+        workload.main()
+    assert exit_info.value.code == 2
+    assert 'VARCHAR(20)' in capsys.readouterr().err